@@ -0,0 +1,149 @@
+"""Semantic cache of direct-answer chat replies.
+
+Generic city questions ("什么季节来旅游最好？") are asked by many users in
+nearly the same words, and the LLM router answers them directly. This
+cache stores those answers per city with the embedding of the question;
+once the local router has classified a later question as a direct answer,
+a stored one whose embedding has cosine similarity of at least
+``threshold`` with it is returned without any LLM call.
+
+- Entries are partitioned by city and expire after ``ttl`` seconds.
+- Each city keeps at most ``max_entries`` answers, evicting the least
+  recently used.
+- ``check_version`` drops everything when the caller's configuration
+  version (current city, travel config) changes.
+
+Entries are keyed by the normalized embedding of the bare question, the
+same vector ``IntentRouter.embed`` produces, so a request encodes its
+question once for both routing and this cache; the city context comes
+from the partition. The embedder is injected (``encode(texts) -> rows of
+floats``), as in ``App.intent_router``.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from App.intent_router import Encoder, _normalize
+
+
+def first_turn_question(messages: Sequence[Dict[str, Any]]) -> Optional[str]:
+	"""The user's question if ``messages`` is a first turn, else None.
+
+	A conversation is a first turn when no assistant reply follows the first
+	user message; assistant greetings before it (the frontend opens every
+	conversation with one) do not count. Follow-ups depend on context and
+	are never cached.
+	"""
+	roles = [m.get("role") for m in messages]
+	if not roles or roles[-1] != "user" or "assistant" in roles[roles.index("user"):]:
+		return None
+	question = messages[-1].get("content")
+	if not isinstance(question, str) or not question.strip():
+		return None
+	return question.strip()
+
+
+class _Entry:
+	__slots__ = ("question", "vector", "answer", "expires_at")
+
+	def __init__(self, question: str, vector: List[float], answer: str, expires_at: float):
+		self.question = question
+		self.vector = vector
+		self.answer = answer
+		self.expires_at = expires_at
+
+
+class SemanticAnswerCache:
+	"""Per-city TTL + LRU store of answers keyed by question embedding."""
+
+	def __init__(self, encode: Encoder, threshold: float = 0.92, ttl: float = 86400.0, max_entries: int = 256):
+		self.encode = encode
+		self.threshold = threshold
+		self.ttl = ttl
+		self.max_entries = max(1, int(max_entries))
+		self._cities: Dict[str, "OrderedDict[int, _Entry]"] = {}
+		self._ids = itertools.count()
+		self._lock = threading.Lock()
+		self._version: Any = None
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+	def embed(self, question: str) -> List[float]:
+		"""Normalized embedding of ``question`` (same as ``IntentRouter.embed``)."""
+		return _normalize(self.encode([question])[0])
+
+	def check_version(self, version: Any) -> bool:
+		"""Drop all entries if ``version`` differs from the last one seen; True if dropped."""
+		with self._lock:
+			if version == self._version:
+				return False
+			changed = self._version is not None
+			self._version = version
+			if changed:
+				self._cities.clear()
+				self.invalidations += 1
+			return changed
+
+	def lookup(self, city: str, vector: Sequence[float]) -> Optional[Dict[str, Any]]:
+		"""Best fresh answer for ``city`` at or above the threshold, else None."""
+		now = time.monotonic()
+		with self._lock:
+			entries = self._cities.get(city)
+			best_id, best_score = None, self.threshold
+			if entries:
+				for entry_id, entry in list(entries.items()):
+					if entry.expires_at <= now:
+						del entries[entry_id]
+						continue
+					score = sum(x * y for x, y in zip(vector, entry.vector))
+					if score >= best_score:
+						best_id, best_score = entry_id, score
+			if best_id is None:
+				self.misses += 1
+				return None
+			entries.move_to_end(best_id)
+			self.hits += 1
+			entry = entries[best_id]
+			return {"answer": entry.answer, "question": entry.question, "score": round(best_score, 4)}
+
+	def store(self, city: str, question: str, vector: Sequence[float], answer: str) -> None:
+		if not answer:
+			return
+		with self._lock:
+			entries = self._cities.setdefault(city, OrderedDict())
+			entries[next(self._ids)] = _Entry(question, list(vector), answer, time.monotonic() + self.ttl)
+			while len(entries) > self.max_entries:
+				entries.popitem(last=False)
+
+	def purge(self, city: Optional[str] = None) -> int:
+		"""Remove all entries (or one city's); returns how many were removed."""
+		with self._lock:
+			if city is None:
+				removed = sum(len(entries) for entries in self._cities.values())
+				self._cities.clear()
+			else:
+				removed = len(self._cities.pop(city, {}))
+			return removed
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": {city: len(entries) for city, entries in self._cities.items()},
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+				"invalidations": self.invalidations,
+				"threshold": self.threshold,
+				"ttl": self.ttl,
+				"max_entries": self.max_entries,
+			}
+
+
+__all__ = ["SemanticAnswerCache", "first_turn_question"]
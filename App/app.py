@@ -5,8 +5,12 @@ import json
 import logging
 import datetime
 import pytz
+import gevent
 import gevent.monkey
+import contextvars
 import hashlib
+import queue
+import threading
 import pandas as pd
 from pathlib import Path
 
@@ -18,7 +22,7 @@ gevent.monkey.patch_all()
 from flask import (
     Flask, request, jsonify, send_from_directory, 
     render_template, redirect, url_for, session, 
-    flash, send_file
+    flash, send_file, Response, stream_with_context
 )
 from flask_cors import CORS
 from openai import OpenAI
@@ -31,11 +35,14 @@ import pickle
 # 暂时注释掉以专门测试配置API
 # from sentence_transformers import SentenceTransformer
 from functools import wraps
+from gevent.pool import Pool
 from sklearn.metrics.pairwise import cosine_similarity
 
 # 设置Python模块搜索路径，便于导入项目根目录下的模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from App.mcp_client_wrapper import MCPClientWrapper  # type: ignore
+from App.intent_router import IntentRouter, VERDICT_LABELS  # type: ignore
+from App.answer_cache import SemanticAnswerCache, first_turn_question  # type: ignore
 
 
 # 创建Flask应用实例
@@ -642,6 +649,11 @@ MAX_TOOL_ITERATIONS = 5
 MAX_CONTEXT_LENGTH = 8000
 LOOP_DETECTION_WINDOW = 4
 REASONING_TIMEOUT = 30
+MCP_CALL_BUDGET = 60  # 单次对话内高德工具调用（含重试）的总时间预算（秒）
+MAX_PARALLEL_TOOL_CALLS = 4  # 单轮推理中并发执行的工具调用上限
+TOOL_CALL_TIMEOUT = 20  # 单个工具调用的截止时间（秒），超时视为失败
+TOOL_CALL_TIMEOUTS = {"文档查询": 120}  # 单独设置截止时间的工具：文档查询包含检索和一次LLM生成
+TRUST_ROUTER_VERDICT = True  # 流水线模式：信任路由模型的 NEED_TOOLS 判断，不再让对话模型重复判断
 
 # 模型配置
 REASONING_MODEL = "doubao-1-5-pro-32k-250115"  # 用于推理判断
@@ -679,7 +691,8 @@ NEXT_INSTRUCTION: [如果不充分，生成下一条工具调用指令，格式
 1. **依赖调用场景**：后续工具需要前面工具的结果
     - 示例："万绿园附近的酒店" → 先搜索万绿园获取坐标 → 再搜索附近酒店
 2. **独立调用场景**：用户询问多个独立的地点或信息
-    - 示例："五公祠和海南省博物馆的位置" → 分别搜索两个地点
+    - 示例："五公祠和海南省博物馆的位置" → 在同一条指令中给出两个搜索调用
+    - 互不依赖的调用应放进同一个数组，系统会并发执行
 3. **距离测量场景**：需要先获取两个地点的坐标
     - 示例："从A地到B地多远" → 搜索A地坐标 → 搜索B地坐标 → 计算距离
 
@@ -1183,7 +1196,45 @@ client = OpenAI(
 )
 
 
-mcp_client = MCPClientWrapper()
+# 地理编码/逆地理编码/POI详情结果持久化到 SQLite（WAL），worker 重启后无需重新请求高德
+# hedge_requests: 远程 MCP 超过其近期 p95 延迟仍未返回时，并发发起 REST 请求，先到先用
+mcp_client = MCPClientWrapper(
+    persistent_cache_path=os.path.join(app.config['CACHE_FOLDER'], 'amap_cache.sqlite3'),
+    hedge_requests=True,
+)
+
+# 高德工具调用超过该耗时（秒）时记录告警日志，便于定位拖慢对话的工具
+MCP_SLOW_CALL_SECONDS = 3.0
+
+
+def _log_slow_mcp_call(event):
+    """metrics 钩子：记录端到端耗时过长的高德工具调用"""
+    if event.get("kind") == "call" and event["seconds"] >= MCP_SLOW_CALL_SECONDS:
+        logging.warning(f"高德工具调用较慢: {event['tool']} ({event['source']}) 耗时 {event['seconds']:.2f}s")
+
+
+mcp_client.add_metrics_hook(_log_slow_mcp_call)
+
+# 工具调用链路统计：流水线模式下每次请求省下的 LLM 调用次数
+chat_pipeline_stats = {"requests": 0, "llm_calls_saved": 0}
+chat_pipeline_lock = threading.Lock()
+
+
+def record_llm_calls_saved(saved):
+    """累计一次工具调用请求省下的 LLM 调用次数（未省下时记 0）"""
+    with chat_pipeline_lock:
+        chat_pipeline_stats["requests"] += 1
+        chat_pipeline_stats["llm_calls_saved"] += saved
+
+
+def chat_pipeline_snapshot():
+    with chat_pipeline_lock:
+        stats = dict(chat_pipeline_stats)
+    requests_count = stats["requests"]
+    stats["llm_calls_saved_per_request"] = round(stats["llm_calls_saved"] / requests_count, 2) if requests_count else 0.0
+    stats["trust_router_verdict"] = TRUST_ROUTER_VERDICT
+    stats["intent_router"] = intent_router.stats()
+    return stats
 
 # 全局模型缓存 - 智能加载策略
 # 启动时检查向量缓存：
@@ -1322,6 +1373,104 @@ def get_embedding_model():
     
     return _embedding_model
 
+# 本地意图路由：用已加载的嵌入模型对用户消息分类，置信时跳过 BASE_MODEL 的路由判断调用
+LOCAL_INTENT_ROUTER = True
+INTENT_ROUTER_THRESHOLD = 0.6  # 最高相似度下限
+INTENT_ROUTER_MARGIN = 0.05  # 最高与次高相似度之差下限
+
+def _encode_with_embedding_model(texts):
+    return _embedding_model.encode(texts, show_progress_bar=False, normalize_embeddings=True)
+
+intent_router = IntentRouter(
+    _encode_with_embedding_model,
+    threshold=INTENT_ROUTER_THRESHOLD,
+    margin=INTENT_ROUTER_MARGIN
+)
+
+def route_locally(messages):
+    """
+    本地意图路由，返回 (路由结果, 问题向量)
+    
+    路由结果为置信时的 NEED_TOOLS/ITINERARY_UPDATE/ITINERARY_ANALYZE/DIRECT_ANSWER，
+    模型未加载或判断不确定时为 None，由LLM路由处理；DIRECT_ANSWER 仍需LLM生成回答，
+    除非答案缓存命中。问题向量供答案缓存复用，每个请求只编码一次，无法编码时为 None
+    """
+    if not LOCAL_INTENT_ROUTER or _embedding_model is None:
+        return None, None
+    last_message = messages[-1] if messages else {}
+    content = last_message.get('content') if last_message.get('role') == 'user' else None
+    if not content or not isinstance(content, str):
+        return None, None
+    try:
+        vector = intent_router.embed(content.strip())
+        decision = intent_router.classify(content, vector)
+    except Exception as e:
+        logging.warning(f"本地意图路由失败，回退到LLM路由: {e}")
+        return None, None
+    logging.info(f"[LOCAL_ROUTER] {decision.as_dict()}")
+    return (decision.label if decision.confident else None), vector
+
+# 直接回答的语义缓存：本地路由判为直接回答时，同一城市下相似的问题直接返回已有回答，不调用LLM
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.92  # 问题向量余弦相似度下限
+ANSWER_CACHE_TTL = 24 * 3600  # 秒
+ANSWER_CACHE_MAX_ENTRIES = 256  # 每个城市最多缓存的回答数
+
+answer_cache = SemanticAnswerCache(
+    _encode_with_embedding_model,
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES
+)
+
+def answer_cache_version():
+    """当前城市及城市/旅行配置文件的版本标识，任一变化时答案缓存整体失效（各 worker 均可感知）"""
+    stamps = []
+    for key in ('APP_CONFIG_FILE', 'TRAVEL_PURPOSES_FILE', 'TRAVEL_PREFERENCES_FILE'):
+        try:
+            stamps.append(os.stat(app.config[key]).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return current_city, tuple(stamps)
+
+def _cacheable_question(messages):
+    """仅首轮对话（首条用户消息之后尚无助手回复，前端的开场问候不计）的用户问题可使用答案缓存，追问依赖上下文不缓存"""
+    if not ANSWER_CACHE_ENABLED or not messages:
+        return None
+    return first_turn_question(messages)
+
+def lookup_cached_answer(messages, vector):
+    """
+    本地路由判为直接回答后查询语义缓存，返回命中的回答或 None
+    
+    vector 为 route_locally 返回的问题向量；城市由缓存分区区分，无需编入向量
+    """
+    question = _cacheable_question(messages)
+    if question is None or vector is None:
+        return None
+    try:
+        answer_cache.check_version(answer_cache_version())
+    except Exception as e:
+        logging.warning(f"答案缓存查询失败: {e}")
+        return None
+    hit = answer_cache.lookup(current_city, vector)
+    if hit:
+        logging.info(f"[ANSWER_CACHE] 命中: {question} ≈ {hit['question']} (相似度 {hit['score']})")
+        return hit["answer"]
+    return None
+
+def store_cached_answer(messages, vector, answer):
+    """路由（本地或LLM）给出直接回答后写入语义缓存"""
+    question = _cacheable_question(messages)
+    if question is None or vector is None:
+        return
+    try:
+        answer_cache.check_version(answer_cache_version())
+    except Exception as e:
+        logging.warning(f"答案缓存写入失败: {e}")
+        return
+    answer_cache.store(current_city, question, vector, answer)
+
 def load_embedding_cache():
     """
     加载向量缓存（单例模式）
@@ -2770,6 +2919,125 @@ def admin_sample_itinerary():
         return jsonify({'code': 1, 'msg': str(e)}), 500
 
 
+def build_router_system_message(cache_status):
+    """根据缓存和文档状态构建路由判断用的系统提示词"""
+    # 构建工具列表
+    if cache_status['doc_query_available']:
+        # 文档查询可用的情况
+        tools_section = """
+            【可用工具列表】
+            系统支持以下5个工具，工具名称必须严格使用：
+            1. "获取天气信息" - 查询指定城市的天气情况
+            2. "搜索兴趣点" - 关键词搜索POI信息
+            3. "附近搜索" - 以某个位置为中心搜索周边POI信息
+            4. "目的地距离" - 测量两个地点之间的距离
+            5. "文档查询" - 从本地知识库中检索相关信息并回答问题"""
+    else:
+        # 文档查询不可用的情况
+        tools_section = """
+            【可用工具列表】
+            系统支持以下4个工具，工具名称必须严格使用：
+            1. "获取天气信息" - 查询指定城市的天气情况
+            2. "搜索兴趣点" - 关键词搜索POI信息
+            3. "附近搜索" - 以某个位置为中心搜索周边POI信息
+            4. "目的地距离" - 测量两个地点之间的距离"""
+    
+    # 构建工具名称列表
+    tool_names_section = """                  * "获取天气信息"
+              * "搜索兴趣点" 
+              * "附近搜索"
+              * "目的地距离" """
+    if cache_status['doc_query_available']:
+        tool_names_section += """
+              * "文档查询" """
+    
+    # 工具数量文字
+    tool_count = "5个名称之一" if cache_status['doc_query_available'] else "4个名称之一"
+
+    return {
+        "role": "system",
+        "content": f"""你是一个专业的{current_city}旅游规划助手。
+
+【核心任务】分析用户需求，判断是否需要调用工具、生成行程表、分析行程或直接回答。
+
+【可用工具类型】
+- 天气信息查询
+- 景点/酒店/餐厅搜索
+- 附近地点搜索  
+- 距离测量
+- 本地知识库查询{"（当前可用）" if cache_status['doc_query_available'] else "（当前不可用）"}
+
+【判断原则】
+- 需要实时数据（天气、具体位置、营业信息、路线距离等）→ 回复"NEED_TOOLS"
+- 需要具体的景点/酒店/餐厅推荐 → 回复"NEED_TOOLS"  
+- 需要制定详细行程规划 → 回复"NEED_TOOLS"
+- 用户明确要求生成、制定、安排行程表/日程 → 回复"ITINERARY_UPDATE"
+- 用户询问如何整理之前的推荐成具体行程 → 回复"ITINERARY_UPDATE"
+- 对话中已有充分信息，用户希望整合成可执行计划 → 回复"ITINERARY_UPDATE"
+- 用户询问现有行程是否合理、时间安排、路线评估等分析性问题 → 回复"ITINERARY_ANALYZE"
+- 用户要求分析、评估、点评当前行程表 → 回复"ITINERARY_ANALYZE"
+- 可以基于常识直接回答的一般性问题 → 直接回答
+
+【回复要求】
+- 需要工具时：只回复"NEED_TOOLS"
+- 需要生成行程表时：只回复"ITINERARY_UPDATE"
+- 需要分析行程表时：只回复"ITINERARY_ANALYZE"
+- 直接回答时：提供完整、专业的回答，使用Markdown格式，适当使用emoji
+
+⚠️ **重要**：不要生成任何工具调用指令，只做判断。"""
+    }
+
+
+def build_itinerary_update_payload(messages, current_itinerary):
+    """路由2：根据对话生成行程表，返回 (响应数据, HTTP状态码)"""
+    # 获取完整对话历史（不包括system_message）
+    conversation_for_itinerary = messages[1:]  # 去掉system_message
+    
+    # 生成行程表，传递当前行程表数据支持短期记忆
+    itinerary_result = generate_itinerary_from_conversation(
+        conversation_for_itinerary, 
+        current_itinerary  # 传递当前行程表数据
+    )
+    
+    if not itinerary_result["success"]:
+        return {
+            "status": "error",
+            "message": f"生成行程表失败: {itinerary_result['error']}"
+        }, 500
+    # 检查是否是温馨提示
+    if itinerary_result.get("action") == "friendly_prompt":
+        logging.info("返回温馨提示给用户")
+        return {
+            "status": "success",
+            "response": itinerary_result["response"]
+        }, 200
+    # 正常的行程表生成
+    logging.info(f"行程表生成成功，准备返回给前端")
+    return {
+        "status": "success",
+        "response": "已为您生成行程表，请查看左边栏！",
+        "action": "generate_itinerary",
+        "itinerary": itinerary_result["itinerary"]
+    }, 200
+
+
+def build_itinerary_analyze_payload(current_itinerary):
+    """路由3：分析当前行程表，返回 (响应数据, HTTP状态码)"""
+    # 分析行程表，只传递当前行程表数据
+    analysis_result = analyze_current_itinerary(current_itinerary)
+    
+    if analysis_result["success"]:
+        return {
+            "status": "success",
+            "response": analysis_result["response"],
+            "action": "analyze_itinerary"
+        }, 200
+    return {
+        "status": "error",
+        "message": f"分析行程表失败: {analysis_result['error']}"
+    }, 500
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     logging.info("进入 /api/chat 路由")
@@ -2802,71 +3070,7 @@ def chat():
         cache_status = check_cache_and_docs_status()
         
         # 2. 根据缓存状态动态构建系统提示词
-        # 构建工具列表
-        if cache_status['doc_query_available']:
-            # 文档查询可用的情况
-            tools_section = """
-                【可用工具列表】
-                系统支持以下5个工具，工具名称必须严格使用：
-                1. "获取天气信息" - 查询指定城市的天气情况
-                2. "搜索兴趣点" - 关键词搜索POI信息
-                3. "附近搜索" - 以某个位置为中心搜索周边POI信息
-                4. "目的地距离" - 测量两个地点之间的距离
-                5. "文档查询" - 从本地知识库中检索相关信息并回答问题"""
-        else:
-            # 文档查询不可用的情况
-            tools_section = """
-                【可用工具列表】
-                系统支持以下4个工具，工具名称必须严格使用：
-                1. "获取天气信息" - 查询指定城市的天气情况
-                2. "搜索兴趣点" - 关键词搜索POI信息
-                3. "附近搜索" - 以某个位置为中心搜索周边POI信息
-                4. "目的地距离" - 测量两个地点之间的距离"""
-        
-        # 构建工具名称列表
-        tool_names_section = """                  * "获取天气信息"
-                  * "搜索兴趣点" 
-                  * "附近搜索"
-                  * "目的地距离" """
-        if cache_status['doc_query_available']:
-            tool_names_section += """
-                  * "文档查询" """
-        
-        # 工具数量文字
-        tool_count = "5个名称之一" if cache_status['doc_query_available'] else "4个名称之一"
-
-        system_message = {
-            "role": "system",
-            "content": f"""你是一个专业的{current_city}旅游规划助手。
-
-【核心任务】分析用户需求，判断是否需要调用工具、生成行程表、分析行程或直接回答。
-
-【可用工具类型】
-- 天气信息查询
-- 景点/酒店/餐厅搜索
-- 附近地点搜索  
-- 距离测量
-- 本地知识库查询{"（当前可用）" if cache_status['doc_query_available'] else "（当前不可用）"}
-
-【判断原则】
-- 需要实时数据（天气、具体位置、营业信息、路线距离等）→ 回复"NEED_TOOLS"
-- 需要具体的景点/酒店/餐厅推荐 → 回复"NEED_TOOLS"  
-- 需要制定详细行程规划 → 回复"NEED_TOOLS"
-- 用户明确要求生成、制定、安排行程表/日程 → 回复"ITINERARY_UPDATE"
-- 用户询问如何整理之前的推荐成具体行程 → 回复"ITINERARY_UPDATE"
-- 对话中已有充分信息，用户希望整合成可执行计划 → 回复"ITINERARY_UPDATE"
-- 用户询问现有行程是否合理、时间安排、路线评估等分析性问题 → 回复"ITINERARY_ANALYZE"
-- 用户要求分析、评估、点评当前行程表 → 回复"ITINERARY_ANALYZE"
-- 可以基于常识直接回答的一般性问题 → 直接回答
-
-【回复要求】
-- 需要工具时：只回复"NEED_TOOLS"
-- 需要生成行程表时：只回复"ITINERARY_UPDATE"
-- 需要分析行程表时：只回复"ITINERARY_ANALYZE"
-- 直接回答时：提供完整、专业的回答，使用Markdown格式，适当使用emoji
-
-⚠️ **重要**：不要生成任何工具调用指令，只做判断。"""
-        }
+        system_message = build_router_system_message(cache_status)
         messages.insert(0, system_message)
         # 记录新增加的消息到日志
         if messages:
@@ -2880,20 +3084,38 @@ def chat():
         
         # 调用模型进行初始判断
         try:
-            response = client.chat.completions.create(
-                model=BASE_MODEL,
-                messages=messages
-            )
-            initial_response = response.choices[0].message.content.strip()
-            logging.info(f"初始判断结果: {initial_response}")
+            local_route, question_vector = route_locally(messages)
+            initial_response = None
+            if local_route == "DIRECT_ANSWER":
+                # 本地路由判为直接回答且相似问题已有回答时，不再调用任何LLM
+                cached_answer = lookup_cached_answer(messages, question_vector)
+                if cached_answer is not None:
+                    return jsonify({
+                        "status": "success",
+                        "response": cached_answer,
+                        "tool_use": tool_use
+                    })
+            elif local_route is not None:
+                initial_response = local_route
+                logging.info(f"本地路由判断结果: {initial_response}")
+            if initial_response is None:
+                response = client.chat.completions.create(
+                    model=BASE_MODEL,
+                    messages=messages
+                )
+                initial_response = response.choices[0].message.content.strip()
+                logging.info(f"初始判断结果: {initial_response}")
             
             # 根据响应类型进行路由
             if initial_response == "NEED_TOOLS":
                 # 路由1: 工具调用
                 logging.info("路由到工具调用处理")
-                final_reply, tool_call_history, call_failed = reasoning_based_tool_calling(
-                    user_question, messages, tool_use, now_beijing, cache_status['doc_query_available']
-                )
+                # 整个工具调用链共享一个时间预算，高德请求的重试不会超出该预算
+                with mcp_client.call_options(priority="interactive", budget=MCP_CALL_BUDGET):
+                    final_reply, tool_call_history, call_failed = reasoning_based_tool_calling(
+                        user_question, messages, tool_use, now_beijing, cache_status['doc_query_available'],
+                        trust_routing=TRUST_ROUTER_VERDICT
+                    )
                 
                 if call_failed:
                     return jsonify({
@@ -2911,62 +3133,20 @@ def chat():
                 # 路由2: 行程表生成
                 logging.info("路由到行程表生成")
                 
-                # 获取完整对话历史（不包括system_message）
-                conversation_for_itinerary = messages[1:]  # 去掉system_message
-                
-                # 生成行程表，传递当前行程表数据支持短期记忆
-                itinerary_result = generate_itinerary_from_conversation(
-                    conversation_for_itinerary, 
-                    current_itinerary  # 传递当前行程表数据
-                )
-                
-                if itinerary_result["success"]:
-                    # 检查是否是温馨提示
-                    if itinerary_result.get("action") == "friendly_prompt":
-                        logging.info("返回温馨提示给用户")
-                        return jsonify({
-                            "status": "success",
-                            "response": itinerary_result["response"]
-                        })
-                    else:
-                        # 正常的行程表生成
-                        logging.info(f"行程表生成成功，准备返回给前端")
-                        return jsonify({
-                            "status": "success",
-                            "response": "已为您生成行程表，请查看左边栏！",
-                            "action": "generate_itinerary",
-                            "itinerary": itinerary_result["itinerary"]
-                        })
-                else:
-                    return jsonify({
-                        "status": "error",
-                        "message": f"生成行程表失败: {itinerary_result['error']}"
-                    }), 500
+                payload, status_code = build_itinerary_update_payload(messages, current_itinerary)
+                return jsonify(payload), status_code
                     
             elif initial_response == "ITINERARY_ANALYZE":
                 # 路由3: 行程分析（新增）
                 logging.info("路由到行程分析")
                 
-                # 分析行程表
-                analysis_result = analyze_current_itinerary(
-                    current_itinerary  # 只传递当前行程表数据
-                )
-                
-                if analysis_result["success"]:
-                    return jsonify({
-                        "status": "success",
-                        "response": analysis_result["response"],
-                        "action": "analyze_itinerary"
-                    })
-                else:
-                    return jsonify({
-                        "status": "error",
-                        "message": f"分析行程表失败: {analysis_result['error']}"
-                    }), 500
+                payload, status_code = build_itinerary_analyze_payload(current_itinerary)
+                return jsonify(payload), status_code
                     
             else:
                 # 路由4: 直接回答
                 logging.info("路由到直接回答")
+                store_cached_answer(messages, question_vector, initial_response)
                 return jsonify({
                     "status": "success",
                     "response": initial_response,
@@ -2989,6 +3169,131 @@ def chat():
         }), 500
 
 
+def sse_event(event, data):
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class StreamingToolUse(list):
+    """tool_use 列表：每追加一条记录，同时推送到流式事件队列"""
+
+    def __init__(self, events):
+        super().__init__()
+        self._events = events
+
+    def append(self, entry):
+        super().append(entry)
+        self._events.put(("tool_use", entry))
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    /api/chat 的流式版本，以 text/event-stream 返回：
+    - route: 路由判断结果 {"route": NEED_TOOLS/ITINERARY_UPDATE/ITINERARY_ANALYZE/DIRECT_ANSWER}
+    - tool_use: 每条工具调用/返回记录，产生即推送
+    - token: 回复文本片段 {"content": ...}
+    - done: 与 /api/chat 相同结构的完整响应（status/response/tool_use/action/...）
+    """
+    logging.info("进入 /api/chat/stream 路由")
+    
+    # 更新当前城市配置
+    update_current_city()
+    
+    data = request.json or {}
+    messages = data.get('messages', [])
+    current_itinerary = data.get('current_itinerary')
+    now_beijing = lambda: datetime.datetime.now(beijing_tz).isoformat()
+    cache_status = check_cache_and_docs_status()
+    messages.insert(0, build_router_system_message(cache_status))
+    user_question = messages[-1] if messages and messages[-1].get('role') == 'user' else {"role": "user", "content": ""}
+
+    def run_tool_calling(events, tool_use):
+        try:
+            with mcp_client.call_options(priority="interactive", budget=MCP_CALL_BUDGET):
+                result = reasoning_based_tool_calling(
+                    user_question, messages, tool_use, now_beijing, cache_status['doc_query_available'],
+                    on_token=lambda delta: events.put(("token", {"content": delta})),
+                    trust_routing=TRUST_ROUTER_VERDICT
+                )
+            events.put(("result", result))
+        except Exception as e:
+            logging.error("流式工具调用处理异常", exc_info=True)
+            events.put(("result", (f"处理请求时出错: {str(e)}", [], True)))
+
+    def generate():
+        try:
+            route, question_vector = route_locally(messages)
+            if route == "DIRECT_ANSWER":
+                # 本地路由判为直接回答且相似问题已有回答时，不再调用任何LLM；未命中则由LLM路由生成回答
+                cached_answer = lookup_cached_answer(messages, question_vector)
+                if cached_answer is not None:
+                    yield sse_event("route", {"route": route})
+                    yield sse_event("token", {"content": cached_answer})
+                    yield sse_event("done", {"status": "success", "response": cached_answer, "tool_use": []})
+                    return
+                route = None
+            if route is not None:
+                # 本地路由置信，直接采用
+                initial_response = route
+                logging.info(f"本地路由判断结果: {route}")
+                yield sse_event("route", {"route": route})
+            else:
+                # 路由判断也以流式方式调用：一旦确定不是路由指令，即按直接回答逐段推送
+                reply = ""
+                for delta in iter_completion_deltas(BASE_MODEL, messages):
+                    reply += delta
+                    if route is not None:
+                        yield sse_event("token", {"content": delta})
+                        continue
+                    head = reply.lstrip()
+                    if any(v.startswith(head) or head.startswith(v) for v in VERDICT_LABELS):
+                        continue
+                    route = "DIRECT_ANSWER"
+                    yield sse_event("route", {"route": route})
+                    yield sse_event("token", {"content": head})
+                initial_response = reply.strip()
+                logging.info(f"初始判断结果: {initial_response}")
+                if route is None:
+                    route = initial_response if initial_response in VERDICT_LABELS else "DIRECT_ANSWER"
+                    yield sse_event("route", {"route": route})
+                    if route == "DIRECT_ANSWER" and initial_response:
+                        yield sse_event("token", {"content": initial_response})
+
+            if route == "NEED_TOOLS":
+                # 工具调用链在后台执行，tool_use 记录和最终回复片段经队列推送
+                events = queue.Queue()
+                tool_use = StreamingToolUse(events)
+                threading.Thread(target=run_tool_calling, args=(events, tool_use), daemon=True).start()
+                while True:
+                    kind, value = events.get()
+                    if kind == "result":
+                        break
+                    yield sse_event(kind, value)
+                final_reply, _, call_failed = value
+                if call_failed:
+                    payload = {"status": "error", "message": final_reply}
+                else:
+                    payload = {"status": "success", "response": final_reply, "tool_use": list(tool_use)}
+            elif route == "ITINERARY_UPDATE":
+                payload, _ = build_itinerary_update_payload(messages, current_itinerary)
+            elif route == "ITINERARY_ANALYZE":
+                payload, _ = build_itinerary_analyze_payload(current_itinerary)
+            else:
+                store_cached_answer(messages, question_vector, initial_response)
+                payload = {"status": "success", "response": initial_response, "tool_use": []}
+        except Exception as e:
+            logging.error("/api/chat/stream 路由发生异常", exc_info=True)
+            payload = {"status": "error", "message": f"处理请求时出错: {str(e)}"}
+        yield sse_event("done", payload)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 def format_mcp_data(mcp_data):
     """格式化MCP数据，便于LLM理解和回答"""
     if mcp_data["type"] == "weather":
@@ -3224,7 +3529,8 @@ NEXT_INSTRUCTION: [如果不充分，生成下一条工具调用指令，格式
 1. **依赖调用场景**：后续工具需要前面工具的结果
     - 示例："万绿园附近的酒店" → 先搜索万绿园获取坐标 → 再搜索附近酒店
 2. **独立调用场景**：用户询问多个独立的地点或信息
-    - 示例："五公祠和海南省博物馆的位置" → 分别搜索两个地点
+    - 示例："五公祠和海南省博物馆的位置" → 在同一条指令中给出两个搜索调用
+    - 互不依赖的调用应放进同一个数组，系统会并发执行
 3. **距离测量场景**：需要先获取两个地点的坐标
     - 示例："从A地到B地多远" → 搜索A地坐标 → 搜索B地坐标 → 计算距离
 """
@@ -3464,7 +3770,19 @@ def analyze_information_sufficiency(user_question, tool_call_history, doc_query_
             "next_instruction": None
         }
 
-def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_beijing, doc_query_available=True):
+def iter_completion_deltas(model, messages):
+    """以 stream=True 调用模型，逐段产出回复文本"""
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True
+    )
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_beijing, doc_query_available=True, on_token=None, trust_routing=False):
     """
     基于推理判断的多工具调用核心算法
     
@@ -3472,22 +3790,35 @@ def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_
     1. 对话阶段：理解用户意图，决定是否需要工具调用
     2. 循环执行：工具调用 → 推理判断 → 继续或结束
     3. 最终回复：基于工具结果生成用户友好的回复
+    
+    trust_routing 为 True 时调用方已确认需要工具（路由模型判定 NEED_TOOLS），
+    跳过对话阶段的重复判断，由推理模型直接生成第一条工具调用指令。
+    
+    传入 on_token 时最终回复以流式方式生成，每段文本到达即回调 on_token(delta)，
+    返回值仍为完整回复。
     """
     tool_call_history = []
     iteration = 0
     
     # 对话阶段：处理用户输入，决定是否需要工具调用
     try:
-        # 输出发送给对话模型的上下文
-        logging.info(f"[CONTEXT_TO_CHAT] 使用模型: {TOOL_GENERATION_MODEL}")
-        logging.info(f"[CONTEXT_TO_CHAT] 发送给对话模型的上下文:\n{format_context_for_debug(initial_messages)}")
-        
-        completion = client.chat.completions.create(
-            model=TOOL_GENERATION_MODEL,
-            messages=initial_messages,
-        )
-        llm_reply = completion.choices[0].message.content
-        logging.info(f"[CHAT_REPLY] {llm_reply}")
+        if trust_routing:
+            # 路由模型已判定 NEED_TOOLS，省去对话模型的重复判断
+            logging.info("[CHAT_DECISION] 信任路由判断，跳过对话模型")
+            record_llm_calls_saved(1)
+            llm_reply = "NEED_TOOLS"
+        else:
+            record_llm_calls_saved(0)
+            # 输出发送给对话模型的上下文
+            logging.info(f"[CONTEXT_TO_CHAT] 使用模型: {TOOL_GENERATION_MODEL}")
+            logging.info(f"[CONTEXT_TO_CHAT] 发送给对话模型的上下文:\n{format_context_for_debug(initial_messages)}")
+            
+            completion = client.chat.completions.create(
+                model=TOOL_GENERATION_MODEL,
+                messages=initial_messages,
+            )
+            llm_reply = completion.choices[0].message.content
+            logging.info(f"[CHAT_REPLY] {llm_reply}")
         
         # 检查是否需要工具调用
         if "NEED_TOOLS" in llm_reply:
@@ -3518,45 +3849,38 @@ def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_
             logging.warning("检测到工具调用循环，终止执行")
             break
         
-        # 解析和执行工具调用
+        # 解析和执行工具调用：本轮指令中的全部工具调用并发执行
         try:
             tool_calls = json.loads(current_instruction)
             if not tool_calls or not isinstance(tool_calls, list):
                 break
-                
-            tool = tool_calls[0]
-            tool_name = tool.get("name")
-            params = tool.get("parameters", {})
             
-            # 记录工具调用
-            tool_use.append({
-                "type": "tool_call",
-                "icon": "⚙️",
-                "title": f"调用[{tool_name}]工具......",
-                "tool_name": tool_name,
-                "content": json.dumps(params, ensure_ascii=False),
-                "timestamp": now_beijing(),
-                "collapsible": True
-            })
+            # 同一轮中重复的调用只执行一次
+            unique_calls = []
+            for tool in tool_calls:
+                if isinstance(tool, dict) and tool not in unique_calls:
+                    unique_calls.append(tool)
             
-            # 执行MCP工具调用
-            tool_result, tool_failed = call_mcp_tool_and_format_result(
-                tool_name, params, tool_use, now_beijing, mcp_client
-            )
+            results = execute_tool_calls_parallel(unique_calls, tool_use, now_beijing, user_question)
             
-            if tool_failed:
-                logging.error(f"工具调用失败: {tool_name}")
-                break
+            # 每个成功的调用各记一条工具调用历史
+            succeeded = 0
+            for tool, tool_result, tool_failed in results:
+                if tool_failed:
+                    logging.error(f"工具调用失败: {tool.get('name')}")
+                    continue
+                succeeded += 1
+                tool_call_history.append({
+                    "instruction": json.dumps([tool], ensure_ascii=False),
+                    "result": tool_result,
+                    "timestamp": now_beijing(),
+                    "iteration": iteration
+                })
             
-            # 更新工具调用历史
-            tool_call_history.append({
-                "instruction": current_instruction,
-                "result": tool_result,
-                "timestamp": now_beijing(),
-                "iteration": iteration
-            })
+            if not succeeded:
+                break
             
-            logging.info(f"[TOOL_RESULT] 第{iteration}轮工具调用完成")
+            logging.info(f"[TOOL_RESULT] 第{iteration}轮工具调用完成: {succeeded}/{len(results)} 成功")
             
         except Exception as e:
             logging.error(f"执行工具调用失败: {str(e)}")
@@ -3585,12 +3909,18 @@ def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_
         logging.info(f"[CONTEXT_TO_FINAL_RESPONSE] 使用模型: {FINAL_RESPONSE_MODEL}")
         logging.info(f"[CONTEXT_TO_FINAL_RESPONSE] 发送给最终回复模型的上下文:\n{format_context_for_debug(final_context)}")
         
-        completion = client.chat.completions.create(
-            model=FINAL_RESPONSE_MODEL,
-            messages=final_context,
-        )
-        
-        final_reply = completion.choices[0].message.content
+        if on_token is None:
+            completion = client.chat.completions.create(
+                model=FINAL_RESPONSE_MODEL,
+                messages=final_context,
+            )
+            final_reply = completion.choices[0].message.content
+        else:
+            parts = []
+            for delta in iter_completion_deltas(FINAL_RESPONSE_MODEL, final_context):
+                parts.append(delta)
+                on_token(delta)
+            final_reply = "".join(parts)
         logging.info(f"[FINAL_REPLY] {final_reply}")
         
         return final_reply, tool_call_history, False
@@ -3599,6 +3929,68 @@ def reasoning_based_tool_calling(user_question, initial_messages, tool_use, now_
         logging.error(f"生成最终回复失败: {str(e)}")
         return "抱歉，生成最终回复失败。", tool_call_history, True
 
+def execute_tool_calls_parallel(tool_calls, tool_use, now_beijing, user_question=None):
+    """
+    并发执行一轮推理给出的全部工具调用
+    
+    最多 MAX_PARALLEL_TOOL_CALLS 个调用同时进行，单个调用超过截止时间
+    （TOOL_CALL_TIMEOUTS 中的单独设置，否则为 TOOL_CALL_TIMEOUT 秒）视为失败。
+    每个调用的 tool_use 记录单独收集，按 tool_calls 顺序追加，前面的调用完成即追加，
+    并发调用的记录不会交错。
+    返回 [(tool_call, tool_result, tool_failed)]，顺序与 tool_calls 一致。
+    """
+    def run(tool, entries):
+        tool_name = tool.get("name")
+        params = tool.get("parameters", {})
+        
+        # 记录工具调用
+        entries.append({
+            "type": "tool_call",
+            "icon": "⚙️",
+            "title": f"调用[{tool_name}]工具......",
+            "tool_name": tool_name,
+            "content": json.dumps(params, ensure_ascii=False),
+            "timestamp": now_beijing(),
+            "collapsible": True
+        })
+        
+        # 执行MCP工具调用
+        limit = TOOL_CALL_TIMEOUTS.get(tool_name, TOOL_CALL_TIMEOUT)
+        timer = gevent.Timeout(limit)
+        timer.start()
+        try:
+            tool_result, tool_failed = call_mcp_tool_and_format_result(
+                tool_name, params, entries, now_beijing, mcp_client, user_question
+            )
+        except gevent.Timeout as e:
+            # 不是本调用的计时器时同样按失败处理，不让其他请求的超时中断本次对话
+            if e is timer:
+                logging.error(f"工具调用超时: {tool_name} 超过 {limit} 秒")
+            else:
+                logging.error(f"工具调用被外部超时中断: {tool_name}")
+            tool_result, tool_failed = None, True
+        finally:
+            timer.cancel()
+        return tool, tool_result, tool_failed
+    
+    if len(tool_calls) == 1:
+        return [run(tool_calls[0], tool_use)]
+    
+    pool = Pool(MAX_PARALLEL_TOOL_CALLS)
+    call_entries = [[] for _ in tool_calls]
+    # 每个调用在调用方上下文的副本中运行，保留 mcp_client.call_options 设置的时间预算
+    greenlets = [
+        pool.spawn(contextvars.copy_context().run, run, tool, entries)
+        for tool, entries in zip(tool_calls, call_entries)
+    ]
+    results = []
+    for tool, entries, greenlet in zip(tool_calls, call_entries, greenlets):
+        greenlet.join()
+        for entry in entries:
+            tool_use.append(entry)
+        results.append(greenlet.value if greenlet.successful() else (tool, None, True))
+    return results
+
 def call_mcp_tool_and_format_result(tool_name, params, tool_use, now, mcp_client, user_question=None):
     """
     根据工具名和参数调用MCP，并格式化结果，返回 (tool_result, tool_failed)
@@ -4095,11 +4487,11 @@ def health_check():
         except Exception as e:
             health_status["checks"]["vector_cache"] = f"error: {str(e)}"
         
-        # 检查MCP客户端状态
+        # 检查MCP客户端状态（使用缓存的探测结果，后台刷新，不会阻塞或增加高德调用量）
         try:
-            # 简单测试MCP客户端是否可用
             if mcp_client:
-                health_status["checks"]["mcp_client"] = "ok"
+                mcp_health = mcp_client.health()
+                health_status["checks"]["mcp_client"] = "ok" if mcp_health["ok"] else f"error: {mcp_health['error']}"
             else:
                 health_status["checks"]["mcp_client"] = "not_available"
         except Exception as e:
@@ -4120,6 +4512,32 @@ def health_check():
             "timestamp": datetime.datetime.now(beijing_tz).isoformat()
         }), 500
 
+@app.route('/api/mcp/metrics', methods=['GET'])
+@login_required
+def mcp_metrics():
+    """高德工具调用指标：各工具/路径延迟分布、回退次数、错误类型、响应大小及缓存命中率；
+    chat 为工具调用链路省下的 LLM 调用统计"""
+    return jsonify({
+        "status": "success",
+        "timestamp": datetime.datetime.now(beijing_tz).isoformat(),
+        "data": mcp_client.metrics_snapshot(),
+        "chat": chat_pipeline_snapshot()
+    })
+
+@app.route('/api/answer_cache', methods=['GET', 'DELETE'])
+@login_required
+def answer_cache_admin():
+    """直接回答语义缓存管理：GET 查看统计，DELETE 清空（?city= 只清除指定城市）"""
+    if request.method == 'DELETE':
+        city = request.args.get('city') or None
+        removed = answer_cache.purge(city)
+        logging.info(f"答案缓存已清除: {city or '全部城市'}，共 {removed} 条")
+        return jsonify({"status": "success", "removed": removed})
+    return jsonify({
+        "status": "success",
+        "data": answer_cache.stats()
+    })
+
 @app.route('/api/check_rag_status', methods=['GET'])
 def check_rag_status():
     """检查RAG系统状态的API端点"""
@@ -0,0 +1,200 @@
+"""Local embedding-based intent router for ``/api/chat``.
+
+``chat()`` first asks ``BASE_MODEL`` to classify the conversation as
+``NEED_TOOLS``, ``ITINERARY_UPDATE``, ``ITINERARY_ANALYZE`` or a direct
+answer. ``IntentRouter`` makes the same decision in milliseconds from a
+small labelled prototype set: the last user message is embedded (with the
+already-loaded Qwen3-Embedding model) and scored against each label as the
+mean cosine similarity of its ``top_k`` nearest prototypes.
+
+A decision is *confident* when the best score reaches ``threshold`` and
+beats the runner-up by at least ``margin``; otherwise the caller falls back
+to the LLM router. A confident ``DIRECT_ANSWER`` still needs an LLM call to
+produce the answer unless ``App.answer_cache`` has one, so callers only
+skip the routing call outright for the three verdict labels. ``embed``
+exposes the query vector so the answer cache can reuse it.
+
+The embedder is injected (``encode(texts) -> rows of floats``), keeping
+this module free of model and numpy dependencies.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+NEED_TOOLS = "NEED_TOOLS"
+ITINERARY_UPDATE = "ITINERARY_UPDATE"
+ITINERARY_ANALYZE = "ITINERARY_ANALYZE"
+DIRECT_ANSWER = "DIRECT_ANSWER"
+
+# Labels whose LLM routing call can be skipped entirely.
+VERDICT_LABELS = (NEED_TOOLS, ITINERARY_UPDATE, ITINERARY_ANALYZE)
+
+Encoder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+DEFAULT_PROTOTYPES: Dict[str, List[str]] = {
+	NEED_TOOLS: [
+		"明天天气怎么样？",
+		"这周末会下雨吗，气温多少度？",
+		"推荐几家评分高的海鲜餐厅",
+		"骑楼老街附近有什么酒店？",
+		"附近有没有便利店或者药店",
+		"从机场到市中心有多远？",
+		"帮我搜一下有哪些好玩的景点",
+		"万绿园和假日海滩之间的距离是多少",
+		"哪里有适合带孩子去的地方，具体地址是什么",
+		"博物馆在哪里，营业时间是几点",
+	],
+	ITINERARY_UPDATE: [
+		"帮我生成一个三天的行程表",
+		"把刚才推荐的地方整理成行程",
+		"请安排一下明天的日程",
+		"制定一份两日游的详细计划",
+		"根据我们聊的内容帮我排个行程",
+		"把第二天下午改成去海边，更新一下行程",
+		"给我做一个适合老人的一日游安排",
+	],
+	ITINERARY_ANALYZE: [
+		"我现在的行程安排合理吗？",
+		"帮我看看这个行程时间够不够",
+		"评估一下当前行程的路线是否顺路",
+		"分析一下我的行程表有什么问题",
+		"这个日程会不会太赶了",
+		"点评一下我的行程规划",
+	],
+	DIRECT_ANSWER: [
+		"这里有什么特色美食？",
+		"什么季节来旅游最合适？",
+		"当地有哪些风俗习惯需要注意",
+		"你好，你能做什么？",
+		"谢谢你的帮助",
+		"这座城市的历史文化有什么特点",
+		"旅游需要准备哪些物品",
+		"当地人说什么方言",
+	],
+}
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+	values = [float(x) for x in vector]
+	norm = math.sqrt(sum(x * x for x in values))
+	return [x / norm for x in values] if norm else values
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+	return sum(x * y for x, y in zip(a, b))
+
+
+class RouteDecision:
+	"""Outcome of one local classification."""
+
+	__slots__ = ("label", "score", "margin", "confident", "scores", "seconds")
+
+	def __init__(self, label: str, score: float, margin: float, confident: bool, scores: Dict[str, float], seconds: float):
+		self.label = label
+		self.score = score
+		self.margin = margin
+		self.confident = confident
+		self.scores = scores
+		self.seconds = seconds
+
+	def as_dict(self) -> Dict[str, Any]:
+		return {
+			"label": self.label,
+			"score": round(self.score, 4),
+			"margin": round(self.margin, 4),
+			"confident": self.confident,
+			"scores": {label: round(score, 4) for label, score in self.scores.items()},
+			"ms": round(self.seconds * 1000, 2),
+		}
+
+
+class IntentRouter:
+	"""Nearest-prototype intent classifier over sentence embeddings.
+
+	Prototype embeddings are computed once, on the first ``classify`` call.
+	"""
+
+	def __init__(
+		self,
+		encode: Encoder,
+		prototypes: Optional[Dict[str, List[str]]] = None,
+		threshold: float = 0.6,
+		margin: float = 0.05,
+		top_k: int = 3,
+	):
+		self.encode = encode
+		self.prototypes = prototypes or DEFAULT_PROTOTYPES
+		self.threshold = threshold
+		self.margin = margin
+		self.top_k = max(1, int(top_k))
+		self._vectors: Optional[Dict[str, List[List[float]]]] = None
+		self._lock = threading.Lock()
+		self._decisions: Dict[str, int] = {}
+		self._uncertain = 0
+		self._seconds = 0.0
+
+	def _prototype_vectors(self) -> Dict[str, List[List[float]]]:
+		if self._vectors is None:
+			with self._lock:
+				if self._vectors is None:
+					labels = [(label, text) for label, texts in self.prototypes.items() for text in texts]
+					rows = self.encode([text for _, text in labels])
+					vectors: Dict[str, List[List[float]]] = {}
+					for (label, _), row in zip(labels, rows):
+						vectors.setdefault(label, []).append(_normalize(row))
+					self._vectors = vectors
+		return self._vectors
+
+	def embed(self, text: str) -> List[float]:
+		"""Normalized embedding of ``text``; pass it to ``classify`` to reuse it."""
+		return _normalize(self.encode([text])[0])
+
+	def classify(self, text: str, vector: Optional[Sequence[float]] = None) -> RouteDecision:
+		"""Classify ``text``; ``vector`` (from ``embed``) skips encoding it again."""
+		started = time.perf_counter()
+		vectors = self._prototype_vectors()
+		query = self.embed(text) if vector is None else list(vector)
+		scores: Dict[str, float] = {}
+		for label, rows in vectors.items():
+			nearest = sorted((_dot(query, row) for row in rows), reverse=True)[:self.top_k]
+			scores[label] = sum(nearest) / len(nearest)
+		ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+		label, best = ranked[0]
+		runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+		confident = best >= self.threshold and best - runner_up >= self.margin
+		seconds = time.perf_counter() - started
+		with self._lock:
+			if confident:
+				self._decisions[label] = self._decisions.get(label, 0) + 1
+			else:
+				self._uncertain += 1
+			self._seconds += seconds
+		return RouteDecision(label, best, best - runner_up, confident, scores, seconds)
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			decided = sum(self._decisions.values())
+			total = decided + self._uncertain
+			return {
+				"classified": total,
+				"confident": dict(self._decisions),
+				"uncertain": self._uncertain,
+				"confident_ratio": round(decided / total, 4) if total else 0.0,
+				"mean_ms": round(self._seconds / total * 1000, 2) if total else 0.0,
+			}
+
+
+__all__ = [
+	"DEFAULT_PROTOTYPES",
+	"DIRECT_ANSWER",
+	"ITINERARY_ANALYZE",
+	"ITINERARY_UPDATE",
+	"IntentRouter",
+	"NEED_TOOLS",
+	"RouteDecision",
+	"VERDICT_LABELS",
+]
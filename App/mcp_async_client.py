@@ -0,0 +1,267 @@
+"""asyncio-native AMap client, the async twin of ``MCPClientWrapper``.
+
+All calls share one ``httpx.AsyncClient`` (HTTP/2 when the optional ``h2``
+package is installed, bounded connection pool), so several AMap calls can be
+fanned out with ``asyncio.gather`` inside one event loop::
+
+	async with AsyncMCPClientWrapper() as amap:
+		weather, hotels = await asyncio.gather(
+			amap.get_weather("海口"),
+			amap.search_pois("酒店", "海口"),
+		)
+
+Request building, caching, truncation and the remote-MCP circuit breaker are
+shared with the sync wrapper through ``_AMapClientBase``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from App.mcp_client_wrapper import _REJECTED, _AMapClientBase
+from App.mcp_session import AsyncMCPSession, MCPSessionError
+
+try:  # HTTP/2 needs the optional "h2" extra (httpx[http2])
+	import h2  # type: ignore  # noqa: F401
+	HTTP2_AVAILABLE = True
+except Exception:  # pragma: no cover - depends on environment
+	HTTP2_AVAILABLE = False
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncMCPClientWrapper(_AMapClientBase):
+	"""Async wrapper to call AMap tools via Remote MCP or direct REST."""
+
+	def __init__(
+		self,
+		api_key: Optional[str] = None,
+		timeout: float = 15.0,
+		enable_remote: bool = True,
+		max_connections: int = 50,
+		max_keepalive_connections: int = 20,
+		http2: bool = True,
+		client: Optional[httpx.AsyncClient] = None,
+		cache: Optional[Any] = None,
+		cache_ttls: Optional[Dict[str, float]] = None,
+		enable_cache: bool = True,
+		breaker_failure_threshold: int = 3,
+		breaker_reset_timeout: float = 30.0,
+		persistent_cache: Optional[Any] = None,
+		persistent_cache_path: Optional[str] = None,
+		list_limits: Optional[Dict[str, int]] = None,
+		projection_profiles: Optional[Dict[str, Any]] = None,
+		enable_projection: bool = True,
+		spatial_index: Optional[Any] = None,
+		enable_spatial_index: bool = True,
+		health_interval: float = 60.0,
+		negative_cache: Optional[Any] = None,
+		negative_cache_ttls: Optional[Dict[str, float]] = None,
+		location_grid: Optional[Dict[str, Dict[str, float]]] = None,
+	):
+		super().__init__(
+			api_key=api_key,
+			timeout=timeout,
+			enable_remote=enable_remote,
+			cache=cache,
+			cache_ttls=cache_ttls,
+			enable_cache=enable_cache,
+			breaker_failure_threshold=breaker_failure_threshold,
+			breaker_reset_timeout=breaker_reset_timeout,
+			persistent_cache=persistent_cache,
+			persistent_cache_path=persistent_cache_path,
+			list_limits=list_limits,
+			projection_profiles=projection_profiles,
+			enable_projection=enable_projection,
+			spatial_index=spatial_index,
+			enable_spatial_index=enable_spatial_index,
+			health_interval=health_interval,
+			negative_cache=negative_cache,
+			negative_cache_ttls=negative_cache_ttls,
+			location_grid=location_grid,
+		)
+		self._owns_client = client is None
+		self.http2 = bool(http2 and HTTP2_AVAILABLE) if client is None else None
+		self._client = client or httpx.AsyncClient(
+			http2=self.http2,
+			timeout=httpx.Timeout(timeout),
+			limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+		)
+		self._mcp_session = AsyncMCPSession(self._remote_url(), self._client, timeout=self.timeout)
+		self._health_task: Optional[asyncio.Task] = None
+
+	async def aclose(self) -> None:
+		"""Close the shared AsyncClient (only if this wrapper created it)."""
+		if self._owns_client:
+			await self._client.aclose()
+
+	async def __aenter__(self) -> "AsyncMCPClientWrapper":
+		return self
+
+	async def __aexit__(self, *exc_info) -> None:
+		await self.aclose()
+
+	async def _rest_get(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+		r = await self._client.get(url, params=params, timeout=self.timeout)
+		r.raise_for_status()
+		return r.json()
+
+	async def _call_remote_mcp_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		if not self.enable_remote:
+			return None
+		breaker = self._breaker(self.MCP_BASE_URL)
+		if not breaker.allow_request():
+			LOGGER.debug("Remote MCP circuit %s -> straight to REST", breaker.state)
+			self.metrics.record_error(self._local_names.get(tool_name, tool_name), "remote", "CircuitOpen")
+			return None
+		try:
+			data = await self._post_remote_tool(tool_name, arguments)
+		except Exception as e:
+			# Any failure (transport, or a malformed tool schema / result) must
+			# release the half-open probe slot and fall back to REST.
+			if isinstance(e, MCPSessionError):
+				LOGGER.debug("Remote MCP call failed -> fallback: %s", e)
+			else:
+				LOGGER.warning("Remote MCP call %s raised -> fallback: %r", tool_name, e)
+			self.metrics.record_error(self._local_names.get(tool_name, tool_name), "remote", e)
+			breaker.record_failure()
+			return None
+		except BaseException:
+			breaker.record_failure()  # e.g. the caller's own timeout; never leak the probe slot
+			raise
+		breaker.record_success()
+		return data
+
+	async def _post_remote_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		advertised = {t.get("name") for t in await self._mcp_session.list_tools()}
+		name = self._pick_remote_tool(tool_name, advertised)
+		schema = ((await self._mcp_session.tool(name)) or {}).get("inputSchema") or {}
+		data = await self._mcp_session.call_tool(name, self._remote_arguments(tool_name, arguments, schema))
+		if not isinstance(data, dict):
+			return None
+		return self._normalize_remote_result(tool_name, data)
+
+	async def _call(self, local_method: str, **params) -> Optional[Dict[str, Any]]:
+		started = time.monotonic()
+		local = self._answer_locally(local_method, params)
+		if local is not None:
+			self.metrics.record_call(local_method, "local", time.monotonic() - started)
+			return local
+		source, result = await self._resolve(local_method, self._canonicalize(local_method, params))
+		self.metrics.record_call(local_method, source, time.monotonic() - started)
+		return self._fit_radius(local_method, params, result)
+
+	async def _resolve(self, local_method: str, params: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+		cache_key, cached = self._cache_lookup(local_method, params)
+		if cached is not None:
+			return "cache", cached
+		negative_key, negative = self._negative_lookup(local_method, params)
+		if negative is not None:
+			return "negative", negative["value"]
+		result = await self._fetch(local_method, **params)
+		self._negative_store(local_method, negative_key, result)
+		if result is _REJECTED:
+			return "upstream", None
+		self._cache_store(local_method, cache_key, result)
+		self._observe(local_method, params, result)
+		return "upstream", result
+
+	async def _fetch(self, local_method: str, **params) -> Optional[Dict[str, Any]]:
+		remote_tool = self._remote_tool(local_method)
+		result: Optional[Dict[str, Any]] = None
+		if remote_tool:
+			started = time.monotonic()
+			remote_raw = await self._call_remote_mcp_tool(remote_tool, params)
+			if remote_raw:
+				self._observe_latency("remote", local_method, started)
+				result = remote_raw
+			elif self.enable_remote:
+				self.metrics.record_fallback(local_method)
+		if result is None:
+			started = time.monotonic()
+			try:
+				result = await self._rest_get(*self._rest_request(local_method, params))
+			except Exception as e:
+				LOGGER.error("REST fallback failed for %s: %s", local_method, e)
+				self.metrics.record_error(local_method, "rest", e)
+				return _REJECTED if self._is_client_error(e) else None
+			self._observe_latency("rest", local_method, started)
+			self._record_upstream_status("rest", local_method, result)
+		result = self._shape(local_method, result)
+		self._record_payload(local_method, result)
+		return result
+
+	def list_tools(self) -> Dict[str, Any]:
+		tools = super().list_tools()
+		tools["remote_session"] = {
+			"initialized": self._mcp_session.initialized,
+			"protocol_version": self._mcp_session.protocol_version,
+			"server_info": self._mcp_session.server_info,
+		}
+		tools["http2"] = self.http2
+		return tools
+
+	async def get_geo_location(self, address: str, city: str = "") -> Optional[Dict[str, Any]]:
+		return await self._call("get_geo_location", address=address, city=city)
+
+	async def get_regeocode(self, location: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_regeocode", location=location)
+
+	async def search_pois(self, keywords: str, city: str = "", page: int = 1, offset: int = 20) -> Optional[Dict[str, Any]]:
+		return await self._call("search_pois", keywords=keywords, city=city, page=page, offset=offset)
+
+	async def search_around(self, location: str, keywords: Optional[str] = None, types: str = "", radius: int = 1000, sortrule: str = "distance", page: int = 1, offset: int = 20) -> Optional[Dict[str, Any]]:
+		return await self._call("search_around", location=location, keywords=keywords, types=types, radius=radius, sortrule=sortrule, page=page, offset=offset)
+
+	async def get_poi_detail(self, poi_id: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_poi_detail", poi_id=poi_id)
+
+	async def get_weather(self, city: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_weather", city=city)
+
+	async def get_distance(self, origins: str, destination: str, type: str = "1") -> Optional[Dict[str, Any]]:  # noqa: A003
+		return await self._call("get_distance", origins=origins, destination=destination, type=type)
+
+	async def get_walking_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_walking_directions", origin=origin, destination=destination)
+
+	async def get_driving_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_driving_directions", origin=origin, destination=destination)
+
+	async def get_transit_directions(self, origin: str, destination: str, city: str, cityd: Optional[str] = None) -> Optional[Dict[str, Any]]:
+		return await self._call("get_transit_directions", origin=origin, destination=destination, city=city, cityd=cityd)
+
+	async def get_bicycling_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
+		return await self._call("get_bicycling_directions", origin=origin, destination=destination)
+
+	async def get_ip_location(self, ip: Optional[str] = None) -> Optional[Dict[str, Any]]:
+		return await self._call("get_ip_location", ip=ip)
+
+	async def _probe(self) -> Dict[str, Any]:
+		started = time.monotonic()
+		url, query = self._probe_request()
+		try:
+			r = await self._client.get(url, params=query, timeout=self._probe_timeout())
+			return self._record_health(started, r.status_code, r.json() if r.status_code == 200 else None)
+		except Exception as e:
+			return self._record_health(started, None, None, type(e).__name__)
+
+	async def health(self) -> Dict[str, Any]:
+		"""Async twin of ``MCPClientWrapper.health`` (background refresh is a task)."""
+		probe_now, refresh = self._health_plan()
+		if probe_now:
+			await self._probe()
+		elif refresh:
+			self._health_task = asyncio.get_running_loop().create_task(self._probe())
+		return self._health_view()
+
+	async def ping(self) -> bool:
+		return bool((await self.health())["ok"])
+
+
+__all__ = ["AsyncMCPClientWrapper", "HTTP2_AVAILABLE"]
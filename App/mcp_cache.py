@@ -0,0 +1,311 @@
+"""Response caches used by :class:`App.mcp_client_wrapper.MCPClientWrapper`.
+
+The wrapper only depends on the small ``get`` / ``set`` / ``clear`` /
+``stats`` surface below, so any object providing it (e.g. a Redis-backed
+implementation) can be plugged in via ``MCPClientWrapper(cache=...)``.
+``PersistentCache`` is the durable second tier used for data that never
+changes (geocodes, POI details) so recycled workers start warm.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, str]:
+	"""Normalize call params so equivalent calls share one cache key.
+
+	- ``None`` / empty-string values are dropped (they mean "not provided").
+	- Scalars are stringified (``radius=1000`` == ``radius="1000"``).
+	- Strings are stripped and ASCII letters lower-cased.
+	"""
+	normalized: Dict[str, str] = {}
+	for key, value in params.items():
+		if value is None:
+			continue
+		if isinstance(value, bool):
+			value = "1" if value else "0"
+		text = str(value).strip()
+		if not text:
+			continue
+		normalized[key] = text.lower()
+	return normalized
+
+
+def make_cache_key(tool: str, params: Dict[str, Any]) -> str:
+	"""Build a stable, order-independent key for ``tool`` + ``params``."""
+	normalized = normalize_params(params)
+	return f"{tool}:{json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+
+
+class ResponseCache:
+	"""In-memory LRU cache with per-entry TTL and entry / byte bounds.
+
+	Values are stored JSON-encoded: the stored size is exact and every hit
+	returns a fresh object, so callers may mutate results freely.
+	"""
+
+	def __init__(self, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024):
+		self.max_entries = max(1, int(max_entries))
+		self.max_bytes = max(1, int(max_bytes))
+		self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+		self._bytes = 0
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key: str, default: Any = None) -> Any:
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return default
+			expires_at, blob = entry
+			if expires_at <= now:
+				self._drop(key)
+				self.misses += 1
+				return default
+			self._entries.move_to_end(key)
+			self.hits += 1
+		return json.loads(blob)
+
+	def set(self, key: str, value: Any, ttl: float) -> bool:
+		"""Store ``value`` for ``ttl`` seconds. Returns False if not cacheable."""
+		if ttl <= 0:
+			return False
+		try:
+			blob = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+		except (TypeError, ValueError):
+			return False
+		if len(blob) > self.max_bytes:
+			return False
+		with self._lock:
+			if key in self._entries:
+				self._drop(key)
+			self._entries[key] = (time.monotonic() + ttl, blob)
+			self._bytes += len(blob)
+			while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+				oldest = next(iter(self._entries))
+				self._drop(oldest)
+				self.evictions += 1
+		return True
+
+	def delete(self, key: str) -> None:
+		with self._lock:
+			if key in self._entries:
+				self._drop(key)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self._bytes = 0
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"bytes": self._bytes,
+				"max_entries": self.max_entries,
+				"max_bytes": self.max_bytes,
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+			}
+
+	def _drop(self, key: str) -> None:
+		_, blob = self._entries.pop(key)
+		self._bytes -= len(blob)
+
+
+class PersistentCache:
+	"""Durable SQLite-backed cache shared by all worker processes.
+
+	The database runs in WAL mode, so readers never block the writer.
+	``busy_timeout`` absorbs writer contention between gunicorn workers.
+	Each process opens its own connection, and a connection inherited
+	through ``fork`` is reopened. Entries expire by wall-clock TTL. A
+	background compaction thread removes expired rows, then evicts the
+	least recently used rows beyond ``max_entries`` / ``max_bytes``.
+	"""
+
+	SCHEMA = (
+		"CREATE TABLE IF NOT EXISTS cache ("
+		" key TEXT PRIMARY KEY,"
+		" value BLOB NOT NULL,"
+		" size INTEGER NOT NULL,"
+		" expires_at REAL NOT NULL,"
+		" accessed_at REAL NOT NULL)",
+		"CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)",
+		"CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)",
+	)
+	# Only refresh accessed_at (a write) when it is older than this.
+	TOUCH_INTERVAL = 60.0
+
+	def __init__(
+		self,
+		path: str,
+		max_entries: int = 50000,
+		max_bytes: int = 64 * 1024 * 1024,
+		compact_interval: float = 300.0,
+		background: bool = True,
+	):
+		self.path = path
+		self.max_entries = max(1, int(max_entries))
+		self.max_bytes = max(1, int(max_bytes))
+		self.compact_interval = compact_interval
+		self.background = background
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+		self._pid: Optional[int] = None
+		self._compactor: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+		self.hits = 0
+		self.misses = 0
+		self.errors = 0
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+	def _connection(self) -> sqlite3.Connection:
+		if self._conn is None or self._pid != os.getpid():
+			conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("PRAGMA busy_timeout=5000")
+			for statement in self.SCHEMA:
+				conn.execute(statement)
+			self._conn = conn
+			self._pid = os.getpid()
+			self._compactor = None
+		return self._conn
+
+	def _ensure_compactor(self) -> None:
+		if not self.background or self._compactor is not None:
+			return
+		thread = threading.Thread(target=self._compact_loop, name="amap-cache-compactor", daemon=True)
+		self._compactor = thread
+		thread.start()
+
+	def _compact_loop(self) -> None:
+		while not self._stop.wait(self.compact_interval):
+			self.compact()
+
+	def get(self, key: str, default: Any = None) -> Any:
+		now = time.time()
+		try:
+			with self._lock:
+				conn = self._connection()
+				row = conn.execute("SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)).fetchone()
+				if row is None or row[1] <= now:
+					self.misses += 1
+					return default
+				if now - row[2] > self.TOUCH_INTERVAL:
+					conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+				self.hits += 1
+				blob = row[0]
+		except sqlite3.Error as e:
+			self.errors += 1
+			LOGGER.warning("Persistent cache read failed: %s", e)
+			return default
+		return json.loads(blob)
+
+	def set(self, key: str, value: Any, ttl: float) -> bool:
+		if ttl <= 0:
+			return False
+		try:
+			blob = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+		except (TypeError, ValueError):
+			return False
+		now = time.time()
+		try:
+			with self._lock:
+				self._connection().execute(
+					"INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+					(key, blob, len(blob), now + ttl, now),
+				)
+				self._ensure_compactor()
+		except sqlite3.Error as e:
+			self.errors += 1
+			LOGGER.warning("Persistent cache write failed: %s", e)
+			return False
+		return True
+
+	def delete(self, key: str) -> None:
+		with self._lock:
+			self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+	def clear(self) -> None:
+		with self._lock:
+			self._connection().execute("DELETE FROM cache")
+
+	def compact(self) -> int:
+		"""Drop expired rows, then LRU rows beyond the bounds. Returns rows removed."""
+		try:
+			with self._lock:
+				conn = self._connection()
+				conn.execute("BEGIN IMMEDIATE")
+				try:
+					removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+					count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+					if count > self.max_entries or total > self.max_bytes:
+						# Walk from least recently used until both bounds hold.
+						victims = []
+						for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC"):
+							if count <= self.max_entries and total <= self.max_bytes:
+								break
+							victims.append((key,))
+							count -= 1
+							total -= size
+						conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+						removed += len(victims)
+					conn.execute("COMMIT")
+				except Exception:
+					conn.execute("ROLLBACK")
+					raise
+				if removed:
+					conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+				return removed
+		except sqlite3.Error as e:
+			self.errors += 1
+			LOGGER.warning("Persistent cache compaction failed: %s", e)
+			return 0
+
+	def close(self) -> None:
+		self._stop.set()
+		with self._lock:
+			if self._conn is not None and self._pid == os.getpid():
+				self._conn.close()
+			self._conn = None
+
+	def stats(self) -> Dict[str, Any]:
+		try:
+			with self._lock:
+				count, total = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+		except sqlite3.Error:
+			count, total = None, None
+		lookups = self.hits + self.misses
+		return {
+			"path": self.path,
+			"entries": count,
+			"bytes": total,
+			"max_entries": self.max_entries,
+			"max_bytes": self.max_bytes,
+			"hits": self.hits,
+			"misses": self.misses,
+			"errors": self.errors,
+			"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+		}
+
+
+__all__ = ["ResponseCache", "PersistentCache", "make_cache_key", "normalize_params"]
@@ -9,15 +9,35 @@ from __future__ import annotations
 import os
 import json
 import logging
-from typing import Any, Dict, Optional
+import threading
+import time
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 try:  # Lazy optional import (python-dotenv is in requirements)
 	from dotenv import load_dotenv  # type: ignore
 	load_dotenv(override=False)
 except Exception:  # pragma: no cover
 	pass
 
+from App.mcp_cache import PersistentCache, ResponseCache, make_cache_key
+from App.mcp_metrics import MetricsRegistry
+from App.mcp_projection import DEFAULT_PROFILES, project
+from App.mcp_resilience import (
+	CircuitBreaker,
+	LatencyHistogram,
+	RateLimiter,
+	RetryPolicy,
+	SingleFlight,
+	call_options,
+	current_call_options,
+)
+from App.mcp_session import MCPSession, MCPSessionError
+from App.mcp_spatial import SpatialIndex, bucket_radius, haversine_m, parse_location, snap_location
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -25,10 +45,16 @@ class MCPClientError(Exception):
 	"""Custom exception for MCP client failures."""
 
 
-class MCPClientWrapper:
-	"""High-level wrapper to call AMap tools via Remote MCP or direct REST."""
+# Returned by the REST leg when AMap rejects the request itself (HTTP 4xx
+# other than 429): no point retrying, the lookup is negatively cached.
+_REJECTED: Any = object()
+
+
+class _AMapClientBase:
+	"""State and request building shared by the sync and async AMap clients."""
 
 	MCP_BASE_URL = "https://mcp.amap.com/mcp"
+	REST_BASE_URL = "https://restapi.amap.com"
 
 	TOOL_NAME_MAP = {
 		"get_geo_location": "maps_geocode",
@@ -45,7 +71,137 @@ class MCPClientWrapper:
 		"get_ip_location": "maps_ip_location",
 	}
 
-	def __init__(self, api_key: Optional[str] = None, timeout: float = 15.0, enable_remote: bool = True):
+	# Official AMap MCP server tool names, tried when the mapped name above is
+	# not advertised by ``tools/list``.
+	REMOTE_TOOL_ALIASES = {
+		"maps_geocode": ("maps_geo",),
+		"maps_detail_search": ("maps_search_detail",),
+		"maps_direction_transit": ("maps_direction_transit_integrated",),
+		"maps_direction_bicycling": ("maps_bicycling",),
+	}
+
+	# Local methods served by REST even when the remote tool is advertised:
+	# the official search tools return only id/name/address, without the
+	# location, type, tel, biz_ext, photos and distance that the app's
+	# formatters and the spatial index rely on.
+	REST_ONLY_METHODS = frozenset({"search_pois", "search_around"})
+
+	# Local parameter name -> remote tool argument name.
+	REMOTE_ARG_RENAMES = {
+		"maps_detail_search": {"poi_id": "id"},
+	}
+
+	# REST fallback per local method: (path, fixed query params). Call params
+	# are sent as-is except empty ones, which AMap treats as "not provided".
+	# Place search uses v3 ('offset' & 'page' instead of v5 'page_size' & 'page_num').
+	REST_ENDPOINTS = {
+		"get_geo_location": ("/v3/geocode/geo", {}),
+		"get_regeocode": ("/v3/geocode/regeo", {"extensions": "all"}),
+		"search_pois": ("/v3/place/text", {}),
+		"search_around": ("/v3/place/around", {}),
+		"get_poi_detail": ("/v5/place/detail", {}),
+		"get_weather": ("/v3/weather/weatherInfo", {"extensions": "all"}),
+		"get_distance": ("/v3/distance", {}),
+		"get_walking_directions": ("/v3/direction/walking", {}),
+		"get_driving_directions": ("/v3/direction/driving", {"extensions": "all"}),
+		"get_transit_directions": ("/v3/direction/transit/integrated", {}),
+		"get_bicycling_directions": ("/v4/direction/bicycling", {}),
+		"get_ip_location": ("/v3/ip", {}),
+	}
+
+	# Local parameter name -> REST query parameter name.
+	REST_PARAM_RENAMES = {
+		"get_poi_detail": {"poi_id": "ids"},
+	}
+
+	# Default cache TTL (seconds) per local method; 0 / missing = not cached.
+	DEFAULT_CACHE_TTLS = {
+		"get_geo_location": 24 * 3600,
+		"get_regeocode": 24 * 3600,
+		"get_poi_detail": 6 * 3600,
+		"search_pois": 3600,
+		"get_weather": 600,
+		"get_distance_matrix": 6 * 3600,
+		"search_around": 1800,
+		"get_walking_directions": 3600,
+		"get_bicycling_directions": 3600,
+		"get_transit_directions": 1800,
+		"get_driving_directions": 600,
+	}
+
+	# Coordinates are snapped to a per-tool grid (meters) before the cache
+	# lookup and the upstream request, so calls a few meters apart share
+	# one entry; search_around radii are rounded up to RADIUS_BUCKETS.
+	LOCATION_GRID_METERS = {
+		"search_around": {"location": 50},
+		"get_regeocode": {"location": 10},
+		"get_distance": {"origins": 20, "destination": 20},
+		"get_walking_directions": {"origin": 20, "destination": 20},
+		"get_driving_directions": {"origin": 20, "destination": 20},
+		"get_transit_directions": {"origin": 20, "destination": 20},
+		"get_bicycling_directions": {"origin": 20, "destination": 20},
+	}
+	RADIUS_BUCKETS = (100, 200, 300, 500, 800, 1000, 1500, 2000, 3000, 5000, 10000, 20000, 50000)
+
+	# Short TTLs for remembering lookups that found nothing (empty result,
+	# AMap parameter error 2xxxx, HTTP 4xx) so bad queries repeated by the
+	# reasoning loop do not spend quota again.
+	DEFAULT_NEGATIVE_TTLS = {
+		"get_geo_location": 300,
+		"get_regeocode": 300,
+		"search_pois": 300,
+		"search_around": 120,
+		"get_poi_detail": 300,
+	}
+
+	# Field that must be non-empty for a status=1 answer to count as a hit;
+	# checked on REST payloads and on remote results after normalization.
+	RESULT_FIELDS = {
+		"get_geo_location": "geocodes",
+		"get_regeocode": "regeocode",
+		"search_pois": "pois",
+		"search_around": "pois",
+		"get_poi_detail": "pois",
+	}
+
+	# Tools whose answers practically never change are also kept in the
+	# persistent (SQLite) tier with these TTLs, surviving worker recycling.
+	PERSISTENT_CACHE_TTLS = {
+		"get_geo_location": 30 * 24 * 3600,
+		"get_regeocode": 30 * 24 * 3600,
+		"get_poi_detail": 7 * 24 * 3600,
+	}
+
+	# Liveness probe: the smallest authenticated REST call, with a short timeout.
+	HEALTH_PROBE_PATH = "/v3/ip"
+	HEALTH_PROBE_TIMEOUT = 3.0
+
+	# Max items kept in any list of a tool response; 0 disables truncation.
+	DEFAULT_LIST_LIMIT = 10
+	LIST_LIMITS: Dict[str, int] = {}
+
+	def __init__(
+		self,
+		api_key: Optional[str] = None,
+		timeout: float = 15.0,
+		enable_remote: bool = True,
+		cache: Optional[Any] = None,
+		cache_ttls: Optional[Dict[str, float]] = None,
+		enable_cache: bool = True,
+		breaker_failure_threshold: int = 3,
+		breaker_reset_timeout: float = 30.0,
+		persistent_cache: Optional[Any] = None,
+		persistent_cache_path: Optional[str] = None,
+		list_limits: Optional[Dict[str, int]] = None,
+		projection_profiles: Optional[Dict[str, Any]] = None,
+		enable_projection: bool = True,
+		spatial_index: Optional[Any] = None,
+		enable_spatial_index: bool = True,
+		health_interval: float = 60.0,
+		negative_cache: Optional[Any] = None,
+		negative_cache_ttls: Optional[Dict[str, float]] = None,
+		location_grid: Optional[Dict[str, Dict[str, float]]] = None,
+	):
 		self.api_key = (
 			api_key
 			or os.getenv("AMAP_API_KEY")
@@ -57,192 +213,1165 @@ class MCPClientWrapper:
 			)
 		self.timeout = timeout
 		self.enable_remote = enable_remote
+		# Pluggable response cache (anything with get/set/clear/stats).
+		self.cache = (cache if cache is not None else ResponseCache()) if enable_cache else None
+		self.cache_ttls = dict(self.DEFAULT_CACHE_TTLS)
+		if cache_ttls:
+			self.cache_ttls.update(cache_ttls)
+		# Separately sized short-TTL cache for empty / rejected lookups.
+		self.negative_cache = (negative_cache if negative_cache is not None else ResponseCache(max_entries=256, max_bytes=256 * 1024)) if enable_cache else None
+		self.negative_cache_ttls = dict(self.DEFAULT_NEGATIVE_TTLS)
+		if negative_cache_ttls:
+			self.negative_cache_ttls.update(negative_cache_ttls)
+		self.location_grid = dict(self.LOCATION_GRID_METERS)
+		if location_grid is not None:
+			self.location_grid.update(location_grid)
+		# Optional durable tier (explicit object, path, or AMAP_CACHE_DB env var).
+		persistent_cache_path = persistent_cache_path or os.getenv("AMAP_CACHE_DB")
+		if persistent_cache is None and persistent_cache_path and enable_cache:
+			persistent_cache = PersistentCache(persistent_cache_path)
+		self.persistent_cache = persistent_cache if enable_cache else None
+		self.list_limits = dict(self.LIST_LIMITS)
+		if list_limits:
+			self.list_limits.update(list_limits)
+		# Per-tool field projection applied right after decode (see App.mcp_projection).
+		self.projection_profiles = dict(DEFAULT_PROFILES) if enable_projection else {}
+		if projection_profiles and enable_projection:
+			self.projection_profiles.update(projection_profiles)
+		# POIs seen in search results; answers repeated search_around locally.
+		self.spatial_index = (spatial_index if spatial_index is not None else SpatialIndex()) if enable_spatial_index else None
+		# One circuit breaker per remote endpoint: after repeated failures the
+		# remote-first attempt is skipped (straight to REST) for a cool-down.
+		self.breaker_failure_threshold = breaker_failure_threshold
+		self.breaker_reset_timeout = breaker_reset_timeout
+		self._breakers: Dict[str, CircuitBreaker] = {}
+		self._breakers_lock = threading.Lock()
+		if self.enable_remote:
+			self._breaker(self.MCP_BASE_URL)
+		# Per-tool latency / fallback / error / payload metrics (see metrics_snapshot).
+		self.metrics = MetricsRegistry()
+		self._local_names = {remote: local for local, remote in self.TOOL_NAME_MAP.items()}
+		# Cached liveness result, refreshed in the background once older
+		# than health_interval seconds (see health()).
+		self.health_interval = health_interval
+		self._health: Optional[Dict[str, Any]] = None
+		self._health_at = 0.0
+		self._health_refreshing = False
+		self._health_lock = threading.Lock()
 
 	def _remote_url(self) -> str:
 		return f"{self.MCP_BASE_URL}?key={self.api_key}"
 
+	def _rest_request(self, local_method: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+		"""Return ``(url, query)`` for the REST fallback of ``local_method``."""
+		path, fixed = self.REST_ENDPOINTS[local_method]
+		renames = self.REST_PARAM_RENAMES.get(local_method, {})
+		query: Dict[str, Any] = {renames.get(k, k): v for k, v in params.items() if v is not None and v != ""}
+		query.update(fixed)
+		query["key"] = self.api_key
+		return f"{self.REST_BASE_URL}{path}", query
+
+	def _remote_arguments(self, tool_name: str, arguments: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+		"""Rename/filter local params to what the remote tool's inputSchema accepts."""
+		renames = self.REMOTE_ARG_RENAMES.get(tool_name, {})
+		args = {renames.get(k, k): v for k, v in arguments.items() if v is not None and v != ""}
+		allowed = schema.get("properties")
+		if allowed:
+			args = {k: v if isinstance(v, str) else str(v) for k, v in args.items() if k in allowed}
+		return args
+
+	def _remote_tool(self, local_method: str) -> Optional[str]:
+		"""Remote tool for ``local_method``, or None when it must go to REST."""
+		if local_method in self.REST_ONLY_METHODS:
+			return None
+		return self.TOOL_NAME_MAP.get(local_method)
+
+	def _pick_remote_tool(self, tool_name: str, advertised: Set[str]) -> str:
+		if not advertised or tool_name in advertised:
+			return tool_name
+		for alias in self.REMOTE_TOOL_ALIASES.get(tool_name, ()):
+			if alias in advertised:
+				return alias
+		return tool_name
+
+	# Business fields the remote detail tool returns at the top level; REST
+	# nests them under ``biz_ext``.
+	_REMOTE_BIZ_FIELDS = ("rating", "cost", "opentime2", "open_time", "level")
+
+	@classmethod
+	def _normalize_remote_result(cls, tool_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+		"""Reshape MCP tool output to the REST payload of the same local method.
+
+		The remote tools return trimmed, mostly flat JSON without the REST
+		``status``/``info``/``infocode`` envelope; caching, negative caching,
+		projection and the app's formatters all expect the REST shape.
+		Payloads that already carry ``status`` are returned unchanged.
+		"""
+		if "status" in data or "errcode" in data:
+			return data
+		if tool_name == "maps_direction_bicycling":
+			# REST v4 bicycling: {"errcode": 0, "errmsg": "OK", "data": {...}}
+			route = data.get("data") if isinstance(data.get("data"), dict) else data
+			return {"errcode": 0, "errmsg": "OK", "data": route}
+		if set(data) == {"data"} and isinstance(data["data"], dict):
+			data = data["data"]
+		out: Dict[str, Any] = {"status": "1", "info": "OK", "infocode": "10000"}
+		if tool_name == "maps_weather":
+			forecasts = data.get("forecasts") or []
+			if forecasts and "casts" not in forecasts[0]:
+				forecasts = [{"city": data.get("city", ""), "casts": forecasts}]
+			out["forecasts"] = forecasts
+		elif tool_name == "maps_geocode":
+			geocodes = data.get("geocodes", data.get("results", data.get("return"))) or []
+			out.update(count=str(len(geocodes)), geocodes=geocodes)
+		elif tool_name == "maps_regeocode":
+			if "regeocode" in data:
+				out["regeocode"] = data["regeocode"]
+			elif data:
+				component = {
+					"province": data.get("province", data.get("provice", "")),
+					"city": data.get("city", ""),
+					"district": data.get("district", ""),
+				}
+				address = data.get("formatted_address") or "".join(v for v in component.values() if isinstance(v, str))
+				out["regeocode"] = {"formatted_address": address, "addressComponent": component}
+		elif tool_name in ("maps_text_search", "maps_around_search"):
+			# No ``count``: the page length says nothing about the total number of matches.
+			out["pois"] = data.get("pois") or []
+			suggestion = data.get("suggestion")
+			if tool_name == "maps_text_search" and isinstance(suggestion, dict):
+				out["suggestion"] = {
+					"keywords": suggestion.get("keywords") or [],
+					"cities": suggestion.get("cities", suggestion.get("ciytes")) or [],
+				}
+		elif tool_name == "maps_detail_search":
+			pois = data.get("pois")
+			if pois is None:
+				poi = {k: v for k, v in data.items() if k not in cls._REMOTE_BIZ_FIELDS}
+				if "city" in poi and "cityname" not in poi:
+					poi["cityname"] = poi.pop("city")
+				biz_ext = {k: data[k] for k in cls._REMOTE_BIZ_FIELDS if k in data}
+				if biz_ext and "biz_ext" not in poi:
+					poi["biz_ext"] = biz_ext
+				pois = [poi] if poi.get("id") or poi.get("name") else []
+			out.update(count=str(len(pois)), pois=pois)
+		elif tool_name == "maps_distance":
+			results = data.get("results") or []
+			out.update(count=str(len(results)), results=results)
+		elif tool_name in ("maps_direction_walking", "maps_direction_driving", "maps_direction_transit"):
+			route = data.get("route") if isinstance(data.get("route"), dict) else data
+			out.update(count="1" if route else "0", route=route)
+		else:  # maps_ip_location and unknown tools: REST is flat as well
+			out.update(data)
+		return out
+
+	def _list_limit(self, local_method: str) -> int:
+		return int(self.list_limits.get(local_method, self.DEFAULT_LIST_LIMIT))
+
+	def _shape(self, local_method: str, data: Any) -> Any:
+		"""Trim a freshly decoded response: list truncation, then field projection."""
+		data = self._truncate_list_fields(data, self._list_limit(local_method))
+		profile = self.projection_profiles.get(local_method)
+		return project(data, profile) if profile else data
+
+	def _truncate_list_fields(self, data: Any, limit: Optional[int] = None) -> Any:
+		"""Truncate every list in ``data`` (including nested ones) to ``limit`` items.
+
+		``data`` is a freshly decoded response owned by the caller, so lists
+		are trimmed in place: each list is sliced *before* its elements are
+		visited and dropped elements are never walked or copied. Returns
+		``data`` for convenience.
+		"""
+		limit = self.DEFAULT_LIST_LIMIT if limit is None else limit
+		if limit <= 0:
+			return data
+		stack = [data]
+		while stack:
+			node = stack.pop()
+			if isinstance(node, list):
+				if len(node) > limit:
+					del node[limit:]
+				children = node
+			elif isinstance(node, dict):
+				children = node.values()
+			else:
+				continue
+			stack.extend(c for c in children if isinstance(c, (list, dict)))
+		return data
+
+	def _cache_lookup(self, local_method: str, params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+		"""Return ``(cache_key, cached_value)``; key is None if the tool is not cached."""
+		cache_key = self._cache_key(local_method, params)
+		if cache_key is None:
+			return None, None
+		cached = self.cache.get(cache_key)
+		if cached is None and self._persists(local_method):
+			cached = self.persistent_cache.get(cache_key)
+			if cached is not None:  # promote to the memory tier
+				self.cache.set(cache_key, cached, self.cache_ttls.get(local_method, 0))
+		return cache_key, cached
+
+	def _persists(self, local_method: str) -> bool:
+		return self.persistent_cache is not None and local_method in self.PERSISTENT_CACHE_TTLS
+
+	def _cache_key(self, local_method: str, params: Dict[str, Any]) -> Optional[str]:
+		"""Cache key for a call, or None when the tool is not cached."""
+		ttl = self.cache_ttls.get(local_method, 0) if self.cache is not None else 0
+		return make_cache_key(local_method, params) if ttl > 0 else None
+
+	def _cache_store(self, local_method: str, cache_key: Optional[str], result: Optional[Dict[str, Any]]) -> None:
+		if cache_key is None or result is None or result is _REJECTED:
+			return
+		if str(result.get("status", "1")) != "1" or self._is_negative(local_method, result):
+			return  # errors / empty answers only go to the negative cache
+		self.cache.set(cache_key, result, self.cache_ttls.get(local_method, 0))
+		if self._persists(local_method):
+			self.persistent_cache.set(cache_key, result, self.PERSISTENT_CACHE_TTLS[local_method])
+
+	def _canonicalize(self, local_method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+		"""Snap coordinates (and bucket the radius) as configured for ``local_method``."""
+		grid = self.location_grid.get(local_method)
+		if not grid:
+			return params
+		canonical = dict(params)
+		for field, meters in grid.items():
+			canonical[field] = snap_location(canonical.get(field), meters)
+		if local_method == "search_around" and canonical.get("radius") not in (None, ""):
+			canonical["radius"] = bucket_radius(canonical["radius"], self.RADIUS_BUCKETS)
+		return canonical
+
+	def _fit_radius(self, local_method: str, requested: Dict[str, Any], result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+		"""Drop POIs a bucketed search_around returned beyond the requested radius."""
+		if local_method != "search_around" or not isinstance(result, dict) or not self.location_grid.get(local_method):
+			return result
+		try:
+			radius = float(requested.get("radius"))
+		except (TypeError, ValueError):
+			return result
+		pois = result.get("pois")
+		if not isinstance(pois, list):
+			return result
+		kept = [p for p in pois if not self._beyond(p, radius)]
+		if len(kept) == len(pois):
+			return result
+		fitted = dict(result, pois=kept)
+		try:
+			if int(result.get("count")) <= len(pois):  # complete answer: count stays exact
+				fitted["count"] = str(len(kept))
+		except (TypeError, ValueError):
+			pass
+		return fitted
+
+	@staticmethod
+	def _beyond(poi: Any, radius: float) -> bool:
+		try:
+			return float(poi.get("distance")) > radius
+		except (AttributeError, TypeError, ValueError):
+			return False
+
+	def _is_negative(self, local_method: str, result: Any) -> bool:
+		"""True for a rejected request, an AMap parameter error or an empty answer."""
+		if result is _REJECTED:
+			return True
+		if not isinstance(result, dict) or "status" not in result:
+			return False  # only REST-shaped (or normalized remote) payloads can be judged empty
+		status = str(result["status"])
+		if status != "1":
+			return str(result.get("infocode", "")).startswith("2")
+		field = self.RESULT_FIELDS.get(local_method)
+		return field is not None and not result.get(field)
+
+	def _negative_lookup(self, local_method: str, params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+		"""Return ``(key, entry)``; ``entry["value"]`` is what the call returned last time."""
+		if self.negative_cache is None or self.negative_cache_ttls.get(local_method, 0) <= 0:
+			return None, None
+		key = make_cache_key(local_method, params)
+		return key, self.negative_cache.get(key)
+
+	def _negative_store(self, local_method: str, key: Optional[str], result: Any) -> None:
+		if key is not None and self._is_negative(local_method, result):
+			value = None if result is _REJECTED else result
+			self.negative_cache.set(key, {"value": value}, self.negative_cache_ttls[local_method])
+
+	@staticmethod
+	def _is_client_error(error: Exception) -> bool:
+		status = getattr(getattr(error, "response", None), "status_code", None)
+		return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+	@staticmethod
+	def _around_query_key(params: Dict[str, Any]) -> str:
+		return make_cache_key("search_around", {"keywords": params.get("keywords"), "types": params.get("types")})
+
+	def _answer_locally(self, local_method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""Serve page 1 of a distance-sorted ``search_around`` from the spatial index."""
+		if self.spatial_index is None or local_method != "search_around":
+			return None
+		if str(params.get("page") or 1) != "1" or (params.get("sortrule") or "distance") != "distance":
+			return None
+		center = parse_location(params.get("location"))
+		try:
+			radius = float(params.get("radius") or 1000)
+		except (TypeError, ValueError):
+			return None
+		if center is None:
+			return None
+		pois = self.spatial_index.query(self._around_query_key(params), center, radius)
+		if pois is None:
+			return None
+		size = int(params.get("offset") or 20)
+		limit = self._list_limit(local_method)
+		if limit > 0:
+			size = min(size, limit)
+		return {"status": "1", "info": "OK", "infocode": "10000", "count": str(len(pois)), "pois": pois[:size]}
+
+	def _observe(self, local_method: str, params: Dict[str, Any], result: Optional[Dict[str, Any]]) -> None:
+		"""Feed POIs from a fresh search result into the spatial index.
+
+		A page-1 ``search_around`` also records coverage: the query radius
+		if AMap returned every match, otherwise (distance-sorted) the
+		distance to the farthest POI returned. No coverage is recorded
+		unless every returned POI was indexed, nor when ``count`` is missing.
+		"""
+		if self.spatial_index is None or not isinstance(result, dict) or str(result.get("status")) != "1":
+			return
+		if local_method not in ("search_pois", "search_around"):
+			return
+		pois = [p for p in result.get("pois") or [] if isinstance(p, dict)]
+		if local_method == "search_pois":
+			self.spatial_index.add(pois)
+			return
+		key = self._around_query_key(params)
+		self.spatial_index.add(pois, key)
+		center = parse_location(params.get("location"))
+		if center is None or str(params.get("page") or 1) != "1":
+			return
+		points = [parse_location(p.get("location")) for p in pois]
+		if any(not p.get("id") or pt is None for p, pt in zip(pois, points)):
+			return  # SpatialIndex.add skipped these, so the circle would have holes
+		try:
+			radius = float(params.get("radius") or 1000)
+			complete = int(result.get("count")) <= len(pois)
+		except (TypeError, ValueError):
+			return
+		if not complete:
+			if (params.get("sortrule") or "distance") != "distance" or not points:
+				return
+			# POIs tied with the farthest one may be missing: stay strictly inside.
+			radius = min(radius, max(haversine_m(center, pt) for pt in points) - 1.0)
+		self.spatial_index.record_coverage(key, center, radius)
+
+	def _breaker(self, endpoint: str) -> CircuitBreaker:
+		breaker = self._breakers.get(endpoint)
+		if breaker is None:
+			with self._breakers_lock:
+				breaker = self._breakers.get(endpoint)
+				if breaker is None:
+					breaker = CircuitBreaker(endpoint, self.breaker_failure_threshold, self.breaker_reset_timeout)
+					self._breakers[endpoint] = breaker
+		return breaker
+
+	def list_tools(self) -> Dict[str, Any]:
+		return {
+			"available_tools": list(self.TOOL_NAME_MAP.keys()),
+			"remote_mapping": self.TOOL_NAME_MAP,
+			"remote_enabled": self.enable_remote,
+			"circuit_breakers": self.breaker_states(),
+			"spatial_index": self.spatial_index.stats() if self.spatial_index is not None else None,
+		}
+
+	def _latency_histogram(self, path: str, local_method: str) -> LatencyHistogram:
+		return self.metrics.histogram(path, local_method)
+
+	def _observe_latency(self, path: str, local_method: str, started: float) -> None:
+		self.metrics.observe_latency(path, local_method, time.monotonic() - started)
+
+	def latency_stats(self) -> Dict[str, Any]:
+		"""Latency snapshot per ``"<path>:<tool>"`` (remote / rest / call)."""
+		return {
+			f"{path}:{tool}": stats
+			for tool, metrics in self.metrics.snapshot().items()
+			for path, stats in metrics["latency"].items()
+		}
+
+	def metrics_snapshot(self) -> Dict[str, Any]:
+		"""Per-tool metrics plus the response-cache counters."""
+		return {"tools": self.metrics.snapshot(), "cache": self.cache_stats()}
+
+	def add_metrics_hook(self, hook: Callable[[Dict[str, Any]], None]) -> None:
+		"""Call ``hook(event)`` for every metrics event (see App.mcp_metrics)."""
+		self.metrics.add_hook(hook)
+
+	def _record_payload(self, local_method: str, result: Any) -> None:
+		try:
+			size = len(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+		except (TypeError, ValueError):
+			return
+		self.metrics.record_payload(local_method, size)
+
+	def _record_upstream_status(self, path: str, local_method: str, result: Any) -> None:
+		"""Count AMap-level failures (HTTP 200 with status != 1) by infocode."""
+		if isinstance(result, dict) and "status" in result and str(result.get("status")) != "1":
+			self.metrics.record_error(local_method, path, f"infocode_{result.get('infocode') or 'unknown'}")
+
+	def _probe_request(self) -> Tuple[str, Dict[str, Any]]:
+		return f"{self.REST_BASE_URL}{self.HEALTH_PROBE_PATH}", {"key": self.api_key}
+
+	def _probe_timeout(self) -> float:
+		return min(self.HEALTH_PROBE_TIMEOUT, self.timeout)
+
+	def _record_health(self, started: float, status_code: Optional[int], payload: Any, error: Optional[str] = None) -> Dict[str, Any]:
+		ok = error is None and status_code == 200 and isinstance(payload, dict) and str(payload.get("status")) == "1"
+		if not ok and error is None:
+			error = f"HTTP {status_code}" if status_code != 200 else f"infocode_{(payload or {}).get('infocode') or 'unknown'}"
+		health = {
+			"ok": ok,
+			"error": error,
+			"latency": round(time.monotonic() - started, 4),
+			"checked_at": time.time(),
+		}
+		with self._health_lock:
+			self._health = health
+			self._health_at = time.monotonic()
+			self._health_refreshing = False
+		return health
+
+	def _health_plan(self) -> Tuple[bool, bool]:
+		"""Return ``(probe_now, refresh_in_background)`` for a health() call."""
+		with self._health_lock:
+			if self._health is None:
+				return True, False
+			if self._health_refreshing or time.monotonic() - self._health_at < self.health_interval:
+				return False, False
+			self._health_refreshing = True
+			return False, True
+
+	def _health_view(self) -> Dict[str, Any]:
+		with self._health_lock:
+			health = dict(self._health or {"ok": False, "error": "not checked"})
+			health["age"] = round(time.monotonic() - self._health_at, 3) if self._health is not None else None
+		if self.enable_remote:
+			health["remote_circuit"] = self._breaker(self.MCP_BASE_URL).state
+		return health
+
+	def breaker_states(self) -> Dict[str, Any]:
+		"""Snapshot of every remote endpoint circuit breaker."""
+		return {endpoint: breaker.snapshot() for endpoint, breaker in list(self._breakers.items())}
+
+	def cache_stats(self) -> Dict[str, Any]:
+		"""Return hit/miss counters and size of the response cache."""
+		if self.cache is None:
+			return {"enabled": False}
+		stats = dict(self.cache.stats())
+		stats["enabled"] = True
+		stats["ttls"] = dict(self.cache_ttls)
+		stats["negative"] = dict(self.negative_cache.stats(), ttls=dict(self.negative_cache_ttls))
+		if self.persistent_cache is not None:
+			stats["persistent"] = self.persistent_cache.stats()
+		return stats
+
+	def clear_cache(self) -> None:
+		if self.cache is not None:
+			self.cache.clear()
+		if self.negative_cache is not None:
+			self.negative_cache.clear()
+		if self.persistent_cache is not None:
+			self.persistent_cache.clear()
+
+	@staticmethod
+	def call_options(priority: Optional[str] = None, budget: Optional[float] = None, deadline: Optional[float] = None):
+		"""Context manager scoping priority ("interactive"/"background") and a
+		time budget for all calls made inside it, e.g.::
+
+			with mcp_client.call_options(priority="background", budget=5):
+				mcp_client.search_pois("酒店", "海口")
+		"""
+		return call_options(priority=priority, budget=budget, deadline=deadline)
+
+
+class MCPClientWrapper(_AMapClientBase):
+	"""High-level wrapper to call AMap tools via Remote MCP or direct REST."""
+
+	def __init__(
+		self,
+		api_key: Optional[str] = None,
+		timeout: float = 15.0,
+		enable_remote: bool = True,
+		rest_pool_size: int = 20,
+		remote_pool_size: int = 10,
+		cache: Optional[Any] = None,
+		cache_ttls: Optional[Dict[str, float]] = None,
+		enable_cache: bool = True,
+		breaker_failure_threshold: int = 3,
+		breaker_reset_timeout: float = 30.0,
+		persistent_cache: Optional[Any] = None,
+		persistent_cache_path: Optional[str] = None,
+		list_limits: Optional[Dict[str, int]] = None,
+		projection_profiles: Optional[Dict[str, Any]] = None,
+		enable_projection: bool = True,
+		spatial_index: Optional[Any] = None,
+		enable_spatial_index: bool = True,
+		health_interval: float = 60.0,
+		negative_cache: Optional[Any] = None,
+		negative_cache_ttls: Optional[Dict[str, float]] = None,
+		location_grid: Optional[Dict[str, Dict[str, float]]] = None,
+		coalesce_requests: bool = True,
+		rate_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+		default_rate_limit: Tuple[float, float] = (10.0, 10.0),
+		enable_rate_limit: bool = True,
+		rate_limit_queue_size: int = 32,
+		retry_policy: Optional[RetryPolicy] = None,
+		max_concurrency: int = 8,
+		hedge_requests: bool = False,
+		hedge_delay: Optional[float] = None,
+	):
+		super().__init__(
+			api_key=api_key,
+			timeout=timeout,
+			enable_remote=enable_remote,
+			cache=cache,
+			cache_ttls=cache_ttls,
+			enable_cache=enable_cache,
+			breaker_failure_threshold=breaker_failure_threshold,
+			breaker_reset_timeout=breaker_reset_timeout,
+			persistent_cache=persistent_cache,
+			persistent_cache_path=persistent_cache_path,
+			list_limits=list_limits,
+			projection_profiles=projection_profiles,
+			enable_projection=enable_projection,
+			spatial_index=spatial_index,
+			enable_spatial_index=enable_spatial_index,
+			health_interval=health_interval,
+			negative_cache=negative_cache,
+			negative_cache_ttls=negative_cache_ttls,
+			location_grid=location_grid,
+		)
+		# One keep-alive session per upstream host so remote MCP and REST
+		# traffic never compete for the same connection pool. Sessions are
+		# shared by all callers (threads / gevent greenlets) of this wrapper.
+		self._remote_session = self._build_session(self.MCP_BASE_URL, remote_pool_size)
+		self._rest_session = self._build_session(self.REST_BASE_URL, rest_pool_size)
+		# A single JSON-RPC session (initialize once, cached tools/list) shared
+		# by all calls and greenlets.
+		self._mcp_session = MCPSession(self._remote_url(), self._remote_session, timeout=self.timeout)
+		# Identical concurrent calls (same tool + normalized params) share one
+		# upstream request instead of each spending AMap quota.
+		self._single_flight = SingleFlight() if coalesce_requests else None
+		# Per-tool token buckets (rate/s, burst) guarding the AMap key quota.
+		self.rate_limiter = (
+			RateLimiter(rate_limits, default_rate_limit, max_waiters=rate_limit_queue_size, max_wait=self.timeout)
+			if enable_rate_limit else None
+		)
+		# Transient REST failures are retried with jittered backoff inside the
+		# caller's deadline (see call_options(budget=...)).
+		self.retry_policy = retry_policy or RetryPolicy()
+		# Worker pool for fan-out helpers (batch geocoding, matrices, ...).
+		# Under gunicorn's gevent worker these threads are greenlets.
+		self.max_concurrency = max(1, int(max_concurrency))
+		self._executor: Optional[ThreadPoolExecutor] = None
+		self._executor_lock = threading.Lock()
+		# Hedged mode races remote MCP against REST (see _fetch_hedged);
+		# hedge_delay pins the delay instead of deriving it from latency.
+		self.hedge_requests = hedge_requests
+		self.hedge_delay = hedge_delay
+		self._hedge_executor: Optional[ThreadPoolExecutor] = None
+		self._hedge_stats: Dict[str, int] = {}
+
+	@staticmethod
+	def _build_session(base_url: str, pool_size: int) -> requests.Session:
+		"""Create a pooled session whose adapter only serves ``base_url``.
+
+		Retries are disabled at the adapter level; fallback handling lives in
+		``_call``. ``pool_block=False`` lets bursts open extra (non-pooled)
+		connections instead of waiting for a free slot.
+		"""
+		session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)), max_retries=0, pool_block=False)
+		session.mount(base_url, adapter)
+		session.headers.update({"Connection": "keep-alive"})
+		return session
+
+	def close(self) -> None:
+		"""Release pooled connections and worker threads held by this wrapper."""
+		if self.persistent_cache is not None and hasattr(self.persistent_cache, "close"):
+			self.persistent_cache.close()
+		if self._executor is not None:
+			self._executor.shutdown(wait=False)
+			self._executor = None
+		if self._hedge_executor is not None:
+			self._hedge_executor.shutdown(wait=False)
+			self._hedge_executor = None
+		for session in (self._remote_session, self._rest_session):
+			try:
+				session.close()
+			except Exception:  # pragma: no cover - best effort
+				pass
+
+	def __enter__(self) -> "MCPClientWrapper":
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+	def _pool(self) -> ThreadPoolExecutor:
+		if self._executor is None:
+			with self._executor_lock:
+				if self._executor is None:
+					self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="amap")
+		return self._executor
+
+	def _submit(self, fn: Callable[..., Any], *args, **kwargs):
+		"""Submit to the worker pool, carrying over call_options() context."""
+		ctx = contextvars.copy_context()
+		return self._pool().submit(ctx.run, fn, *args, **kwargs)
+
+	def _map_concurrent(self, fn: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+		"""Run ``fn`` over ``items`` concurrently; results keep input order."""
+		if len(items) <= 1:
+			return [fn(item) for item in items]
+		futures = [self._submit(fn, item) for item in items]
+		return [f.result() for f in futures]
+
+	def _rest_get(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+		"""GET with retries on transient errors, never exceeding the call deadline.
+
+		Raises the last error once attempts or budget run out; a throttled
+		AMap payload that is still throttled on the last attempt is returned
+		as-is.
+		"""
+		policy = self.retry_policy
+		options = current_call_options()
+		attempt = 0
+		while True:
+			attempt += 1
+			remaining = options.remaining()
+			if remaining is not None and remaining <= 0:
+				raise MCPClientError(f"Deadline exceeded before request to {url}")
+			timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+			throttled: Optional[Dict[str, Any]] = None
+			try:
+				r = self._rest_session.get(url, params=params, timeout=timeout)
+				r.raise_for_status()
+				data = r.json()
+				if not policy.is_throttled(data):
+					return data
+				throttled = data
+				error: Exception = MCPClientError(f"AMap throttled (infocode {data.get('infocode')})")
+			except (requests.Timeout, requests.ConnectionError) as e:
+				error = e
+			except requests.HTTPError as e:
+				status = getattr(e.response, "status_code", None)
+				if status is None or not policy.is_retryable_status(status):
+					raise
+				error = e
+			delay = policy.backoff(attempt)
+			remaining = options.remaining()
+			if attempt >= policy.max_attempts or (remaining is not None and remaining <= delay):
+				if throttled is not None:
+					return throttled
+				raise error
+			LOGGER.debug("Retrying %s in %.2fs after: %s", url, delay, error)
+			time.sleep(delay)
+
 	def _call_remote_mcp_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 		if not self.enable_remote:
 			return None
-		payload = {"tool_name": tool_name, "arguments": arguments}
+		breaker = self._breaker(self.MCP_BASE_URL)
+		if not breaker.allow_request():
+			LOGGER.debug("Remote MCP circuit %s -> straight to REST", breaker.state)
+			self.metrics.record_error(self._local_names.get(tool_name, tool_name), "remote", "CircuitOpen")
+			return None
 		try:
-			resp = requests.post(self._remote_url(), json=payload, timeout=self.timeout, stream=False)
-			if resp.status_code != 200:
-				LOGGER.debug("Remote MCP call non-200 (%s) -> fallback", resp.status_code)
+			data = self._post_remote_tool(tool_name, arguments)
+		except Exception as e:
+			# Any failure (transport, or a malformed tool schema / result) must
+			# release the half-open probe slot and fall back to REST.
+			if isinstance(e, MCPSessionError):
+				LOGGER.debug("Remote MCP call failed -> fallback: %s", e)
+			else:
+				LOGGER.warning("Remote MCP call %s raised -> fallback: %r", tool_name, e)
+			self.metrics.record_error(self._local_names.get(tool_name, tool_name), "remote", e)
+			breaker.record_failure()
+			return None
+		except BaseException:
+			breaker.record_failure()  # e.g. the caller's own timeout; never leak the probe slot
+			raise
+		breaker.record_success()
+		return data
+
+	def _post_remote_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""Call ``tool_name`` through the MCP session.
+
+		Raises ``MCPSessionError`` on transport/protocol failure (counted by the
+		circuit breaker); returns None when the tool itself reports an error.
+		"""
+		advertised = {t.get("name") for t in self._mcp_session.list_tools()}
+		name = self._pick_remote_tool(tool_name, advertised)
+		schema = (self._mcp_session.tool(name) or {}).get("inputSchema") or {}
+		data = self._mcp_session.call_tool(name, self._remote_arguments(tool_name, arguments, schema))
+		if not isinstance(data, dict):
+			return None
+		return self._normalize_remote_result(tool_name, data)
+
+	def _call(self, local_method: str, **params) -> Optional[Dict[str, Any]]:
+		started = time.monotonic()
+		local = self._answer_locally(local_method, params)
+		if local is not None:
+			self.metrics.record_call(local_method, "local", time.monotonic() - started)
+			return local
+		source, result = self._resolve(local_method, self._canonicalize(local_method, params))
+		self.metrics.record_call(local_method, source, time.monotonic() - started)
+		return self._fit_radius(local_method, params, result)
+
+	def _resolve(self, local_method: str, params: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+		"""Cache, negative cache, then one coalesced upstream fetch -> ``(source, result)``."""
+		cache_key, cached = self._cache_lookup(local_method, params)
+		if cached is not None:
+			return "cache", cached
+		negative_key, negative = self._negative_lookup(local_method, params)
+		if negative is not None:
+			return "negative", negative["value"]
+
+		def load() -> Optional[Dict[str, Any]]:
+			if not self._admit(local_method):
 				return None
-			try:
-				data = resp.json()
-			except Exception:
-				LOGGER.debug("Remote MCP response not JSON decodable -> fallback")
+			result = self._fetch(local_method, **params)
+			self._negative_store(local_method, negative_key, result)
+			if result is _REJECTED:
 				return None
-			return data
-		except requests.RequestException as e:
-			LOGGER.debug("Remote MCP request failed: %s", e)
+			self._cache_store(local_method, cache_key, result)
+			self._observe(local_method, params, result)
+			return result
+
+		if self._single_flight is None:
+			return "upstream", load()
+		return "upstream", self._single_flight.do(cache_key or make_cache_key(local_method, params), load)
+
+	def _admit(self, local_method: str) -> bool:
+		"""Take a rate-limit token for ``local_method`` honoring the call options."""
+		if self.rate_limiter is None:
+			return True
+		options = current_call_options()
+		if self.rate_limiter.acquire(local_method, options.priority, options.deadline):
+			return True
+		LOGGER.warning("Rate limit rejected %s (priority=%s)", local_method, options.priority)
+		self.metrics.record_error(local_method, "admission", "RateLimited")
+		return False
+
+	def _fetch(self, local_method: str, **params) -> Optional[Dict[str, Any]]:
+		if self.hedge_requests and self._remote_available(local_method):
+			result = self._fetch_hedged(local_method, params)
+		else:
+			result = self._fetch_remote(local_method, params)
+			if result is None:
+				if self.enable_remote and self._remote_tool(local_method):
+					self.metrics.record_fallback(local_method)
+				result = self._fetch_rest(local_method, params)
+		if result is None or result is _REJECTED:
+			return result
+		result = self._shape(local_method, result)
+		self._record_payload(local_method, result)
+		return result
+
+	def _remote_available(self, local_method: str) -> bool:
+		return (
+			self.enable_remote
+			and self._remote_tool(local_method) is not None
+			and self._breaker(self.MCP_BASE_URL).state != CircuitBreaker.OPEN
+		)
+
+	def _fetch_remote(self, local_method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		remote_tool = self._remote_tool(local_method)
+		if not remote_tool:
 			return None
+		started = time.monotonic()
+		remote_raw = self._call_remote_mcp_tool(remote_tool, params)
+		if not remote_raw:
+			return None
+		self._observe_latency("remote", local_method, started)
+		return remote_raw
 
-	def _truncate_list_fields(self, data: Any) -> Any:
-		"""Recursively truncate lists to max 10 items (including nested lists).
+	def _fetch_rest(self, local_method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		started = time.monotonic()
+		try:
+			result = self._rest_get(*self._rest_request(local_method, params))
+		except Exception as e:
+			LOGGER.error("REST fallback failed for %s: %s", local_method, e)
+			self.metrics.record_error(local_method, "rest", e)
+			return _REJECTED if self._is_client_error(e) else None
+		self._observe_latency("rest", local_method, started)
+		self._record_upstream_status("rest", local_method, result)
+		return result
 
-		Previous implementation only truncated top-level lists and did not
-		descend into list elements (so nested list like forecasts[0]['casts']
-		remained untrimmed). This version maps first, then truncates.
+	# Hedging: REST is fired once the remote has been silent for its recent
+	# p95 latency (a fixed default until enough samples exist).
+	HEDGE_QUANTILE = 0.95
+	HEDGE_MIN_SAMPLES = 20
+	HEDGE_DEFAULT_DELAY = 1.0
+	HEDGE_MIN_DELAY = 0.05
+
+	def _hedge_delay(self, local_method: str) -> float:
+		if self.hedge_delay is not None:
+			return self.hedge_delay
+		histogram = self._latency_histogram("remote", local_method)
+		delay = histogram.quantile(self.HEDGE_QUANTILE) if histogram.count >= self.HEDGE_MIN_SAMPLES else None
+		return min(max(delay if delay is not None else self.HEDGE_DEFAULT_DELAY, self.HEDGE_MIN_DELAY), self.timeout)
+
+	def _fetch_hedged(self, local_method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""Race remote MCP against a delayed REST request; first usable answer wins.
+
+		REST is only started if the remote has not answered within
+		``_hedge_delay``. A remote that fails before then falls back to REST
+		as usual. The loser is cancelled if still queued, otherwise its
+		response is discarded.
 		"""
-		if isinstance(data, list):
-			processed = [self._truncate_list_fields(x) for x in data]
-			return processed[:10] if len(processed) > 10 else processed
-		if isinstance(data, dict):
-			return {k: self._truncate_list_fields(v) for k, v in data.items()}
-		return data
+		remote = self._submit_hedge(self._fetch_remote, local_method, params)
+		done, _ = wait([remote], timeout=self._hedge_delay(local_method))
+		if done:
+			result = remote.result()
+			if result is not None:
+				return result
+			self.metrics.record_fallback(local_method)
+			return self._fetch_rest(local_method, params)
+		self._count_hedge("hedged")
+		pending = {remote: "remote", self._submit_hedge(self._fetch_rest, local_method, params): "rest"}
+		rejected = None
+		try:
+			while pending:
+				done, _ = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					path = pending.pop(future)
+					result = future.result()
+					if result is _REJECTED:
+						rejected = result  # keep waiting: the remote may still answer
+					elif result is not None:
+						self._count_hedge(f"{path}_won")
+						return result
+			return rejected
+		finally:
+			for future in pending:
+				future.cancel()
 
-	def _call(self, local_method: str, rest_func, **params) -> Optional[Dict[str, Any]]:
-		remote_tool = self.TOOL_NAME_MAP.get(local_method)
-		result: Optional[Dict[str, Any]] = None
-		if remote_tool:
-			remote_raw = self._call_remote_mcp_tool(remote_tool, params)
-			if remote_raw:
-				result_candidate = remote_raw.get("data") if isinstance(remote_raw, dict) else None
-				result = result_candidate or remote_raw
-		if result is None:
-			try:
-				result = rest_func(**params)
-			except Exception as e:
-				LOGGER.error("REST fallback failed for %s: %s", local_method, e)
-				return None
-		return self._truncate_list_fields(result)
+	def _submit_hedge(self, fn: Callable[..., Any], *args):
+		"""Hedge legs get their own pool so a fan-out worker can hedge without deadlocking."""
+		if self._hedge_executor is None:
+			with self._executor_lock:
+				if self._hedge_executor is None:
+					self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self.max_concurrency, thread_name_prefix="amap-hedge")
+		ctx = contextvars.copy_context()
+		return self._hedge_executor.submit(ctx.run, fn, *args)
+
+	def _count_hedge(self, outcome: str) -> None:
+		with self._executor_lock:
+			self._hedge_stats[outcome] = self._hedge_stats.get(outcome, 0) + 1
+
+	def hedge_stats(self) -> Dict[str, Any]:
+		"""Hedging counters plus the current per-tool hedge delay."""
+		with self._executor_lock:
+			stats: Dict[str, Any] = {"enabled": self.hedge_requests, "hedged": 0, "remote_won": 0, "rest_won": 0}
+			stats.update(self._hedge_stats)
+		stats["delays"] = {tool: round(self._hedge_delay(tool), 4) for tool in self.TOOL_NAME_MAP} if self.hedge_requests else {}
+		return stats
 
 	def list_tools(self) -> Dict[str, Any]:
-		return {"available_tools": list(self.TOOL_NAME_MAP.keys()), "remote_mapping": self.TOOL_NAME_MAP, "remote_enabled": self.enable_remote}
+		tools = super().list_tools()
+		tools["remote_session"] = {
+			"initialized": self._mcp_session.initialized,
+			"protocol_version": self._mcp_session.protocol_version,
+			"server_info": self._mcp_session.server_info,
+		}
+		if self._single_flight is not None:
+			tools["single_flight"] = self._single_flight.stats()
+		tools["rate_limits"] = self.rate_limit_stats()
+		tools["hedging"] = self.hedge_stats()
+		tools["latency"] = self.latency_stats()
+		return tools
+
+	def rate_limit_stats(self) -> Dict[str, Any]:
+		"""Current token counts, queue depth and admit/reject counters per tool."""
+		return self.rate_limiter.snapshot() if self.rate_limiter is not None else {}
 
 	def get_geo_location(self, address: str, city: str = "") -> Optional[Dict[str, Any]]:
-		def rest(address: str, city: str = ""):
-			url = "https://restapi.amap.com/v3/geocode/geo"
-			params = {"address": address, "key": self.api_key}
-			if city:
-				params["city"] = city
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_geo_location", rest, address=address, city=city)
+		return self._call("get_geo_location", address=address, city=city)
+
+	GEOCODE_BATCH_SIZE = 10  # AMap limit for batch=true
+
+	def get_geo_locations(self, addresses: Sequence[str], city: str = "") -> List[Optional[Dict[str, Any]]]:
+		"""Geocode many addresses with as few requests as possible.
+
+		Each address is first looked up in the cache that ``get_geo_location``
+		uses. The remaining unique addresses are sent in ``|``-joined
+		``batch=true`` requests of up to 10, and the batches run concurrently.
+		The result list lines up with ``addresses``. Each item has the
+		``get_geo_location`` shape, or is None when its batch failed.
+		"""
+		results: List[Optional[Dict[str, Any]]] = [None] * len(addresses)
+		pending: Dict[str, List[int]] = {}
+		for i, address in enumerate(addresses):
+			_, cached = self._cache_lookup("get_geo_location", {"address": address, "city": city})
+			if cached is not None:
+				results[i] = cached
+			else:
+				pending.setdefault(address, []).append(i)
+		unique = list(pending)
+		size = self.GEOCODE_BATCH_SIZE
+		batches = [unique[i:i + size] for i in range(0, len(unique), size)]
+		for batch, geocodes in zip(batches, self._map_concurrent(lambda b: self._geocode_batch(b, city), batches)):
+			if geocodes is None:
+				continue
+			for address, geo in zip(batch, geocodes):
+				found = bool(geo and geo.get("location"))
+				result = {"status": "1", "info": "OK", "count": "1" if found else "0", "geocodes": [geo] if found else []}
+				if found:
+					self._cache_store("get_geo_location", self._cache_key("get_geo_location", {"address": address, "city": city}), result)
+				for i in pending[address]:
+					results[i] = result
+		return results
+
+	def _geocode_batch(self, addresses: List[str], city: str = "") -> Optional[List[Optional[Dict[str, Any]]]]:
+		"""One ``batch=true`` geocode request; None if it failed or was rejected."""
+		if not self._admit("get_geo_location"):
+			return None
+		url, query = self._rest_request("get_geo_location", {
+			"address": "|".join(a.replace("|", " ") for a in addresses),
+			"city": city,
+			"batch": "true",
+		})
+		try:
+			data = self._rest_get(url, query)
+		except Exception as e:
+			LOGGER.error("Batch geocode failed for %d addresses: %s", len(addresses), e)
+			return None
+		geocodes = data.get("geocodes") if isinstance(data, dict) and str(data.get("status")) == "1" else None
+		if not isinstance(geocodes, list) or len(geocodes) != len(addresses):
+			LOGGER.warning("Batch geocode returned %s results for %d addresses", None if geocodes is None else len(geocodes), len(addresses))
+			return None
+		return geocodes
 
 	def get_regeocode(self, location: str) -> Optional[Dict[str, Any]]:
-		def rest(location: str):
-			url = "https://restapi.amap.com/v3/geocode/regeo"
-			params = {"location": location, "key": self.api_key, "extensions": "all"}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_regeocode", rest, location=location)
+		return self._call("get_regeocode", location=location)
 
 	def search_pois(self, keywords: str, city: str = "", page: int = 1, offset: int = 20) -> Optional[Dict[str, Any]]:
-		def rest(keywords: str, city: str = "", page: int = 1, offset: int = 20):
-			# Reverted to AMap Place v3 text search (v5 -> v3) per request
-			url = "https://restapi.amap.com/v3/place/text"
-			# v3 uses 'offset' & 'page' instead of 'page_size' & 'page_num'
-			params = {"keywords": keywords, "key": self.api_key, "offset": offset, "page": page}
-			if city:
-				params["city"] = city
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("search_pois", rest, keywords=keywords, city=city, page=page, offset=offset)
+		return self._call("search_pois", keywords=keywords, city=city, page=page, offset=offset)
 
 	def search_around(self, location: str, keywords: Optional[str] = None, types: str = "", radius: int = 1000, sortrule: str = "distance", page: int = 1, offset: int = 20) -> Optional[Dict[str, Any]]:
-		def rest(location: str, keywords: Optional[str] = None, types: str = "", radius: int = 1000, sortrule: str = "distance", page: int = 1, offset: int = 20):
-			# Reverted to AMap Place v3 around search (v5 -> v3) per request
-			url = "https://restapi.amap.com/v3/place/around"
-			# v3 uses 'offset' & 'page'
-			params = {"location": location, "radius": radius, "sortrule": sortrule, "key": self.api_key, "offset": offset, "page": page}
-			if keywords:
-				params["keywords"] = keywords
-			if types:
-				params["types"] = types
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("search_around", rest, location=location, keywords=keywords, types=types, radius=radius, sortrule=sortrule, page=page, offset=offset)
+		return self._call("search_around", location=location, keywords=keywords, types=types, radius=radius, sortrule=sortrule, page=page, offset=offset)
 
 	def get_poi_detail(self, poi_id: str) -> Optional[Dict[str, Any]]:
-		def rest(poi_id: str):
-			url = "https://restapi.amap.com/v5/place/detail"
-			params = {"ids": poi_id, "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_poi_detail", rest, poi_id=poi_id)
+		return self._call("get_poi_detail", poi_id=poi_id)
+
+	def iter_pois(
+		self,
+		keywords: str,
+		city: str = "",
+		limit: Optional[int] = None,
+		stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+		page_size: int = 20,
+		max_pages: int = 10,
+	) -> Iterator[Dict[str, Any]]:
+		"""Yield POIs for a keyword search lazily across pages (see ``_iter_pages``)."""
+		return self._iter_pages(
+			"search_pois",
+			lambda page, size: self.search_pois(keywords, city, page=page, offset=size),
+			limit, stop, page_size, max_pages,
+		)
+
+	def iter_around(
+		self,
+		location: str,
+		keywords: Optional[str] = None,
+		types: str = "",
+		radius: int = 1000,
+		sortrule: str = "distance",
+		limit: Optional[int] = None,
+		stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+		page_size: int = 20,
+		max_pages: int = 10,
+	) -> Iterator[Dict[str, Any]]:
+		"""Yield POIs around ``location`` lazily across pages (see ``_iter_pages``)."""
+		return self._iter_pages(
+			"search_around",
+			lambda page, size: self.search_around(location, keywords, types, radius, sortrule, page=page, offset=size),
+			limit, stop, page_size, max_pages,
+		)
+
+	def _iter_pages(
+		self,
+		local_method: str,
+		fetch: Callable[[int, int], Optional[Dict[str, Any]]],
+		limit: Optional[int],
+		stop: Optional[Callable[[Dict[str, Any]], bool]],
+		page_size: int,
+		max_pages: int,
+	) -> Iterator[Dict[str, Any]]:
+		"""Page through a POI search, prefetching page n+1 while page n is consumed.
+
+		Iteration ends after ``limit`` POIs, after the first POI for which
+		``stop(poi)`` is true (that POI is still yielded), or when the result
+		set / ``max_pages`` is exhausted. Pages are clamped to the tool's list
+		limit so truncation never drops results, and POIs repeated across
+		pages are skipped. A prefetch still queued when iteration ends is
+		cancelled.
+		"""
+		cap = self._list_limit(local_method)
+		size = max(1, min(page_size, cap) if cap > 0 else page_size)
+		seen: Set[str] = set()
+		yielded = 0
+		page = 1
+		pending = None
+		data = fetch(page, size)
+		try:
+			while data:
+				pois = data.get("pois") or []
+				try:
+					total: Optional[int] = int(data.get("count"))
+				except (TypeError, ValueError):
+					total = None
+				more = len(pois) >= size and page < max_pages and (total is None or page * size < total)
+				if more and (limit is None or yielded + len(pois) < limit):
+					pending = self._submit(fetch, page + 1, size)
+				for poi in pois:
+					poi_id = poi.get("id")
+					if poi_id:
+						if poi_id in seen:
+							continue
+						seen.add(poi_id)
+					done = bool(stop and stop(poi))
+					yield poi
+					yielded += 1
+					if done or (limit is not None and yielded >= limit):
+						return
+				if pending is None:
+					return
+				page += 1
+				data, pending = pending.result(), None
+		finally:
+			if pending is not None:
+				pending.cancel()
 
 	def get_weather(self, city: str) -> Optional[Dict[str, Any]]:
-		def rest(city: str):
-			url = "https://restapi.amap.com/v3/weather/weatherInfo"
-			params = {"city": city, "extensions": "all", "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_weather", rest, city=city)
+		return self._call("get_weather", city=city)
 
 	def get_distance(self, origins: str, destination: str, type: str = "1") -> Optional[Dict[str, Any]]:  # noqa: A003
-		def rest(origins: str, destination: str, type: str = "1"):
-			url = "https://restapi.amap.com/v3/distance"
-			params = {"origins": origins, "destination": destination, "type": type, "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_distance", rest, origins=origins, destination=destination, type=type)
+		return self._call("get_distance", origins=origins, destination=destination, type=type)
+
+	DISTANCE_MAX_ORIGINS = 100  # AMap limit for |-joined origins
+
+	def get_distance_matrix(self, points: Sequence[str], type: str = "1", precision: int = 4) -> Dict[str, Any]:  # noqa: A003
+		"""N×N distance (m) and duration (s) matrix between ``"lng,lat"`` points.
+
+		Pairs are cached symmetrically under coordinates rounded to
+		``precision`` decimals (4 ≈ 11 m), so A→B also answers B→A. Each
+		missing pair is measured once: missing origins are grouped per
+		destination into a single ``/v3/distance`` request, and those
+		requests run concurrently. Unmeasured cells are None.
+		"""
+		canon = [self._round_location(p, precision) for p in points]
+		n = len(canon)
+		distances: List[List[Optional[int]]] = [[0 if i == j else None for j in range(n)] for i in range(n)]
+		durations: List[List[Optional[int]]] = [[0 if i == j else None for j in range(n)] for i in range(n)]
+
+		def fill(i: int, j: int, cell: Dict[str, Any]) -> None:
+			distances[i][j] = distances[j][i] = cell.get("distance")
+			durations[i][j] = durations[j][i] = cell.get("duration")
+
+		missing: Dict[int, List[int]] = {}
+		for j in range(n):
+			for i in range(j):
+				if canon[i] == canon[j]:
+					fill(i, j, {"distance": 0, "duration": 0})
+					continue
+				_, cached = self._cache_lookup("get_distance_matrix", {"pair": self._pair_key(canon[i], canon[j]), "type": type})
+				if cached is not None:
+					fill(i, j, cached)
+				else:
+					missing.setdefault(j, []).append(i)
+
+		size = self.DISTANCE_MAX_ORIGINS
+		jobs = [(j, origins[k:k + size]) for j, origins in missing.items() for k in range(0, len(origins), size)]
+		outcomes = self._map_concurrent(lambda job: self._distance_column(canon, job[0], job[1], type), jobs)
+		for (j, origins), cells in zip(jobs, outcomes):
+			for i, cell in zip(origins, cells or []):
+				if cell is None:
+					continue
+				fill(i, j, cell)
+				self._cache_store("get_distance_matrix", self._cache_key("get_distance_matrix", {"pair": self._pair_key(canon[i], canon[j]), "type": type}), cell)
+		return {"points": canon, "type": type, "distances": distances, "durations": durations}
+
+	def _distance_column(self, canon: List[str], j: int, origins: List[int], type: str) -> Optional[List[Optional[Dict[str, int]]]]:  # noqa: A002
+		"""Measure ``origins`` -> ``canon[j]`` in one request; cells follow ``origins`` order."""
+		if not self._admit("get_distance"):
+			return None
+		url, query = self._rest_request("get_distance", {
+			"origins": "|".join(canon[i] for i in origins),
+			"destination": canon[j],
+			"type": type,
+		})
+		try:
+			data = self._rest_get(url, query)
+		except Exception as e:
+			LOGGER.error("Distance matrix column %d failed: %s", j, e)
+			return None
+		cells: List[Optional[Dict[str, int]]] = [None] * len(origins)
+		for pos, item in enumerate((data or {}).get("results") or []):
+			try:
+				idx = int(item.get("origin_id", pos + 1)) - 1
+				if 0 <= idx < len(origins):
+					cells[idx] = {"distance": int(float(item["distance"])), "duration": int(float(item.get("duration") or 0))}
+			except (KeyError, TypeError, ValueError):
+				continue
+		return cells
+
+	@staticmethod
+	def _round_location(location: str, precision: int) -> str:
+		lng, lat = (float(x) for x in str(location).split(","))
+		return f"{lng:.{precision}f},{lat:.{precision}f}"
+
+	@staticmethod
+	def _pair_key(a: str, b: str) -> str:
+		return "|".join(sorted((a, b)))
 
 	def get_walking_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
-		def rest(origin: str, destination: str):
-			url = "https://restapi.amap.com/v3/direction/walking"
-			params = {"origin": origin, "destination": destination, "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_walking_directions", rest, origin=origin, destination=destination)
+		return self._call("get_walking_directions", origin=origin, destination=destination)
 
 	def get_driving_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
-		def rest(origin: str, destination: str):
-			url = "https://restapi.amap.com/v3/direction/driving"
-			params = {"origin": origin, "destination": destination, "extensions": "all", "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_driving_directions", rest, origin=origin, destination=destination)
+		return self._call("get_driving_directions", origin=origin, destination=destination)
 
 	def get_transit_directions(self, origin: str, destination: str, city: str, cityd: Optional[str] = None) -> Optional[Dict[str, Any]]:
-		def rest(origin: str, destination: str, city: str, cityd: Optional[str] = None):
-			url = "https://restapi.amap.com/v3/direction/transit/integrated"
-			params = {"origin": origin, "destination": destination, "city": city, "key": self.api_key}
-			if cityd:
-				params["cityd"] = cityd
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_transit_directions", rest, origin=origin, destination=destination, city=city, cityd=cityd)
+		return self._call("get_transit_directions", origin=origin, destination=destination, city=city, cityd=cityd)
 
 	def get_bicycling_directions(self, origin: str, destination: str) -> Optional[Dict[str, Any]]:
-		def rest(origin: str, destination: str):
-			url = "https://restapi.amap.com/v4/direction/bicycling"
-			params = {"origin": origin, "destination": destination, "key": self.api_key}
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_bicycling_directions", rest, origin=origin, destination=destination)
+		return self._call("get_bicycling_directions", origin=origin, destination=destination)
 
 	def get_ip_location(self, ip: Optional[str] = None) -> Optional[Dict[str, Any]]:
-		def rest(ip: Optional[str] = None):
-			url = "https://restapi.amap.com/v3/ip"
-			params = {"key": self.api_key}
-			if ip:
-				params["ip"] = ip
-			r = requests.get(url, params=params, timeout=self.timeout)
-			r.raise_for_status()
-			return r.json()
-		return self._call("get_ip_location", rest, ip=ip)
+		return self._call("get_ip_location", ip=ip)
 
-	def ping(self) -> bool:
+	def _probe(self) -> Dict[str, Any]:
+		"""One minimal REST request on the pooled session; never raises."""
+		started = time.monotonic()
+		url, query = self._probe_request()
 		try:
-			result = self.get_weather("110000")
-			return bool(result)
-		except Exception:
-			return False
+			r = self._rest_session.get(url, params=query, timeout=self._probe_timeout())
+			return self._record_health(started, r.status_code, r.json() if r.status_code == 200 else None)
+		except Exception as e:
+			return self._record_health(started, None, None, type(e).__name__)
+
+	def health(self) -> Dict[str, Any]:
+		"""Cached AMap liveness: ``ok``, ``error``, ``latency``, ``age``, ...
+
+		Only the very first call waits for a probe (bounded by
+		``HEALTH_PROBE_TIMEOUT``). Later calls return the cached result
+		immediately; once it is older than ``health_interval`` a single
+		background refresh is started.
+		"""
+		probe_now, refresh = self._health_plan()
+		if probe_now:
+			self._probe()
+		elif refresh:
+			threading.Thread(target=self._probe, name="amap-health", daemon=True).start()
+		return self._health_view()
+
+	def ping(self) -> bool:
+		return bool(self.health()["ok"])
 
 
 def _pretty(obj: Any) -> str:
@@ -0,0 +1,151 @@
+"""Per-tool metrics for the AMap clients.
+
+``MetricsRegistry`` keeps, per local tool name:
+
+- a latency histogram per path: ``remote`` / ``rest`` (successful upstream
+  legs) and ``call`` (end to end, including cache and local-index answers);
+- call counts by source (``upstream`` / ``cache`` / ``negative`` /
+  ``local``), from which the per-tool cache hit ratio is derived;
+- remote -> REST fallbacks, and errors by path and error class;
+- payload sizes of the (truncated, projected) responses handed back.
+
+``snapshot()`` returns everything as plain JSON-able dicts. Hooks
+registered with ``add_hook`` receive every event as a dict (``kind``,
+``tool`` and kind-specific fields) so the web app can forward them to
+logs or an external collector. Hooks run inline and must be cheap; hook
+exceptions are logged and swallowed.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+from App.mcp_resilience import LatencyHistogram
+
+LOGGER = logging.getLogger(__name__)
+
+MetricsHook = Callable[[Dict[str, Any]], None]
+
+
+class _ToolMetrics:
+	__slots__ = ("latency", "sources", "fallbacks", "errors", "payloads", "payload_bytes", "payload_max")
+
+	def __init__(self):
+		self.latency: Dict[str, LatencyHistogram] = {}
+		self.sources: Dict[str, int] = {}
+		self.fallbacks = 0
+		self.errors: Dict[str, int] = {}
+		self.payloads = 0
+		self.payload_bytes = 0
+		self.payload_max = 0
+
+
+class MetricsRegistry:
+	"""Thread-safe per-tool latency / error / payload-size counters."""
+
+	def __init__(self):
+		self._tools: Dict[str, _ToolMetrics] = {}
+		self._lock = threading.Lock()
+		self._hooks: List[MetricsHook] = []
+
+	def _tool(self, tool: str) -> _ToolMetrics:
+		metrics = self._tools.get(tool)
+		if metrics is None:
+			with self._lock:
+				metrics = self._tools.setdefault(tool, _ToolMetrics())
+		return metrics
+
+	def histogram(self, path: str, tool: str) -> LatencyHistogram:
+		latency = self._tool(tool).latency
+		histogram = latency.get(path)
+		if histogram is None:
+			with self._lock:
+				histogram = latency.setdefault(path, LatencyHistogram())
+		return histogram
+
+	def add_hook(self, hook: MetricsHook) -> None:
+		self._hooks.append(hook)
+
+	def remove_hook(self, hook: MetricsHook) -> None:
+		if hook in self._hooks:
+			self._hooks.remove(hook)
+
+	def _emit(self, event: Dict[str, Any]) -> None:
+		for hook in list(self._hooks):
+			try:
+				hook(event)
+			except Exception as e:  # a broken exporter must not break tool calls
+				LOGGER.warning("Metrics hook %r failed: %s", hook, e)
+
+	def observe_latency(self, path: str, tool: str, seconds: float) -> None:
+		self.histogram(path, tool).observe(seconds)
+		self._emit({"kind": "latency", "tool": tool, "path": path, "seconds": seconds})
+
+	def record_call(self, tool: str, source: str, seconds: float) -> None:
+		"""One public call answered from ``source`` in ``seconds`` end to end."""
+		metrics = self._tool(tool)
+		with self._lock:
+			metrics.sources[source] = metrics.sources.get(source, 0) + 1
+		self.histogram("call", tool).observe(seconds)
+		self._emit({"kind": "call", "tool": tool, "source": source, "seconds": seconds})
+
+	def record_fallback(self, tool: str) -> None:
+		metrics = self._tool(tool)
+		with self._lock:
+			metrics.fallbacks += 1
+		self._emit({"kind": "fallback", "tool": tool})
+
+	def record_error(self, tool: str, path: str, error: Any) -> None:
+		"""Count an error; ``error`` is an exception or an error-class string."""
+		error_class = error if isinstance(error, str) else type(error).__name__
+		key = f"{path}:{error_class}"
+		metrics = self._tool(tool)
+		with self._lock:
+			metrics.errors[key] = metrics.errors.get(key, 0) + 1
+		self._emit({"kind": "error", "tool": tool, "path": path, "error": error_class})
+
+	def record_payload(self, tool: str, size: int) -> None:
+		metrics = self._tool(tool)
+		with self._lock:
+			metrics.payloads += 1
+			metrics.payload_bytes += size
+			metrics.payload_max = max(metrics.payload_max, size)
+		self._emit({"kind": "payload", "tool": tool, "bytes": size})
+
+	def snapshot(self) -> Dict[str, Any]:
+		with self._lock:
+			tools = dict(self._tools)
+		out: Dict[str, Any] = {}
+		for name, metrics in sorted(tools.items()):
+			with self._lock:
+				sources = dict(metrics.sources)
+				errors = dict(metrics.errors)
+				fallbacks = metrics.fallbacks
+				payloads, payload_bytes, payload_max = metrics.payloads, metrics.payload_bytes, metrics.payload_max
+				latency = dict(metrics.latency)
+			calls = sum(sources.values())
+			cached = calls - sources.get("upstream", 0)
+			out[name] = {
+				"calls": calls,
+				"sources": sources,
+				"cache_hit_ratio": round(cached / calls, 4) if calls else 0.0,
+				"fallbacks": fallbacks,
+				"errors": errors,
+				"payload": {
+					"count": payloads,
+					"bytes_total": payload_bytes,
+					"bytes_mean": round(payload_bytes / payloads, 1) if payloads else None,
+					"bytes_max": payload_max,
+				},
+				"latency": {path: histogram.snapshot() for path, histogram in sorted(latency.items())},
+			}
+		return out
+
+	def reset(self) -> None:
+		with self._lock:
+			self._tools.clear()
+
+
+__all__ = ["MetricsRegistry", "MetricsHook"]
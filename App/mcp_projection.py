@@ -0,0 +1,107 @@
+"""Declarative field projection for AMap responses.
+
+A profile is a dict mapping field name -> ``True`` (keep the value as-is)
+or a nested profile (keep the field, projecting its value). A nested
+profile applied to a list is applied to every element, so one profile
+describes "each POI keeps these fields" regardless of list length::
+
+	project({"pois": [{"name": "a", "shopinfo": "0"}]}, {"pois": {"name": True}})
+	# -> {"pois": [{"name": "a"}]}
+
+Fields missing from the payload are simply absent from the result, and
+values of an unexpected shape (AMap sends ``[]`` for empty strings) are
+kept unchanged.
+
+``DEFAULT_PROFILES`` keep what ``format_poi_data`` /
+``format_direction_data`` and the chat timeline read. Tools without a
+profile are returned unprojected.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Union
+
+Profile = Dict[str, Union[bool, "Profile"]]
+
+_STATUS: Profile = {"status": True, "info": True, "infocode": True, "count": True}
+
+POI_PROFILE: Profile = {
+	"id": True,
+	"name": True,
+	"type": True,
+	"typecode": True,
+	"address": True,
+	"location": True,
+	"tel": True,
+	"distance": True,
+	"pname": True,
+	"cityname": True,
+	"adname": True,
+	"biz_ext": {"rating": True, "cost": True, "opentime2": True, "level": True},
+	"photos": {"title": True, "url": True},
+}
+
+_STEP: Profile = {"instruction": True, "road": True, "distance": True, "duration": True}
+
+_PATH_ROUTE: Profile = {
+	"origin": True,
+	"destination": True,
+	"taxi_cost": True,
+	"paths": {"distance": True, "duration": True, "tolls": True, "traffic_lights": True, "steps": _STEP},
+}
+
+_STOP: Profile = {"name": True}
+
+TRANSIT_ROUTE: Profile = {
+	"origin": True,
+	"destination": True,
+	"distance": True,
+	"taxi_cost": True,
+	"transits": {
+		"cost": True,
+		"duration": True,
+		"distance": True,
+		"walking_distance": True,
+		"nightflag": True,
+		"segments": {
+			"walking": {"distance": True, "duration": True},
+			"bus": {
+				"buslines": {
+					"name": True,
+					"type": True,
+					"distance": True,
+					"duration": True,
+					"via_num": True,
+					"departure_stop": _STOP,
+					"arrival_stop": _STOP,
+				},
+			},
+		},
+	},
+}
+
+DEFAULT_PROFILES: Dict[str, Profile] = {
+	"search_pois": dict(_STATUS, suggestion=True, pois=POI_PROFILE),
+	"search_around": dict(_STATUS, pois=POI_PROFILE),
+	"get_walking_directions": dict(_STATUS, route=_PATH_ROUTE),
+	"get_driving_directions": dict(_STATUS, route=_PATH_ROUTE),
+	"get_transit_directions": dict(_STATUS, route=TRANSIT_ROUTE),
+}
+
+
+def project(data: Any, profile: Profile) -> Any:
+	"""Return a copy of ``data`` keeping only the fields named by ``profile``."""
+	if isinstance(data, list):
+		return [project(item, profile) for item in data]
+	if not isinstance(data, dict):
+		return data
+	out: Dict[str, Any] = {}
+	for field, spec in profile.items():
+		if field not in data:
+			continue
+		value = data[field]
+		out[field] = project(value, spec) if isinstance(spec, dict) else value
+	return out
+
+
+__all__ = ["DEFAULT_PROFILES", "POI_PROFILE", "Profile", "TRANSIT_ROUTE", "project"]
@@ -0,0 +1,457 @@
+"""Resilience helpers for :class:`App.mcp_client_wrapper.MCPClientWrapper`.
+
+Kept separate from the wrapper so the policies can be unit-tested without
+any HTTP mocking.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import copy
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class CircuitBreaker:
+	"""Classic closed / open / half-open circuit breaker for one endpoint.
+
+	- closed: requests flow; ``failure_threshold`` consecutive failures open it.
+	- open: requests are short-circuited until ``reset_timeout`` elapses.
+	- half_open: up to ``half_open_max_calls`` probe requests are let through;
+	  a success closes the circuit, a failure re-opens it for another cool-down.
+	"""
+
+	CLOSED = "closed"
+	OPEN = "open"
+	HALF_OPEN = "half_open"
+
+	def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+		self.name = name
+		self.failure_threshold = max(1, int(failure_threshold))
+		self.reset_timeout = float(reset_timeout)
+		self.half_open_max_calls = max(1, int(half_open_max_calls))
+		self._state = self.CLOSED
+		self._consecutive_failures = 0
+		self._opened_at: Optional[float] = None
+		self._half_open_in_flight = 0
+		self._lock = threading.Lock()
+		self.total_failures = 0
+		self.total_successes = 0
+		self.short_circuited = 0
+
+	@property
+	def state(self) -> str:
+		with self._lock:
+			self._maybe_half_open(time.monotonic())
+			return self._state
+
+	def allow_request(self) -> bool:
+		"""Return True if a request may be sent now (reserving a probe slot if half-open)."""
+		with self._lock:
+			self._maybe_half_open(time.monotonic())
+			if self._state == self.CLOSED:
+				return True
+			if self._state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+				self._half_open_in_flight += 1
+				return True
+			self.short_circuited += 1
+			return False
+
+	def record_success(self) -> None:
+		with self._lock:
+			self.total_successes += 1
+			self._consecutive_failures = 0
+			self._half_open_in_flight = 0
+			self._state = self.CLOSED
+			self._opened_at = None
+
+	def record_failure(self) -> None:
+		with self._lock:
+			self.total_failures += 1
+			self._consecutive_failures += 1
+			if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+				self._state = self.OPEN
+				self._opened_at = time.monotonic()
+				self._half_open_in_flight = 0
+
+	def reset(self) -> None:
+		with self._lock:
+			self._state = self.CLOSED
+			self._consecutive_failures = 0
+			self._opened_at = None
+			self._half_open_in_flight = 0
+
+	def snapshot(self) -> Dict[str, Any]:
+		with self._lock:
+			now = time.monotonic()
+			self._maybe_half_open(now)
+			retry_in = None
+			if self._state == self.OPEN and self._opened_at is not None:
+				retry_in = round(max(0.0, self._opened_at + self.reset_timeout - now), 3)
+			return {
+				"state": self._state,
+				"consecutive_failures": self._consecutive_failures,
+				"failure_threshold": self.failure_threshold,
+				"reset_timeout": self.reset_timeout,
+				"retry_in": retry_in,
+				"total_failures": self.total_failures,
+				"total_successes": self.total_successes,
+				"short_circuited": self.short_circuited,
+			}
+
+	def _maybe_half_open(self, now: float) -> None:
+		if self._state == self.OPEN and self._opened_at is not None and now - self._opened_at >= self.reset_timeout:
+			self._state = self.HALF_OPEN
+			self._half_open_in_flight = 0
+
+
+class _Flight:
+	__slots__ = ("done", "result", "error", "aborted", "waiters")
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result: Any = None
+		self.error: Optional[Exception] = None
+		self.aborted = False
+		self.waiters = 0
+
+
+class SingleFlight:
+	"""Collapse concurrent identical calls into one upstream request.
+
+	The first caller for a key (the leader) runs ``fn``; callers arriving while
+	it is in flight block until it finishes and receive a deep copy of the
+	same result, or the same exception re-raised. Nothing is remembered after
+	completion; that is the response cache's job.
+
+	Only ``Exception`` is shared. If the leader is interrupted by a
+	``BaseException`` (e.g. a gevent ``Timeout`` meant for the leader's own
+	caller), waiters retry the call themselves instead of receiving an
+	exception that was never theirs.
+	"""
+
+	def __init__(self):
+		self._flights: Dict[str, _Flight] = {}
+		self._lock = threading.Lock()
+		self.leaders = 0
+		self.shared = 0
+
+	def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+		with self._lock:
+			flight = self._flights.get(key)
+			leader = flight is None
+			if leader:
+				flight = _Flight()
+				self._flights[key] = flight
+				self.leaders += 1
+			else:
+				flight.waiters += 1
+				self.shared += 1
+		if not leader:
+			if not flight.done.wait(timeout):
+				raise TimeoutError(f"single-flight wait for {key!r} timed out")
+			if flight.aborted:
+				return self.do(key, fn, timeout)
+			if flight.error is not None:
+				raise flight.error
+			return copy.deepcopy(flight.result)
+		result = None
+		try:
+			result = fn()
+		except Exception as e:
+			flight.error = e
+			raise
+		except BaseException:
+			flight.aborted = True
+			raise
+		finally:
+			with self._lock:
+				self._flights.pop(key, None)
+				waiters = flight.waiters
+			# Snapshot before the leader hands its result back to its caller,
+			# which may mutate it; no new waiter can join once the key is gone.
+			if flight.error is None and not flight.aborted and waiters:
+				flight.result = copy.deepcopy(result)
+			flight.done.set()
+		return result
+
+	def in_flight(self) -> int:
+		with self._lock:
+			return len(self._flights)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {"in_flight": len(self._flights), "leaders": self.leaders, "shared": self.shared}
+
+
+class RetryPolicy:
+	"""Exponential backoff with full jitter, bounded by attempts and a deadline.
+
+	Only transient failures of idempotent requests are retried: timeouts,
+	connection errors, HTTP 429/5xx and AMap throttling ``infocode`` values
+	(which arrive as HTTP 200 with ``status == "0"``).
+	"""
+
+	RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+	# 10004 访问过于频繁, 10014/10019/10020/10021 QPS 超限, 10015 网关超时, 10016 服务繁忙
+	RETRYABLE_INFOCODES = frozenset({"10004", "10014", "10015", "10016", "10019", "10020", "10021"})
+
+	def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+		self.max_attempts = max(1, int(max_attempts))
+		self.base_delay = float(base_delay)
+		self.max_delay = float(max_delay)
+
+	def backoff(self, attempt: int) -> float:
+		"""Jittered delay before retry number ``attempt`` (1-based)."""
+		return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+	def is_retryable_status(self, status_code: int) -> bool:
+		return status_code in self.RETRYABLE_STATUS
+
+	def is_throttled(self, payload: Any) -> bool:
+		return (
+			isinstance(payload, dict)
+			and str(payload.get("status")) == "0"
+			and str(payload.get("infocode")) in self.RETRYABLE_INFOCODES
+		)
+
+
+# Priority classes for admission control; lower value is served first.
+PRIORITIES = {"interactive": 0, "default": 5, "background": 10}
+
+
+class CallOptions:
+	"""Per-call admission settings carried through ``call_options()``."""
+
+	__slots__ = ("priority", "deadline")
+
+	def __init__(self, priority: str = "interactive", deadline: Optional[float] = None):
+		self.priority = priority
+		self.deadline = deadline  # absolute time.monotonic() value, or None
+
+	def remaining(self) -> Optional[float]:
+		if self.deadline is None:
+			return None
+		return self.deadline - time.monotonic()
+
+
+_CALL_OPTIONS: contextvars.ContextVar[CallOptions] = contextvars.ContextVar("mcp_call_options", default=CallOptions())
+
+
+def current_call_options() -> CallOptions:
+	return _CALL_OPTIONS.get()
+
+
+@contextlib.contextmanager
+def call_options(priority: Optional[str] = None, budget: Optional[float] = None, deadline: Optional[float] = None) -> Iterator[CallOptions]:
+	"""Scope priority / deadline for every wrapper call made inside the block.
+
+	``budget`` is a relative time budget in seconds; ``deadline`` an absolute
+	``time.monotonic()`` value. A nested scope can only tighten the deadline.
+	Context variables are per thread / greenlet, so concurrent requests do
+	not see each other's settings.
+	"""
+	outer = _CALL_OPTIONS.get()
+	if budget is not None:
+		budget_deadline = time.monotonic() + budget
+		deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+	if outer.deadline is not None:
+		deadline = outer.deadline if deadline is None else min(deadline, outer.deadline)
+	options = CallOptions(priority or outer.priority, deadline)
+	token = _CALL_OPTIONS.set(options)
+	try:
+		yield options
+	finally:
+		_CALL_OPTIONS.reset(token)
+
+
+class TokenBucket:
+	"""Token bucket refilled continuously at ``rate`` tokens/s up to ``capacity``."""
+
+	def __init__(self, rate: float, capacity: float):
+		self.rate = max(1e-6, float(rate))
+		self.capacity = max(1.0, float(capacity))
+		self.tokens = self.capacity
+		self._updated = time.monotonic()
+		self.waiters: List[Tuple[int, int]] = []  # heap of (priority, seq)
+		self.admitted = 0
+		self.rejected = 0
+
+	def refill(self, now: float) -> None:
+		elapsed = now - self._updated
+		if elapsed > 0:
+			self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+			self._updated = now
+
+
+class RateLimiter:
+	"""Per-key token buckets with a bounded, priority-ordered wait queue.
+
+	``acquire`` admits immediately when a token is free and nobody is queued.
+	Otherwise the caller joins the queue, unless the queue is full or the
+	estimated wait would overrun its deadline. Both cases are rejected at
+	once, so no time is spent waiting. Queued callers are served by priority
+	class, then arrival order.
+	"""
+
+	def __init__(
+		self,
+		limits: Optional[Dict[str, Tuple[float, float]]] = None,
+		default_limit: Tuple[float, float] = (10.0, 10.0),
+		max_waiters: int = 32,
+		max_wait: float = 5.0,
+	):
+		self.limits = dict(limits or {})
+		self.default_limit = default_limit
+		self.max_waiters = max(0, int(max_waiters))
+		self.max_wait = float(max_wait)
+		self._buckets: Dict[str, TokenBucket] = {}
+		self._cond = threading.Condition()
+		self._seq = itertools.count()
+
+	def _bucket(self, key: str) -> TokenBucket:
+		bucket = self._buckets.get(key)
+		if bucket is None:
+			rate, capacity = self.limits.get(key, self.default_limit)
+			bucket = TokenBucket(rate, capacity)
+			self._buckets[key] = bucket
+		return bucket
+
+	def acquire(self, key: str, priority: str = "interactive", deadline: Optional[float] = None) -> bool:
+		prio = PRIORITIES.get(priority, PRIORITIES["default"])
+		with self._cond:
+			now = time.monotonic()
+			bucket = self._bucket(key)
+			bucket.refill(now)
+			if not bucket.waiters and bucket.tokens >= 1:
+				bucket.tokens -= 1
+				bucket.admitted += 1
+				return True
+			if len(bucket.waiters) >= self.max_waiters:
+				bucket.rejected += 1
+				return False
+			limit = now + self.max_wait
+			deadline = limit if deadline is None else min(deadline, limit)
+			ahead = sum(1 for p, _ in bucket.waiters if p <= prio)
+			eta = max(0.0, (ahead + 1 - bucket.tokens) / bucket.rate)
+			if now + eta > deadline:
+				bucket.rejected += 1
+				return False
+			me = (prio, next(self._seq))
+			heapq.heappush(bucket.waiters, me)
+			try:
+				while True:
+					now = time.monotonic()
+					bucket.refill(now)
+					if bucket.waiters[0] == me and bucket.tokens >= 1:
+						heapq.heappop(bucket.waiters)
+						bucket.tokens -= 1
+						bucket.admitted += 1
+						return True
+					remaining = deadline - now
+					if remaining <= 0:
+						bucket.rejected += 1
+						return False
+					wait_for = (1 - bucket.tokens) / bucket.rate if bucket.tokens < 1 else 0.01
+					self._cond.wait(min(max(wait_for, 0.001), remaining))
+			finally:
+				# Rejected or interrupted (e.g. gevent.Timeout) waiters must leave
+				# the queue, or they would block its head forever.
+				if me in bucket.waiters:
+					bucket.waiters.remove(me)
+					heapq.heapify(bucket.waiters)
+				self._cond.notify_all()
+
+	def snapshot(self) -> Dict[str, Dict[str, Any]]:
+		with self._cond:
+			now = time.monotonic()
+			stats = {}
+			for key, bucket in self._buckets.items():
+				bucket.refill(now)
+				stats[key] = {
+					"tokens": round(bucket.tokens, 3),
+					"capacity": bucket.capacity,
+					"rate": bucket.rate,
+					"waiting": len(bucket.waiters),
+					"admitted": bucket.admitted,
+					"rejected": bucket.rejected,
+				}
+			return stats
+
+
+class LatencyHistogram:
+	"""Log-bucketed latency histogram (seconds) with quantile estimates.
+
+	Buckets grow by 1.5x from 5 ms to ~1 min. Once ``window`` samples have
+	been seen all counts are halved, so quantiles follow recent behaviour
+	rather than the whole process lifetime.
+	"""
+
+	BOUNDS = tuple(0.005 * 1.5 ** i for i in range(24))
+
+	def __init__(self, window: int = 1000):
+		self.window = max(2, int(window))
+		self._counts = [0] * (len(self.BOUNDS) + 1)
+		self._total = 0
+		self._lock = threading.Lock()
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def observe(self, seconds: float) -> None:
+		seconds = max(0.0, float(seconds))
+		bucket = next((i for i, bound in enumerate(self.BOUNDS) if seconds <= bound), len(self.BOUNDS))
+		with self._lock:
+			self._counts[bucket] += 1
+			self._total += 1
+			self.count += 1
+			self.sum += seconds
+			self.max = max(self.max, seconds)
+			if self._total >= self.window:
+				self._counts = [c // 2 for c in self._counts]
+				self._total = sum(self._counts)
+
+	def quantile(self, q: float) -> Optional[float]:
+		"""Upper bound of the bucket holding the ``q`` quantile; None if empty."""
+		with self._lock:
+			if not self._total:
+				return None
+			rank = q * self._total
+			seen = 0
+			for i, n in enumerate(self._counts):
+				seen += n
+				if seen >= rank and n:
+					return self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+			return self.max
+
+	def snapshot(self) -> Dict[str, Any]:
+		def rounded(value: Optional[float]) -> Optional[float]:
+			return None if value is None else round(value, 4)
+
+		return {
+			"count": self.count,
+			"mean": round(self.sum / self.count, 4) if self.count else None,
+			"p50": rounded(self.quantile(0.5)),
+			"p95": rounded(self.quantile(0.95)),
+			"p99": rounded(self.quantile(0.99)),
+			"max": round(self.max, 4),
+		}
+
+
+__all__ = [
+	"CircuitBreaker",
+	"RetryPolicy",
+	"SingleFlight",
+	"RateLimiter",
+	"TokenBucket",
+	"LatencyHistogram",
+	"CallOptions",
+	"PRIORITIES",
+	"call_options",
+	"current_call_options",
+]
@@ -0,0 +1,267 @@
+"""Minimal MCP (Model Context Protocol) client session over streamable HTTP.
+
+Speaks JSON-RPC 2.0 to a remote MCP server such as ``https://mcp.amap.com/mcp``:
+
+- ``initialize`` once (guarded by a lock so concurrent greenlets share it),
+  followed by the ``notifications/initialized`` notification;
+- ``tools/list`` is fetched lazily and cached for the session lifetime;
+- ``tools/call`` requests carry monotonically increasing ids and reuse the
+  ``Mcp-Session-Id`` header returned by the server.
+
+Responses may be plain ``application/json`` or a ``text/event-stream`` body
+(streamable-HTTP transport); both are handled. If the server forgets the
+session (HTTP 404) the session is re-initialized once and the call retried.
+``AsyncMCPSession`` is the asyncio twin used by ``AsyncMCPClientWrapper``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2025-03-26"
+CLIENT_INFO = {"name": "city-tour-agent", "version": "1.0"}
+
+
+class MCPSessionError(Exception):
+	"""Transport or protocol failure talking to a remote MCP server."""
+
+
+class _MCPSessionBase:
+	"""Protocol state and message handling shared by the sync/async sessions."""
+
+	def __init__(self, url: str, timeout: float = 15.0):
+		self.url = url
+		self.timeout = timeout
+		self.session_id: Optional[str] = None
+		self.protocol_version: Optional[str] = None
+		self.server_info: Dict[str, Any] = {}
+		self._tools: Optional[List[Dict[str, Any]]] = None
+		self._initialized = False
+		self._ids = itertools.count(1)
+		self._ids_lock = threading.Lock()
+
+	@property
+	def initialized(self) -> bool:
+		return self._initialized
+
+	def _next_id(self) -> int:
+		with self._ids_lock:
+			return next(self._ids)
+
+	def _headers(self) -> Dict[str, str]:
+		headers = {
+			"Content-Type": "application/json",
+			"Accept": "application/json, text/event-stream",
+		}
+		if self.session_id:
+			headers["Mcp-Session-Id"] = self.session_id
+		if self.protocol_version:
+			headers["MCP-Protocol-Version"] = self.protocol_version
+		return headers
+
+	def _request_message(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+		message = {"jsonrpc": "2.0", "id": self._next_id(), "method": method}
+		if params is not None:
+			message["params"] = params
+		return message
+
+	def _initialize_message(self) -> Dict[str, Any]:
+		return self._request_message(
+			"initialize",
+			{"protocolVersion": PROTOCOL_VERSION, "capabilities": {}, "clientInfo": CLIENT_INFO},
+		)
+
+	# Notifications carry no id; servers answer 202 Accepted with no body.
+	INITIALIZED_NOTIFICATION = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+
+	@staticmethod
+	def _parse_response(resp: Any, request_id: int) -> Dict[str, Any]:
+		"""Extract the JSON-RPC reply for ``request_id`` from a requests/httpx response."""
+		content_type = (getattr(resp, "headers", None) or {}).get("Content-Type", "")
+		if "text/event-stream" in content_type:
+			data_lines: List[str] = []
+			# Events are separated by blank lines; the final "" flushes the last one.
+			for line in resp.text.splitlines() + [""]:
+				if line.startswith("data:"):
+					data_lines.append(line[5:].strip())
+				elif not line and data_lines:
+					try:
+						message = json.loads("\n".join(data_lines))
+					except ValueError:
+						message = None
+					data_lines = []
+					if isinstance(message, dict) and message.get("id") == request_id:
+						return message
+			raise MCPSessionError("No JSON-RPC response for request id %s in event stream" % request_id)
+		try:
+			message = resp.json()
+		except Exception as e:
+			raise MCPSessionError("MCP response not JSON decodable") from e
+		if isinstance(message, list):  # batched reply
+			message = next((m for m in message if isinstance(m, dict) and m.get("id") == request_id), None)
+		if not isinstance(message, dict):
+			raise MCPSessionError("Unexpected MCP response payload")
+		return message
+
+	def _reply_result(self, method: str, resp: Any, request_id: int) -> Any:
+		if resp.status_code != 200:
+			raise MCPSessionError(f"MCP {method} returned HTTP {resp.status_code}")
+		reply = self._parse_response(resp, request_id)
+		if "error" in reply:
+			error = reply["error"] or {}
+			raise MCPSessionError(f"MCP {method} error {error.get('code')}: {error.get('message')}")
+		return reply.get("result")
+
+	def _accept_initialize(self, resp: Any, request_id: int) -> None:
+		result = self._reply_result("initialize", resp, request_id) or {}
+		self.session_id = (getattr(resp, "headers", None) or {}).get("Mcp-Session-Id") or self.session_id
+		self.protocol_version = result.get("protocolVersion") or PROTOCOL_VERSION
+		self.server_info = result.get("serverInfo") or {}
+
+	def _forget(self) -> None:
+		self._initialized = False
+		self.session_id = None
+		self.protocol_version = None
+		self._tools = None
+
+	def _session_expired(self, resp: Any) -> bool:
+		return resp.status_code == 404 and bool(self.session_id)
+
+	def _find_tool(self, tools: List[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+		return next((t for t in tools if t.get("name") == name), None)
+
+	@staticmethod
+	def _decode_tool_result(name: str, result: Dict[str, Any]) -> Optional[Any]:
+		if result.get("isError"):
+			LOGGER.debug("MCP tool %s reported error: %s", name, result.get("content"))
+			return None
+		if result.get("structuredContent") is not None:
+			return result["structuredContent"]
+		texts = [c.get("text", "") for c in result.get("content") or [] if c.get("type") == "text"]
+		if not texts:
+			return None
+		text = "".join(texts)
+		try:
+			return json.loads(text)
+		except ValueError:
+			return {"text": text}
+
+
+class MCPSession(_MCPSessionBase):
+	"""A reusable JSON-RPC session against one streamable-HTTP MCP endpoint."""
+
+	def __init__(self, url: str, http: requests.Session, timeout: float = 15.0):
+		super().__init__(url, timeout)
+		self.http = http
+		self._init_lock = threading.Lock()
+
+	def _post(self, message: Dict[str, Any]) -> requests.Response:
+		try:
+			return self.http.post(self.url, json=message, headers=self._headers(), timeout=self.timeout, stream=False)
+		except requests.RequestException as e:
+			raise MCPSessionError(f"MCP request failed: {e}") from e
+
+	def _request(self, method: str, params: Optional[Dict[str, Any]] = None, _retry: bool = True) -> Any:
+		self.ensure_initialized()
+		message = self._request_message(method, params)
+		resp = self._post(message)
+		if self._session_expired(resp) and _retry:
+			LOGGER.debug("MCP session %s expired -> re-initialize", self.session_id)
+			self.reset()
+			return self._request(method, params, _retry=False)
+		return self._reply_result(method, resp, message["id"])
+
+	def ensure_initialized(self) -> None:
+		if self._initialized:
+			return
+		with self._init_lock:
+			if self._initialized:
+				return
+			message = self._initialize_message()
+			self._accept_initialize(self._post(message), message["id"])
+			self._post(self.INITIALIZED_NOTIFICATION)
+			self._initialized = True
+
+	def reset(self) -> None:
+		"""Forget the current session so the next request re-initializes."""
+		with self._init_lock:
+			self._forget()
+
+	def list_tools(self) -> List[Dict[str, Any]]:
+		if self._tools is None:
+			result = self._request("tools/list") or {}
+			self._tools = list(result.get("tools") or [])
+		return self._tools
+
+	def tool(self, name: str) -> Optional[Dict[str, Any]]:
+		return self._find_tool(self.list_tools(), name)
+
+	def call_tool(self, name: str, arguments: Dict[str, Any]) -> Optional[Any]:
+		"""Invoke ``tools/call``. Returns decoded content, or None if the tool reported an error."""
+		result = self._request("tools/call", {"name": name, "arguments": arguments}) or {}
+		return self._decode_tool_result(name, result)
+
+
+class AsyncMCPSession(_MCPSessionBase):
+	"""asyncio twin of :class:`MCPSession` on top of an ``httpx.AsyncClient``."""
+
+	def __init__(self, url: str, http: Any, timeout: float = 15.0):
+		super().__init__(url, timeout)
+		self.http = http
+		self._init_lock: Optional[asyncio.Lock] = None
+
+	async def _post(self, message: Dict[str, Any]) -> Any:
+		import httpx
+
+		try:
+			return await self.http.post(self.url, json=message, headers=self._headers(), timeout=self.timeout)
+		except httpx.HTTPError as e:
+			raise MCPSessionError(f"MCP request failed: {e}") from e
+
+	async def _request(self, method: str, params: Optional[Dict[str, Any]] = None, _retry: bool = True) -> Any:
+		await self.ensure_initialized()
+		message = self._request_message(method, params)
+		resp = await self._post(message)
+		if self._session_expired(resp) and _retry:
+			LOGGER.debug("MCP session %s expired -> re-initialize", self.session_id)
+			self._forget()
+			return await self._request(method, params, _retry=False)
+		return self._reply_result(method, resp, message["id"])
+
+	async def ensure_initialized(self) -> None:
+		if self._initialized:
+			return
+		if self._init_lock is None:  # created lazily inside the running loop
+			self._init_lock = asyncio.Lock()
+		async with self._init_lock:
+			if self._initialized:
+				return
+			message = self._initialize_message()
+			self._accept_initialize(await self._post(message), message["id"])
+			await self._post(self.INITIALIZED_NOTIFICATION)
+			self._initialized = True
+
+	async def list_tools(self) -> List[Dict[str, Any]]:
+		if self._tools is None:
+			result = await self._request("tools/list") or {}
+			self._tools = list(result.get("tools") or [])
+		return self._tools
+
+	async def tool(self, name: str) -> Optional[Dict[str, Any]]:
+		return self._find_tool(await self.list_tools(), name)
+
+	async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Optional[Any]:
+		result = await self._request("tools/call", {"name": name, "arguments": arguments}) or {}
+		return self._decode_tool_result(name, result)
+
+
+__all__ = ["MCPSession", "AsyncMCPSession", "MCPSessionError", "PROTOCOL_VERSION"]
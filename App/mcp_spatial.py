@@ -0,0 +1,196 @@
+"""In-process spatial index of POIs seen in AMap search results.
+
+POIs from ``search_pois`` / ``search_around`` are bucketed on a fixed
+lng/lat grid. Each ``search_around`` answer also records a *coverage*
+circle for its query (keywords + types): if AMap returned every match the
+circle is the query radius, otherwise it shrinks to the farthest POI
+returned (results are distance-sorted, so everything closer is known).
+
+A later ``search_around`` with the same keywords/types whose circle lies
+inside a fresh coverage circle can then be answered from the grid alone:
+every matching POI in that area has already been seen.
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+
+def parse_location(value: Any) -> Optional[Tuple[float, float]]:
+	"""``"lng,lat"`` -> ``(lng, lat)``; None if malformed."""
+	try:
+		lng, lat = (float(x) for x in str(value).split(","))
+	except (TypeError, ValueError):
+		return None
+	return lng, lat
+
+
+def snap_location(value: Any, meters: float) -> Any:
+	"""Snap ``"lng,lat"`` (or ``|``-joined points) to a ~``meters`` grid.
+
+	The longitude step is widened by ``1/cos(lat)`` so cells stay roughly
+	square. Malformed values are returned unchanged.
+	"""
+	if value is None or meters <= 0:
+		return value
+	snapped = []
+	for part in str(value).split("|"):
+		point = parse_location(part)
+		if point is None:
+			return value
+		lng, lat = point
+		lat_step = meters / METERS_PER_DEGREE
+		lat = round(lat / lat_step) * lat_step
+		lng_step = meters / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(lat))))
+		lng = round(lng / lng_step) * lng_step
+		snapped.append(f"{lng:.6f},{lat:.6f}")
+	return "|".join(snapped)
+
+
+def bucket_radius(value: Any, buckets: Tuple[int, ...]) -> Any:
+	"""Round a search radius up to the next bucket; unparsable values pass through."""
+	try:
+		radius = float(value)
+	except (TypeError, ValueError):
+		return value
+	return next((b for b in buckets if b >= radius), int(radius))
+
+
+def haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+	"""Great-circle distance in meters between two ``(lng, lat)`` points."""
+	lng1, lat1, lng2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+	h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+	return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+class _Coverage:
+	__slots__ = ("center", "radius", "expires_at")
+
+	def __init__(self, center: Tuple[float, float], radius: float, expires_at: float):
+		self.center = center
+		self.radius = radius
+		self.expires_at = expires_at
+
+
+class SpatialIndex:
+	"""Grid-bucketed POI store with per-query coverage circles.
+
+	``cell_deg`` is the grid cell size in degrees (0.01 ≈ 1.1 km).
+	Coverage older than ``max_age`` seconds is ignored, and beyond
+	``max_pois`` the least recently seen POIs are dropped.
+	"""
+
+	def __init__(self, cell_deg: float = 0.01, max_age: float = 3600.0, max_pois: int = 20000, max_coverage_per_query: int = 64):
+		self.cell_deg = cell_deg
+		self.max_age = max_age
+		self.max_pois = max(1, int(max_pois))
+		self.max_coverage_per_query = max(1, int(max_coverage_per_query))
+		self._lock = threading.Lock()
+		# poi id -> (poi, (lng, lat), query keys it matched)
+		self._pois: "OrderedDict[str, Tuple[Dict[str, Any], Tuple[float, float], Set[str]]]" = OrderedDict()
+		self._cells: Dict[Tuple[int, int], Set[str]] = {}
+		self._coverage: Dict[str, List[_Coverage]] = {}
+		self.hits = 0
+		self.misses = 0
+
+	def _cell(self, point: Tuple[float, float]) -> Tuple[int, int]:
+		return int(math.floor(point[0] / self.cell_deg)), int(math.floor(point[1] / self.cell_deg))
+
+	def add(self, pois: Iterable[Dict[str, Any]], query_key: Optional[str] = None) -> None:
+		"""Insert / refresh POIs, tagging them with ``query_key`` if given."""
+		with self._lock:
+			for poi in pois:
+				poi_id = poi.get("id")
+				point = parse_location(poi.get("location"))
+				if not poi_id or point is None:
+					continue
+				keys: Set[str] = set()
+				if poi_id in self._pois:
+					_, old_point, keys = self._pois.pop(poi_id)
+					self._cells.get(self._cell(old_point), set()).discard(poi_id)
+				if query_key:
+					keys.add(query_key)
+				stored = copy.deepcopy({k: v for k, v in poi.items() if k != "distance"})
+				self._pois[poi_id] = (stored, point, keys)
+				self._cells.setdefault(self._cell(point), set()).add(poi_id)
+			if len(self._pois) > self.max_pois:
+				while len(self._pois) > self.max_pois:
+					old_id, (_, old_point, _) = self._pois.popitem(last=False)
+					self._cells.get(self._cell(old_point), set()).discard(old_id)
+				# Coverage may now have holes; rebuild it from fresh searches.
+				self._coverage.clear()
+
+	def record_coverage(self, query_key: str, center: Tuple[float, float], radius: float) -> None:
+		if radius <= 0:
+			return
+		now = time.monotonic()
+		with self._lock:
+			circles = [c for c in self._coverage.get(query_key, []) if c.expires_at > now]
+			circles.append(_Coverage(center, radius, now + self.max_age))
+			self._coverage[query_key] = circles[-self.max_coverage_per_query:]
+
+	def covered(self, query_key: str, center: Tuple[float, float], radius: float) -> bool:
+		now = time.monotonic()
+		with self._lock:
+			return any(
+				c.expires_at > now and haversine_m(c.center, center) + radius <= c.radius
+				for c in self._coverage.get(query_key, ())
+			)
+
+	def query(self, query_key: str, center: Tuple[float, float], radius: float) -> Optional[List[Dict[str, Any]]]:
+		"""POIs matching ``query_key`` within ``radius`` m, nearest first.
+
+		Returns None (caller must ask AMap) unless a fresh coverage circle
+		contains the whole query circle.
+		"""
+		if not self.covered(query_key, center, radius):
+			with self._lock:
+				self.misses += 1
+			return None
+		dlat = radius / METERS_PER_DEGREE
+		dlng = radius / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(center[1]))))
+		lo = self._cell((center[0] - dlng, center[1] - dlat))
+		hi = self._cell((center[0] + dlng, center[1] + dlat))
+		found: List[Tuple[float, Dict[str, Any]]] = []
+		with self._lock:
+			for cx in range(lo[0], hi[0] + 1):
+				for cy in range(lo[1], hi[1] + 1):
+					for poi_id in self._cells.get((cx, cy), ()):
+						poi, point, keys = self._pois[poi_id]
+						if query_key not in keys:
+							continue
+						meters = haversine_m(center, point)
+						if meters <= radius:
+							found.append((meters, poi))
+			self.hits += 1
+		found.sort(key=lambda item: item[0])
+		return [dict(copy.deepcopy(poi), distance=str(int(round(meters)))) for meters, poi in found]
+
+	def clear(self) -> None:
+		with self._lock:
+			self._pois.clear()
+			self._cells.clear()
+			self._coverage.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"pois": len(self._pois),
+				"cells": sum(1 for ids in self._cells.values() if ids),
+				"coverage": sum(len(c) for c in self._coverage.values()),
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+			}
+
+
+__all__ = ["SpatialIndex", "bucket_radius", "haversine_m", "parse_location", "snap_location"]
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地意图路由离线评估工具
+
+对一组用户问题分别调用 LLM 路由（/api/chat 使用的 BASE_MODEL 路由提示词）和
+本地嵌入模型意图路由（App/intent_router.py），报告：
+- 两者的一致率、混淆矩阵
+- 本地路由可直接采用的比例（置信且为 NEED_TOOLS/ITINERARY_* 时跳过 LLM 调用）
+- 直接采用部分与 LLM 结果的一致率
+- 两种路由的平均延迟及节省的总延迟
+- 不同置信阈值下的覆盖率/一致率
+
+使用方法:
+    python evaluate_intent_router.py
+    python evaluate_intent_router.py --dataset questions.txt --threshold 0.65 --margin 0.05
+
+数据集为文本文件（每行一个问题）或 JSONL（每行 {"question": "..."}）。
+需要配置 ARK_API_KEY，并已下载嵌入模型（见 download_model.py）。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+SAMPLE_QUESTIONS = [
+    "今天天气怎么样？",
+    "明天会下雨吗？",
+    "推荐几家好吃的海鲜餐厅",
+    "骑楼老街附近有什么酒店",
+    "从美兰机场到万绿园有多远",
+    "附近有没有适合夜宵的地方",
+    "帮我把刚才推荐的景点排成两天的行程",
+    "请给我生成一份三日游行程表",
+    "第二天的安排改成去海边，更新一下行程",
+    "我现在的行程安排合理吗",
+    "这个行程会不会太赶",
+    "帮我评估一下路线是否顺路",
+    "这里有哪些特色小吃",
+    "几月份来旅游最好",
+    "当地有什么风俗禁忌",
+    "你好",
+    "天气这么热需要准备什么",
+    "假日海滩和火山口公园哪个更值得去",
+    "有没有适合带老人去的景点，具体在哪里",
+    "晚上有什么好玩的",
+]
+
+LABELS = ["NEED_TOOLS", "ITINERARY_UPDATE", "ITINERARY_ANALYZE", "DIRECT_ANSWER"]
+SWEEP_THRESHOLDS = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8]
+
+
+def setup_logging():
+    """设置日志配置"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+def load_questions(path):
+    """读取评估问题：文本文件每行一个问题，或 JSONL 每行 {"question": ...}"""
+    if not path:
+        return list(SAMPLE_QUESTIONS)
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('question', '').strip()
+            if line:
+                questions.append(line)
+    return questions
+
+
+def llm_route(app_module, question):
+    """调用 LLM 路由，返回 (标签, 耗时秒)"""
+    cache_status = app_module.check_cache_and_docs_status()
+    messages = [
+        app_module.build_router_system_message(cache_status),
+        {"role": "user", "content": question},
+    ]
+    start_time = time.perf_counter()
+    response = app_module.client.chat.completions.create(
+        model=app_module.BASE_MODEL,
+        messages=messages
+    )
+    seconds = time.perf_counter() - start_time
+    reply = response.choices[0].message.content.strip()
+    return (reply if reply in LABELS[:3] else "DIRECT_ANSWER"), seconds
+
+
+def print_report(rows, threshold, margin):
+    """输出评估报告"""
+    total = len(rows)
+    agree = sum(1 for r in rows if r["local"]["label"] == r["llm"])
+    skipped = [r for r in rows if r["skip"]]
+    skipped_agree = sum(1 for r in skipped if r["local"]["label"] == r["llm"])
+    llm_ms = sum(r["llm_seconds"] for r in rows) / total * 1000
+    local_ms = sum(r["local"]["ms"] for r in rows) / total
+    saved_ms = sum(r["llm_seconds"] * 1000 for r in skipped) - sum(r["local"]["ms"] for r in rows)
+
+    print("\n" + "=" * 60)
+    print(f"📊 本地意图路由评估（threshold={threshold}, margin={margin}）")
+    print("=" * 60)
+    print(f"问题数: {total}")
+    print(f"与LLM路由一致率: {agree / total:.1%}")
+    print(f"本地直接采用（跳过LLM路由）: {len(skipped)}/{total} ({len(skipped) / total:.1%})")
+    if skipped:
+        print(f"直接采用部分一致率: {skipped_agree / len(skipped):.1%}")
+    print(f"平均延迟: LLM路由 {llm_ms:.0f}ms, 本地路由 {local_ms:.1f}ms")
+    print(f"节省总延迟: {saved_ms / 1000:.2f}s（平均每请求 {saved_ms / total:.0f}ms）")
+
+    print("\n混淆矩阵（行: LLM, 列: 本地）")
+    print("".ljust(20) + "".join(label[:12].ljust(14) for label in LABELS))
+    for llm_label in LABELS:
+        counts = [sum(1 for r in rows if r["llm"] == llm_label and r["local"]["label"] == label) for label in LABELS]
+        print(llm_label.ljust(20) + "".join(str(c).ljust(14) for c in counts))
+
+    print("\n阈值扫描（margin 固定）")
+    print("threshold".ljust(12) + "采用率".ljust(10) + "一致率")
+    for t in SWEEP_THRESHOLDS:
+        taken = [
+            r for r in rows
+            if r["local"]["label"] in LABELS[:3] and r["local"]["score"] >= t and r["local"]["margin"] >= margin
+        ]
+        ratio = len(taken) / total
+        accuracy = sum(1 for r in taken if r["local"]["label"] == r["llm"]) / len(taken) if taken else 0.0
+        print(f"{t:<12}{ratio:<10.1%}{accuracy:.1%}")
+
+    disagreements = [r for r in skipped if r["local"]["label"] != r["llm"]]
+    if disagreements:
+        print("\n⚠️ 直接采用但与LLM不一致的问题:")
+        for r in disagreements:
+            print(f"  - {r['question']}  本地={r['local']['label']} LLM={r['llm']} score={r['local']['score']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估本地意图路由与LLM路由的一致性及节省的延迟")
+    parser.add_argument("--dataset", help="问题文件（每行一个问题，或 JSONL {\"question\": ...}）")
+    parser.add_argument("--threshold", type=float, default=None, help="置信阈值，默认使用应用配置")
+    parser.add_argument("--margin", type=float, default=None, help="最高与次高相似度之差下限，默认使用应用配置")
+    parser.add_argument("--output", help="将逐条结果写入 JSONL 文件")
+    args = parser.parse_args()
+
+    setup_logging()
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from App import app as app_module
+    from App.intent_router import IntentRouter
+
+    questions = load_questions(args.dataset)
+    if not questions:
+        logging.error("❌ 没有可评估的问题")
+        return 1
+
+    logging.info("🚀 加载嵌入模型...")
+    app_module.get_embedding_model()
+    threshold = args.threshold if args.threshold is not None else app_module.INTENT_ROUTER_THRESHOLD
+    margin = args.margin if args.margin is not None else app_module.INTENT_ROUTER_MARGIN
+    router = IntentRouter(app_module._encode_with_embedding_model, threshold=threshold, margin=margin)
+    router.classify("预热")  # 预先计算原型向量，不计入延迟
+
+    rows = []
+    for i, question in enumerate(questions, 1):
+        decision = router.classify(question).as_dict()
+        try:
+            llm_label, llm_seconds = llm_route(app_module, question)
+        except Exception as e:
+            logging.error(f"❌ LLM路由调用失败，跳过: {question} ({e})")
+            continue
+        rows.append({
+            "question": question,
+            "llm": llm_label,
+            "llm_seconds": llm_seconds,
+            "local": decision,
+            "skip": decision["confident"] and decision["label"] in LABELS[:3],
+        })
+        logging.info(f"[{i}/{len(questions)}] {question} → LLM={llm_label} 本地={decision['label']} ({decision['score']})")
+
+    if not rows:
+        logging.error("❌ 所有LLM路由调用均失败")
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        logging.info(f"💾 逐条结果已写入: {args.output}")
+
+    print_report(rows, threshold, margin)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Tests for the semantic direct-answer cache (fake encoder, no model)."""
+
+from __future__ import annotations
+
+from App import answer_cache as answer_cache_module
+from App.answer_cache import SemanticAnswerCache, first_turn_question
+
+
+def char_encoder(texts):
+    """Bag-of-characters vectors: near-identical questions get near-identical vectors."""
+    vocab = "海口三亚什么季节旅游最好哪里有特色美食吗？"
+    return [[float(text.count(ch)) for ch in vocab] for text in texts]
+
+
+def test_lookup_partitions_expires_and_invalidates(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticAnswerCache(char_encoder, threshold=0.9, ttl=60, max_entries=2)
+    cache.check_version(("海口", (1, 2, 3)))
+
+    question = "什么季节旅游最好？"
+    cache.store("海口", question, cache.embed(question), "冬春季最好")
+
+    hit = cache.lookup("海口", cache.embed("什么季节旅游最好"))
+    assert hit["answer"] == "冬春季最好" and hit["score"] >= 0.9
+    # Dissimilar question and other cities miss.
+    assert cache.lookup("海口", cache.embed("哪里有特色美食")) is None
+    assert cache.lookup("三亚", cache.embed(question)) is None
+
+    # Per-city size bound evicts the least recently used entry.
+    cache.store("海口", "哪里有特色美食", cache.embed("哪里有特色美食"), "老街")
+    cache.lookup("海口", cache.embed(question))
+    cache.store("海口", "有美食吗", cache.embed("有美食吗"), "有")
+    assert cache.stats()["entries"] == {"海口": 2}
+    assert cache.lookup("海口", cache.embed("哪里有特色美食")) is None
+    assert cache.lookup("海口", cache.embed(question)) is not None
+
+    # TTL expiry.
+    now[0] += 61
+    assert cache.lookup("海口", cache.embed(question)) is None
+
+    # Config/city change drops everything; purge clears on demand.
+    cache.store("海口", question, cache.embed(question), "冬春季最好")
+    assert cache.check_version(("海口", (1, 2, 3))) is False
+    assert cache.check_version(("海口", (1, 2, 4))) is True
+    assert cache.lookup("海口", cache.embed(question)) is None
+    cache.store("三亚", question, cache.embed(question), "全年")
+    assert cache.purge("三亚") == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_first_turn_ignores_the_frontend_greeting():
+    # Shape of /api/chat messages from App/static/index.html (router prompt inserted server-side).
+    messages = [
+        {"role": "system", "content": "路由提示词"},
+        {"role": "system", "content": "你是一个专业的海口旅游规划助手。"},
+        {"role": "assistant", "content": "您好！请提供您的旅行信息，我会为您规划行程。"},
+        {"role": "user", "content": " 什么季节旅游最好？ "},
+    ]
+    assert first_turn_question(messages) == "什么季节旅游最好？"
+
+    follow_up = messages + [
+        {"role": "assistant", "content": "冬春季最好"},
+        {"role": "user", "content": "那夏天呢？"},
+    ]
+    assert first_turn_question(follow_up) is None
+    assert first_turn_question(messages[:3]) is None, "last message is not from the user"
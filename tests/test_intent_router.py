@@ -0,0 +1,54 @@
+"""Tests for the local embedding-based intent router (fake encoder, no model)."""
+
+from __future__ import annotations
+
+from App.intent_router import DIRECT_ANSWER, ITINERARY_UPDATE, NEED_TOOLS, IntentRouter
+
+
+PROTOTYPES = {
+    NEED_TOOLS: ["明天天气怎么样", "附近有什么酒店"],
+    ITINERARY_UPDATE: ["帮我生成行程表", "安排一下明天的日程"],
+    DIRECT_ANSWER: ["你好", "谢谢"],
+}
+
+
+def char_encoder(calls):
+    """Bag-of-characters vectors over a fixed vocabulary; records each batch."""
+    vocab = sorted({ch for texts in PROTOTYPES.values() for text in texts for ch in text} | set("后天气如何呢"))
+
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(text.count(ch)) for ch in vocab] for text in texts]
+
+    return encode
+
+
+def test_classify_confident_and_uncertain():
+    calls = []
+    router = IntentRouter(char_encoder(calls), prototypes=PROTOTYPES, threshold=0.5, margin=0.05, top_k=1)
+
+    decision = router.classify("后天天气如何呢")
+    assert decision.label == NEED_TOOLS
+    assert decision.confident
+    assert decision.as_dict()["scores"][NEED_TOOLS] == round(decision.score, 4)
+
+    decision = router.classify("帮我生成行程表吧")
+    assert decision.label == ITINERARY_UPDATE and decision.confident
+
+    # Nothing in common with any prototype -> below threshold, caller falls back to the LLM.
+    assert not router.classify("xyz").confident
+
+    # Prototypes are embedded once, in a single batch.
+    assert len(calls[0]) == 6
+    assert all(len(batch) == 1 for batch in calls[1:])
+
+    # A precomputed query vector (shared with the answer cache) is not encoded again.
+    vector = router.embed("你好呢")
+    encoded = len(calls)
+    assert router.classify("你好呢", vector).label == DIRECT_ANSWER
+    assert len(calls) == encoded
+
+    stats = router.stats()
+    assert stats["classified"] == 4
+    assert stats["confident"][NEED_TOOLS] == 1 and stats["confident"][ITINERARY_UPDATE] == 1
+    assert stats["uncertain"] == 1
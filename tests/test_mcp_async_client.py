@@ -0,0 +1,84 @@
+"""Tests for AsyncMCPClientWrapper using httpx.MockTransport (no network)."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from App.mcp_async_client import AsyncMCPClientWrapper
+from App.mcp_client_wrapper import MCPClientWrapper
+
+
+def make_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_exposes_same_methods_as_sync_wrapper():
+    for name in MCPClientWrapper.TOOL_NAME_MAP:
+        assert asyncio.iscoroutinefunction(getattr(AsyncMCPClientWrapper, name)), name
+
+
+def test_gather_falls_back_to_rest_concurrently():
+    seen = []
+
+    async def handler(request: httpx.Request):
+        if request.url.host == "mcp.amap.com":
+            return httpx.Response(503, json={"error": "down"})
+        seen.append(request.url.path)
+        await asyncio.sleep(0.05)
+        if request.url.path.endswith("weatherInfo"):
+            return httpx.Response(200, json={"status": "1", "forecasts": [{"city": "海口", "casts": list(range(14))}]})
+        return httpx.Response(200, json={"status": "1", "pois": [{"id": "P1"}], "ids": request.url.params.get("ids")})
+
+    async def run():
+        async with make_client(handler) as client:
+            amap = AsyncMCPClientWrapper(api_key="dummy", client=client)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            weather, pois, detail = await asyncio.gather(
+                amap.get_weather("海口"),
+                amap.search_pois("酒店", "海口"),
+                amap.get_poi_detail("B0FFG"),
+            )
+            elapsed = loop.time() - start
+            return weather, pois, detail, elapsed
+
+    weather, pois, detail, elapsed = asyncio.run(run())
+    assert len(weather["forecasts"][0]["casts"]) == 10, "shared truncation applies"
+    assert pois["pois"][0]["id"] == "P1"
+    assert detail["ids"] == "B0FFG", "poi_id is renamed to ids for REST"
+    assert sorted(seen) == ["/v3/place/text", "/v3/weather/weatherInfo", "/v5/place/detail"]
+    assert elapsed < 0.15, "requests must overlap, not run back to back"
+
+
+def test_async_remote_session_and_cache():
+    calls = []
+
+    async def handler(request: httpx.Request):
+        import json
+
+        body = json.loads(request.content or b"{}")
+        calls.append(body.get("method"))
+        if body.get("method") == "initialize":
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "result": {"protocolVersion": "2025-03-26"}}, headers={"Mcp-Session-Id": "s1"})
+        if "id" not in body:
+            return httpx.Response(202)
+        assert request.headers["Mcp-Session-Id"] == "s1"
+        if body["method"] == "tools/list":
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "result": {"tools": [{"name": "maps_weather"}]}})
+        text = json.dumps({"city": body["params"]["arguments"]["city"], "forecasts": [{"dayweather": "晴"}]})
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "result": {"content": [{"type": "text", "text": text}]}})
+
+    async def run():
+        async with make_client(handler) as client:
+            amap = AsyncMCPClientWrapper(api_key="dummy", client=client)
+            first = await amap.get_weather("海口")
+            second = await amap.get_weather("海口")
+            return first, second, amap.cache_stats()
+
+    first, second, stats = asyncio.run(run())
+    assert first == second
+    assert first["forecasts"][0]["casts"][0]["dayweather"] == "晴"
+    assert calls == ["initialize", "notifications/initialized", "tools/list", "tools/call"]
+    assert stats["hits"] == 1
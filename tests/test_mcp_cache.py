@@ -0,0 +1,300 @@
+"""Tests for the TTL/LRU response cache in front of MCPClientWrapper._call."""
+
+from __future__ import annotations
+
+import pytest
+
+from App.mcp_cache import PersistentCache, ResponseCache, make_cache_key
+from App.mcp_client_wrapper import MCPClientWrapper
+
+
+@pytest.fixture
+def counting_requests(monkeypatch):
+    import requests
+
+    calls = []
+
+    class R:
+        status_code = 200
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            pass
+
+    def fake_get(self, url, params=None, **kwargs):
+        calls.append((url, dict(params or {})))
+        return R({"status": "1", "echo": dict(params or {}), "geocodes": [{"location": "110.3,20.0"}]})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    return calls
+
+
+def test_cache_key_is_normalized():
+    a = make_cache_key("search_around", {"location": " 110.3,20.0 ", "radius": 1000, "types": ""})
+    b = make_cache_key("search_around", {"radius": "1000", "location": "110.3,20.0", "types": None})
+    assert a == b
+    assert make_cache_key("get_weather", {"city": "海口"}) != make_cache_key("get_weather", {"city": "三亚"})
+
+
+def test_ttl_expiry(monkeypatch):
+    import App.mcp_cache as mod
+
+    now = [100.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+    cache = ResponseCache()
+    cache.set("k", {"v": 1}, ttl=10)
+    assert cache.get("k") == {"v": 1}
+    now[0] += 11
+    assert cache.get("k") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")  # a becomes most recently used
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    small = ResponseCache(max_bytes=20)
+    small.set("x", "a" * 10, ttl=60)
+    small.set("y", "b" * 10, ttl=60)
+    assert small.get("x") is None and small.get("y") == "b" * 10
+    assert small.stats()["bytes"] <= 20
+
+
+def test_hits_return_fresh_copies():
+    cache = ResponseCache()
+    cache.set("k", {"pois": [1, 2]}, ttl=60)
+    first = cache.get("k")
+    first["pois"].append(3)
+    assert cache.get("k") == {"pois": [1, 2]}
+
+
+def test_wrapper_caches_per_tool(counting_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    wrapper.get_weather("海口")
+    wrapper.get_weather("海口 ")
+    assert len(counting_requests) == 1
+    # Distance has no TTL by default and always hits the network
+    wrapper.get_distance("1,1", "2,2")
+    wrapper.get_distance("1,1", "2,2")
+    assert len(counting_requests) == 3
+    stats = wrapper.cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_wrapper_cache_can_be_disabled(counting_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_cache=False)
+    wrapper.get_weather("海口")
+    wrapper.get_weather("海口")
+    assert len(counting_requests) == 2
+    assert wrapper.cache_stats() == {"enabled": False}
+
+
+def test_persistent_cache_survives_restart(counting_requests, tmp_path):
+    path = str(tmp_path / "amap.sqlite3")
+    first = MCPClientWrapper(api_key="dummy", enable_remote=False, persistent_cache_path=path)
+    first.get_geo_location("海口市美兰区", "海口")
+    first.get_weather("海口")
+    first.close()
+
+    # A fresh process (new wrapper, empty memory tier) answers geocodes from disk.
+    second = MCPClientWrapper(api_key="dummy", enable_remote=False, persistent_cache_path=path)
+    second.get_geo_location("海口市美兰区", "海口")
+    second.get_weather("海口")  # weather is memory-only
+    assert len(counting_requests) == 3
+    stats = second.cache_stats()["persistent"]
+    assert stats["hits"] == 1 and stats["entries"] == 1
+    second.close()
+
+
+def test_persistent_cache_compaction_expires_and_bounds(tmp_path, monkeypatch):
+    import App.mcp_cache as mod
+
+    now = [1000.0]
+    monkeypatch.setattr(mod.time, "time", lambda: now[0])
+    cache = PersistentCache(str(tmp_path / "c.sqlite3"), max_entries=2, background=False)
+    cache.set("old", 1, ttl=5)
+    for i, key in enumerate(("a", "b", "c")):
+        now[0] += 1
+        cache.set(key, i, ttl=600)
+    now[0] += 100
+    cache.get("a")  # a becomes most recently used
+    assert cache.compact() == 2  # "old" expired, "b" evicted as LRU
+    assert cache.get("b") is None
+    assert cache.get("a") == 0 and cache.get("c") == 2
+    cache.close()
+
+
+def test_location_calls_share_snapped_cache_entries(counting_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_spatial_index=False)
+    wrapper.get_regeocode("110.330012,20.020008")
+    wrapper.get_regeocode("110.330031,20.019991")  # ~3 m away
+    assert len(counting_requests) == 1
+    assert counting_requests[0][1]["location"] == wrapper._canonicalize("get_regeocode", {"location": "110.330031,20.019991"})["location"]
+
+    wrapper.search_around("110.3300,20.0200", "酒店", radius=700)
+    wrapper.search_around("110.33005,20.02005", "酒店", radius=800)  # ~7 m away, same radius bucket
+    assert len(counting_requests) == 2 and counting_requests[1][1]["radius"] == 800
+    wrapper.get_walking_directions("110.3300,20.0200", "110.3400,20.0300")
+    wrapper.get_walking_directions("110.33001,20.02001", "110.34001,20.03001")
+    assert len(counting_requests) == 3
+
+
+def test_bucketed_radius_is_fitted_back_to_the_request(monkeypatch):
+    import requests
+
+    class R:
+        status_code = 200
+
+        def json(self):
+            pois = [{"id": f"B{d}", "name": "x", "location": "110.33,20.02", "distance": str(d)} for d in (100, 400, 700)]
+            return {"status": "1", "count": "3", "pois": pois}
+
+        def raise_for_status(self):
+            pass
+
+    calls = []
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: calls.append(kw["params"]["radius"]) or R())
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_spatial_index=False)
+    near = wrapper.search_around("110.33,20.02", "酒店", radius=250)  # fetched with radius 300
+    assert [p["id"] for p in near["pois"]] == ["B100"] and near["count"] == "1"
+    wider = wrapper.search_around("110.33,20.02", "酒店", radius=300)
+    assert [p["id"] for p in wider["pois"]] == ["B100"] and calls == [300]
+    assert len(wrapper.search_around("110.33,20.02", "酒店", radius=800)["pois"]) == 3
+
+
+def test_negative_cache_remembers_empty_and_rejected_lookups(monkeypatch):
+    import requests
+
+    calls = []
+
+    class R:
+        def __init__(self, data, status_code=200):
+            self._data = data
+            self.status_code = status_code
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def fake_get(self, url, params=None, **kwargs):
+        calls.append(url)
+        if "detail" in url:
+            return R({}, 404)
+        if "place/text" in url:
+            return R({"status": "0", "info": "INVALID_PARAMS", "infocode": "20000"})
+        return R({"status": "1", "count": "0", "geocodes": []})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    for _ in range(3):
+        assert wrapper.get_geo_location("不存在的景点", "海口")["geocodes"] == []
+        assert wrapper.get_poi_detail("B000BAD") is None
+        assert wrapper.search_pois("", "海口")["infocode"] == "20000"
+    assert len(calls) == 3, "each bad lookup reaches AMap once"
+    stats = wrapper.cache_stats()
+    assert stats["entries"] == 0, "negative answers never enter the positive cache"
+    assert stats["negative"]["entries"] == 3 and stats["negative"]["hits"] == 6
+    assert wrapper.metrics_snapshot()["tools"]["get_poi_detail"]["sources"]["negative"] == 2
+
+
+def test_batch_geocoding_splits_merges_and_uses_cache(monkeypatch):
+    import requests
+
+    class R:
+        status_code = 200
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            pass
+
+    requests_seen = []
+
+    def fake_get(self, url, params=None, **kwargs):
+        requests_seen.append(dict(params))
+        if params.get("batch") == "true":
+            names = params["address"].split("|")
+            geocodes = [
+                {"formatted_address": n, "location": "" if n == "不存在的地方" else f"110.{i},20.{i}"}
+                for i, n in enumerate(names)
+            ]
+            return R({"status": "1", "count": str(len(names)), "geocodes": geocodes})
+        return R({"status": "1", "count": "1", "geocodes": [{"formatted_address": params["address"], "location": "1,1"}]})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    wrapper.get_geo_location("骑楼老街", "海口")  # warms the single-address cache
+    addresses = ["骑楼老街"] + [f"景点{i}" for i in range(20)] + ["景点3", "不存在的地方"]
+    results = wrapper.get_geo_locations(addresses, "海口")
+
+    batch_calls = [p for p in requests_seen if p.get("batch") == "true"]
+    assert len(batch_calls) == 3, "20 unique misses + 1 -> batches of 10, 10, 1"
+    assert all(len(p["address"].split("|")) <= 10 for p in batch_calls)
+    assert results[0]["geocodes"][0]["location"] == "1,1", "cached entry reused"
+    assert [r["geocodes"][0]["formatted_address"] for r in results[1:21]] == [f"景点{i}" for i in range(20)]
+    assert results[21] == results[4], "duplicates resolved once"
+    assert results[22]["count"] == "0" and results[22]["geocodes"] == []
+
+    before = len(requests_seen)
+    assert wrapper.get_geo_location("景点7", "海口")["geocodes"][0]["formatted_address"] == "景点7"
+    assert len(requests_seen) == before, "batch results fill the per-address cache"
+
+
+def test_distance_matrix_batches_per_destination_and_caches_symmetrically(monkeypatch):
+    import requests
+
+    class R:
+        status_code = 200
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            pass
+
+    seen = []
+
+    def fake_get(self, url, params=None, **kwargs):
+        seen.append(dict(params))
+        origins = params["origins"].split("|")
+        dest = float(params["destination"].split(",")[0])
+        results = [
+            {"origin_id": str(k + 1), "distance": str(int(abs(float(o.split(",")[0]) - dest) * 100000)), "duration": "60"}
+            for k, o in enumerate(origins)
+        ]
+        return R({"status": "1", "results": results})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    points = ["110.30000,20.0", "110.31000,20.0", "110.32000,20.0", "110.33000,20.0"]
+    matrix = wrapper.get_distance_matrix(points)
+    assert len(seen) == 3, "one request per destination column (origins batched)"
+    assert matrix["distances"][0][3] == matrix["distances"][3][0] == 3000
+    assert matrix["distances"][1][1] == 0
+    assert matrix["durations"][2][0] == 60
+
+    seen.clear()
+    # Same points in a different order, jittered below the rounding precision
+    again = wrapper.get_distance_matrix(["110.330001,20.0", "110.300004,20.0"])
+    assert seen == [], "served from the symmetric pair cache"
+    assert again["distances"][0][1] == 3000
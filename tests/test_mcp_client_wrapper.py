@@ -1,7 +1,7 @@
 """Tests for MCPClientWrapper.
 
 Design:
- - Unit-style tests avoid real network by monkeypatching `requests`.
+ - Unit-style tests avoid real network by monkeypatching `requests.Session`.
  - Focus on: tool listing, weather call fallback, list truncation logic, error on missing key.
  - Integration tests (real API) are optional and only run when REAL_AMAP_API_KEY is set.
 """
@@ -63,8 +63,9 @@ def monkeypatched_requests(monkeypatch):
         # Force remote MCP to "fail" so fallback path is exercised
         return DummyResponse({"error": "not available"}, status_code=503)
 
-    monkeypatch.setattr(requests, "get", fake_get)
-    monkeypatch.setattr(requests, "post", fake_post)
+    # The wrapper talks through pooled ``requests.Session`` objects
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: fake_get(url, **kw))
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: fake_post(url, **kw))
     return requests
 
 
@@ -90,6 +91,19 @@ def test_weather_truncation(monkeypatched_requests):
     assert len(casts) == 10, "List should be truncated to first 10 entries"
 
 
+def test_truncation_is_per_tool_and_slices_before_descending(monkeypatched_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, list_limits={"get_weather": 3})
+    casts = wrapper.get_weather("海口")["forecasts"][0]["casts"]
+    assert len(casts) == 3
+
+    dropped = [[1] * 20]  # would be trimmed to 2 if it were visited
+    data = {"pois": [{"photos": list(range(5))}, {"photos": []}, dropped]}
+    assert wrapper._truncate_list_fields(data, 2) is data
+    assert data == {"pois": [{"photos": [0, 1]}, {"photos": []}]}
+    assert len(dropped[0]) == 20
+    assert wrapper._truncate_list_fields({"a": list(range(20))}, 0) == {"a": list(range(20))}
+
+
 @pytest.mark.integration
 def test_real_weather_if_key_present():
     real_key = os.getenv("AMAP_API_KEY")
@@ -98,3 +112,106 @@ def test_real_weather_if_key_present():
     wrapper = MCPClientWrapper(enable_remote=False)  # use REST directly
     data = wrapper.get_weather("110000")  # Beijing adcode
     assert data.get("status") == "1"
+
+
+def test_pooled_sessions_per_host(monkeypatched_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", rest_pool_size=7, remote_pool_size=3)
+    assert wrapper._rest_session is not wrapper._remote_session
+    rest_adapter = wrapper._rest_session.get_adapter("https://restapi.amap.com/v3/weather/weatherInfo")
+    remote_adapter = wrapper._remote_session.get_adapter(wrapper._remote_url())
+    assert rest_adapter._pool_maxsize == 7
+    assert remote_adapter._pool_maxsize == 3
+    session = wrapper._rest_session
+    wrapper.get_weather("海口")
+    wrapper.get_geo_location("骑楼老街", "海口")
+    assert wrapper._rest_session is session, "Session must be reused across calls"
+    wrapper.close()
+
+
+def test_projection_profiles_keep_formatter_fields(monkeypatch):
+    import requests
+
+    from App.mcp_projection import project
+
+    poi = {
+        "id": "B1", "name": "假日海滩", "type": "风景名胜", "location": "110.2,20.0",
+        "shopinfo": "0", "indoor_map": "0", "navi_poiid": "x",
+        "biz_ext": {"rating": "4.6", "cost": [], "meal_ordering": "0"},
+        "photos": [{"title": "海滩", "url": "http://img/1.jpg", "provider": []}],
+    }
+
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: DummyResponse({"status": "1", "count": "1", "pois": [dict(poi)]}))
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    kept = wrapper.search_around("110.2,20.0", "海滩")["pois"][0]
+    assert kept == {
+        "id": "B1", "name": "假日海滩", "type": "风景名胜", "location": "110.2,20.0",
+        "biz_ext": {"rating": "4.6", "cost": []},
+        "photos": [{"title": "海滩", "url": "http://img/1.jpg"}],
+    }
+
+    raw = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_projection=False)
+    assert "shopinfo" in raw.search_around("110.2,20.0", "海滩")["pois"][0]
+    assert project({"a": "x", "b": 1}, {"a": {"c": True}}) == {"a": "x"}
+
+
+def test_iter_pois_pages_lazily_and_stops_early(monkeypatch):
+    import requests
+
+    pages = []
+
+    def fake_get(self, url, params=None, **kwargs):
+        page, size = int(params["page"]), int(params["offset"])
+        pages.append(page)
+        ids = range((page - 1) * size, min(page * size, 25))
+        return DummyResponse({"status": "1", "count": "25", "pois": [{"id": f"P{i}", "name": f"poi{i}"} for i in ids]})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_cache=False)
+
+    names = [p["name"] for p in wrapper.iter_pois("咖啡", "海口")]
+    assert names == [f"poi{i}" for i in range(25)], "pages clamp to the list limit (10) so nothing is truncated"
+    assert sorted(pages) == [1, 2, 3]
+
+    pages.clear()
+    assert len(list(wrapper.iter_around("110.3,20.0", "咖啡", limit=5))) == 5
+    assert pages == [1], "no prefetch once the first page satisfies the limit"
+
+    found = list(wrapper.iter_pois("咖啡", stop=lambda p: p["id"] == "P12"))
+    assert found[-1]["id"] == "P12" and len(found) == 13
+    wrapper.close()
+
+
+def test_health_probe_is_cached_and_refreshed_in_background(monkeypatch):
+    import time
+
+    import requests
+
+    probes = []
+
+    def fake_get(self, url, params=None, timeout=None, **kwargs):
+        probes.append((url, timeout))
+        return DummyResponse({"status": "1", "infocode": "10000"})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    assert wrapper.ping() and wrapper.ping() and wrapper.health()["ok"]
+    assert len(probes) == 1, "cached for health_interval"
+    assert probes[0][0].endswith("/v3/ip") and probes[0][1] <= MCPClientWrapper.HEALTH_PROBE_TIMEOUT
+
+    stale = MCPClientWrapper(api_key="dummy", enable_remote=False, health_interval=0)
+    assert stale.ping()
+    import threading
+
+    gate = threading.Event()
+
+    def slow_failing_get(self, url, **kwargs):
+        gate.wait(2)
+        return DummyResponse({"status": "0", "infocode": "10001"})
+
+    monkeypatch.setattr(requests.Session, "get", slow_failing_get)
+    assert stale.ping(), "stale result served immediately while refreshing"
+    gate.set()
+    deadline = time.monotonic() + 2
+    while stale.health()["ok"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert stale.health()["error"] == "infocode_10001"
@@ -11,7 +11,7 @@ Coverage (no real network):
 
 Excluded per request: ip_location.
 
-Strategy: monkeypatch `requests.get` / `requests.post` with URL pattern matching.
+Strategy: monkeypatch `requests.Session.get` / `requests.Session.post` with URL pattern matching.
 All endpoints return minimal plausible AMap-like JSON shapes.
 """
 
@@ -120,8 +120,9 @@ def mock_amap(monkeypatch):
                     raise RuntimeError("HTTP error")
         return R(payload, status)
 
-    monkeypatch.setattr(requests, "get", fake_get)
-    monkeypatch.setattr(requests, "post", fake_post)
+    # The wrapper talks through pooled ``requests.Session`` objects
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: fake_get(url, **kw))
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: fake_post(url, **kw))
 
     return {}
 
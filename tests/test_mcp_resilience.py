@@ -0,0 +1,459 @@
+"""Tests for resilience policies used by MCPClientWrapper (no network)."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import App.mcp_resilience as resilience
+from App.mcp_resilience import CircuitBreaker
+from App.mcp_client_wrapper import MCPClientWrapper
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold_and_half_opens(clock):
+    breaker = CircuitBreaker("remote", failure_threshold=2, reset_timeout=10)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock[0] += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request(), "one probe is allowed"
+    assert not breaker.allow_request(), "second concurrent probe is rejected"
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 10
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_wrapper_skips_remote_while_open(monkeypatch, clock):
+    import requests
+
+    posts = []
+
+    class R:
+        def __init__(self, data, status_code=200):
+            self._data = data
+            self.status_code = status_code
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            pass
+
+    def fake_post(self, url, **kwargs):
+        posts.append(url)
+        return R({"error": "down"}, 503)
+
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: R({"status": "1"}))
+
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, breaker_failure_threshold=2, breaker_reset_timeout=30)
+    for _ in range(5):
+        assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1"}
+    assert len(posts) == 2, "remote is skipped once the circuit opens"
+    state = wrapper.list_tools()["circuit_breakers"][MCPClientWrapper.MCP_BASE_URL]
+    assert state["state"] == "open"
+    assert state["short_circuited"] == 3
+
+    clock[0] += 30
+    wrapper.get_walking_directions("1,1", "2,2")
+    assert len(posts) == 3, "half-open probe goes to the remote"
+
+
+def test_unexpected_remote_error_falls_back_and_releases_probe(monkeypatch, clock):
+    import requests
+
+    class R:
+        status_code = 200
+
+        def json(self):
+            return {"status": "1"}
+
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: R())
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, breaker_failure_threshold=1, breaker_reset_timeout=30)
+
+    def malformed(tool_name, arguments):
+        raise KeyError("inputSchema")
+
+    monkeypatch.setattr(wrapper, "_post_remote_tool", malformed)
+    assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1"}
+    breaker = wrapper._breaker(MCPClientWrapper.MCP_BASE_URL)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 30
+    assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1"}
+    assert breaker.state == CircuitBreaker.OPEN, "failed probe re-opens instead of sticking half-open"
+    clock[0] += 30
+    assert breaker.allow_request(), "probe slot was released"
+
+
+def test_single_flight_coalesces_and_propagates_errors():
+    import threading
+
+    from App.mcp_resilience import SingleFlight
+
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return {"pois": [1]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.stats()["shared"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"pois": [1]}] * 5
+    assert len({id(r) for r in results}) == 5, "each caller gets its own copy"
+
+    def boom():
+        raise ValueError("upstream exploded")
+
+    with pytest.raises(ValueError):
+        flight.do("k", boom)
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_waiters_retry_when_leader_is_interrupted():
+    import threading
+
+    from App.mcp_resilience import SingleFlight
+
+    class Interrupted(BaseException):
+        """Stands in for a gevent Timeout aimed at the leader's caller."""
+
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(2)
+            raise Interrupted()
+        return {"pois": [1]}
+
+    def leader():
+        with pytest.raises(Interrupted):
+            flight.do("k", fn)
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.001)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+    follower.start()
+    while flight.stats()["shared"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader_thread.join()
+    follower.join()
+    assert results == [{"pois": [1]}], "the waiter re-runs the call instead of inheriting the interrupt"
+    assert len(calls) == 2
+
+
+def test_wrapper_coalesces_identical_concurrent_calls(monkeypatch):
+    import threading
+
+    import requests
+
+    gate = threading.Event()
+    gets = []
+
+    class R:
+        status_code = 200
+
+        def json(self):
+            return {"status": "1", "forecasts": []}
+
+        def raise_for_status(self):
+            pass
+
+    def fake_get(self, url, **kwargs):
+        gets.append(url)
+        gate.wait(2)
+        return R()
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_cache=False)
+    threads = [threading.Thread(target=wrapper.get_weather, args=("海口",)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while wrapper._single_flight.stats()["shared"] < 3:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(gets) == 1
+
+
+def test_rate_limiter_bursts_then_rejects_past_deadline(clock):
+    from App.mcp_resilience import RateLimiter
+
+    limiter = RateLimiter(default_limit=(1.0, 2.0), max_waiters=4)
+    assert limiter.acquire("get_weather")
+    assert limiter.acquire("get_weather")
+    # Bucket empty: next token in 1s, deadline in 0.5s -> rejected without waiting
+    assert not limiter.acquire("get_weather", deadline=clock[0] + 0.5)
+    snap = limiter.snapshot()["get_weather"]
+    assert snap["admitted"] == 2 and snap["rejected"] == 1 and snap["tokens"] == 0
+    clock[0] += 1
+    assert limiter.acquire("get_weather")
+    assert limiter.acquire("search_pois"), "buckets are per tool"
+
+
+def test_rate_limiter_serves_interactive_before_background():
+    import threading
+
+    from App.mcp_resilience import RateLimiter
+
+    limiter = RateLimiter(default_limit=(20.0, 1.0), max_waiters=8)
+    assert limiter.acquire("t")
+    order = []
+
+    def worker(priority):
+        limiter.acquire("t", priority=priority)
+        order.append(priority)
+
+    background = threading.Thread(target=worker, args=("background",))
+    background.start()
+    while limiter.snapshot()["t"]["waiting"] < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=worker, args=("interactive",))
+    interactive.start()
+    background.join(2)
+    interactive.join(2)
+    assert order == ["interactive", "background"]
+
+
+def test_rate_limiter_bounded_queue():
+    from App.mcp_resilience import RateLimiter
+
+    limiter = RateLimiter(default_limit=(0.001, 1.0), max_waiters=0)
+    assert limiter.acquire("t")
+    assert not limiter.acquire("t"), "no queue slots -> immediate rejection"
+
+
+def test_rate_limiter_drops_interrupted_waiter(monkeypatch, clock):
+    from App.mcp_resilience import RateLimiter
+
+    class Interrupt(BaseException):
+        """Stands in for gevent.Timeout / GreenletExit."""
+
+    limiter = RateLimiter(default_limit=(1.0, 1.0), max_waiters=4)
+    assert limiter.acquire("t")
+
+    def interrupted_wait(timeout=None):
+        raise Interrupt()
+
+    monkeypatch.setattr(limiter._cond, "wait", interrupted_wait)
+    with pytest.raises(Interrupt):
+        limiter.acquire("t")
+    assert limiter.snapshot()["t"]["waiting"] == 0
+    # The interrupted caller no longer blocks the head of the queue.
+    clock[0] += 1
+    assert limiter.acquire("t")
+
+
+def test_wrapper_rejects_when_budget_exhausted(monkeypatch):
+    import requests
+
+    class R:
+        status_code = 200
+
+        def json(self):
+            return {"status": "1"}
+
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: R())
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, enable_cache=False, default_rate_limit=(0.01, 1))
+    assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1"}
+    with wrapper.call_options(priority="background", budget=0.05):
+        assert wrapper.get_walking_directions("1,1", "2,2") is None
+    stats = wrapper.list_tools()["rate_limits"]["get_walking_directions"]
+    assert stats["rejected"] == 1 and stats["admitted"] == 1
+
+
+class _Resp:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        import requests
+
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+def _scripted_get(monkeypatch, script):
+    import requests
+
+    calls = []
+
+    def fake_get(self, url, **kwargs):
+        calls.append(kwargs.get("timeout"))
+        step = script[min(len(calls), len(script)) - 1]
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    monkeypatch.setattr(MCPClientWrapper, "_call_remote_mcp_tool", lambda self, *a: None)
+    return calls
+
+
+def _no_sleep(monkeypatch):
+    import App.mcp_client_wrapper as mod
+
+    slept = []
+    monkeypatch.setattr(mod.time, "sleep", slept.append)
+    return slept
+
+
+def test_retry_on_transient_errors_then_success(monkeypatch):
+    import requests
+
+    calls = _scripted_get(monkeypatch, [
+        requests.Timeout("slow"),
+        _Resp({"status": "0", "infocode": "10014"}),
+        _Resp({"status": "1", "info": "OK"}),
+    ])
+    slept = _no_sleep(monkeypatch)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False)
+    assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1", "info": "OK"}
+    assert len(calls) == 3 and len(slept) == 2
+
+
+def test_no_retry_on_client_errors(monkeypatch):
+    calls = _scripted_get(monkeypatch, [_Resp({}, 400), _Resp({"status": "1"})])
+    _no_sleep(monkeypatch)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False)
+    assert wrapper.get_walking_directions("1,1", "2,2") is None
+    assert len(calls) == 1
+
+
+def test_retry_gives_up_after_max_attempts(monkeypatch):
+    from App.mcp_resilience import RetryPolicy
+
+    calls = _scripted_get(monkeypatch, [_Resp({}, 503)])
+    _no_sleep(monkeypatch)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, retry_policy=RetryPolicy(max_attempts=4))
+    assert wrapper.get_walking_directions("1,1", "2,2") is None
+    assert len(calls) == 4
+
+
+def test_retry_respects_call_budget(monkeypatch):
+    from App.mcp_resilience import RetryPolicy
+
+    calls = _scripted_get(monkeypatch, [_Resp({}, 503)])
+    _no_sleep(monkeypatch)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, retry_policy=RetryPolicy(max_attempts=10, base_delay=5, max_delay=5))
+    monkeypatch.setattr("App.mcp_resilience.random.uniform", lambda a, b: b)
+    with wrapper.call_options(budget=1.0):
+        assert wrapper.get_walking_directions("1,1", "2,2") is None
+    assert len(calls) == 1, "backoff longer than remaining budget -> no retry"
+    assert calls[0] <= 1.0, "per-request timeout is capped by the budget"
+
+
+def test_latency_histogram_quantiles_track_recent_samples():
+    from App.mcp_resilience import LatencyHistogram
+
+    histogram = LatencyHistogram(window=100)
+    assert histogram.quantile(0.95) is None
+    for _ in range(90):
+        histogram.observe(0.01)
+    for _ in range(9):
+        histogram.observe(0.5)
+    assert histogram.quantile(0.5) <= 0.0114 and 0.5 <= histogram.quantile(0.95) <= 0.75
+    for _ in range(300):
+        histogram.observe(0.01)
+    assert histogram.quantile(0.95) <= 0.0114, "old slow samples decay away"
+    assert histogram.snapshot()["count"] == 399
+
+
+def test_hedged_fetch_races_rest_against_slow_remote(monkeypatch):
+    import threading
+
+    import requests
+
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: _Resp({"status": "1", "info": "OK"}))
+    release = threading.Event()
+
+    def slow_remote(tool_name, arguments):
+        release.wait(2)
+        return {"status": "1", "info": "remote"}
+
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, hedge_requests=True, hedge_delay=0.05)
+    wrapper._call_remote_mcp_tool = slow_remote
+    started = time.monotonic()
+    assert wrapper.get_walking_directions("1,1", "2,2") == {"status": "1", "info": "OK"}
+    assert time.monotonic() - started < 1.0
+    release.set()
+    stats = wrapper.hedge_stats()
+    assert stats["hedged"] == 1 and stats["rest_won"] == 1
+
+    wrapper._call_remote_mcp_tool = lambda tool_name, arguments: {"status": "1", "info": "remote"}
+    assert wrapper.get_walking_directions("1,1", "2,2")["info"] == "remote"
+    assert wrapper.hedge_stats()["hedged"] == 1, "fast remote answers before the hedge fires"
+    assert wrapper.latency_stats()["remote:get_walking_directions"]["count"] == 2
+    wrapper.close()
+
+
+def test_metrics_track_sources_fallbacks_errors_and_payloads(monkeypatch):
+    import requests
+
+    script = [_Resp({"status": "1", "info": "OK"}), _Resp({"status": "0", "infocode": "10003"})]
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kw: script.pop(0) if script else _Resp({}, 500))
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: _Resp({"error": "down"}, 503))
+    _no_sleep(monkeypatch)
+    wrapper = MCPClientWrapper(api_key="dummy", breaker_failure_threshold=10)
+    events = []
+    wrapper.add_metrics_hook(events.append)
+
+    wrapper.get_weather("海口")
+    wrapper.get_weather("海口")  # cache hit
+    wrapper.get_weather("三亚")  # AMap-level error payload
+    wrapper.get_weather("万宁")  # HTTP 500 on every attempt
+
+    weather = wrapper.metrics_snapshot()["tools"]["get_weather"]
+    assert weather["sources"] == {"upstream": 3, "cache": 1} and weather["cache_hit_ratio"] == 0.25
+    assert weather["fallbacks"] == 3
+    assert weather["errors"]["remote:MCPSessionError"] == 3
+    assert weather["errors"]["rest:infocode_10003"] == 1 and weather["errors"]["rest:HTTPError"] == 1
+    assert weather["payload"]["count"] == 2 and weather["payload"]["bytes_max"] > 0
+    assert weather["latency"]["call"]["count"] == 4 and weather["latency"]["rest"]["count"] == 2
+    assert {e["kind"] for e in events} >= {"call", "fallback", "error", "payload", "latency"}
@@ -0,0 +1,223 @@
+"""Tests for the MCP JSON-RPC session (streamable HTTP) used by the wrapper."""
+
+from __future__ import annotations
+
+import json
+from json import dumps
+
+import pytest
+
+from App.mcp_client_wrapper import MCPClientWrapper
+from App.mcp_session import MCPSession, MCPSessionError
+
+
+class FakeResponse:
+    def __init__(self, payload=None, status_code=200, headers=None, sse=False):
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+        self._payload = payload
+        if sse:
+            self.headers["Content-Type"] = "text/event-stream"
+            self.text = f"event: message\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        else:
+            self.headers.setdefault("Content-Type", "application/json")
+            self.text = json.dumps(payload, ensure_ascii=False)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+# Output shapes of the official AMap MCP server tools (trimmed, no REST envelope).
+REMOTE_BODIES = {
+    "maps_geo": {"results": [{"city": "海口市", "location": "110.35,20.02", "level": "兴趣点"}]},
+    "maps_regeocode": {"provice": "海南省", "city": "海口市", "district": "龙华区"},
+    "maps_text_search": {"suggestion": {"keywords": "", "ciytes": {}}, "pois": [{"id": "B1", "name": "骑楼老街", "address": "中山路"}]},
+    "maps_around_search": {"pois": [{"id": "B2", "name": "酒店", "address": "博爱北路"}]},
+    "maps_distance": {"results": [{"origin_id": "1", "dest_id": "1", "distance": "1200", "duration": "300"}]},
+    "maps_direction_walking": {"route": {"origin": "1,1", "destination": "2,2", "paths": [{"distance": "800", "steps": []}]}},
+    "maps_direction_driving": {"route": {"origin": "1,1", "destination": "2,2", "paths": [{"distance": "5000", "steps": []}]}},
+    "maps_direction_transit_integrated": {"route": {"origin": "1,1", "destination": "2,2", "distance": "6000", "transits": [{"duration": "1800"}]}},
+    "maps_bicycling": {"data": {"origin": "1,1", "destination": "2,2", "paths": [{"distance": "2000", "steps": []}]}},
+    "maps_ip_location": {"province": "海南省", "city": "海口市", "adcode": "460100"},
+}
+
+
+class FakeMCPServer:
+    """Tiny in-memory MCP server speaking JSON-RPC over (fake) HTTP."""
+
+    def __init__(self, sse=False):
+        self.sse = sse
+        self.messages = []
+        self.sessions = {"sess-1"}
+        self.inits = 0
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        self.messages.append((json, dict(headers or {})))
+        method = json.get("method")
+        if method == "initialize":
+            self.inits += 1
+            sid = f"sess-{self.inits}"
+            self.sessions.add(sid)
+            return FakeResponse(
+                {"jsonrpc": "2.0", "id": json["id"], "result": {"protocolVersion": "2025-03-26", "serverInfo": {"name": "amap"}}},
+                headers={"Mcp-Session-Id": sid},
+            )
+        if "id" not in json:
+            return FakeResponse(None, status_code=202)
+        if headers.get("Mcp-Session-Id") not in self.sessions:
+            return FakeResponse({"error": "unknown session"}, status_code=404)
+        if method == "tools/list":
+            tools = [
+                {"name": "maps_weather", "inputSchema": {"properties": {"city": {}}}},
+                {"name": "maps_search_detail", "inputSchema": {"properties": {"id": {}}}},
+            ] + [{"name": name, "inputSchema": {}} for name in REMOTE_BODIES]
+            return FakeResponse({"jsonrpc": "2.0", "id": json["id"], "result": {"tools": tools}}, sse=self.sse)
+        if method == "tools/call":
+            name = json["params"]["name"]
+            args = json["params"]["arguments"]
+            if name == "maps_weather":
+                body = {"city": args["city"], "forecasts": [{"date": "2025-10-01", "dayweather": "晴"}]}
+            elif name == "maps_search_detail":
+                body = {"id": args["id"], "name": "骑楼老街", "city": "海口市", "rating": "4.6"}
+            elif name in REMOTE_BODIES:
+                body = REMOTE_BODIES[name]
+            else:
+                return FakeResponse({"jsonrpc": "2.0", "id": json["id"], "result": {"isError": True, "content": []}})
+            content = [{"type": "text", "text": dumps(body, ensure_ascii=False)}]
+            return FakeResponse({"jsonrpc": "2.0", "id": json["id"], "result": {"content": content}}, sse=self.sse)
+        return FakeResponse({"jsonrpc": "2.0", "id": json["id"], "error": {"code": -32601, "message": "nope"}})
+
+
+def methods(server):
+    return [m.get("method") for m, _ in server.messages]
+
+
+@pytest.mark.parametrize("sse", [False, True])
+def test_session_initializes_once_and_reuses_id(sse):
+    server = FakeMCPServer(sse=sse)
+    session = MCPSession("https://mcp.example/mcp", server)
+    assert session.call_tool("maps_weather", {"city": "海口"})["city"] == "海口"
+    assert session.call_tool("maps_weather", {"city": "三亚"})["city"] == "三亚"
+    assert methods(server) == ["initialize", "notifications/initialized", "tools/call", "tools/call"]
+    call_headers = [h for m, h in server.messages if m.get("method") == "tools/call"]
+    assert all(h["Mcp-Session-Id"] == "sess-1" for h in call_headers)
+    ids = [m["id"] for m, _ in server.messages if "id" in m]
+    assert len(ids) == len(set(ids)), "request ids must be unique"
+
+
+def test_session_reinitializes_after_expiry():
+    server = FakeMCPServer()
+    session = MCPSession("https://mcp.example/mcp", server)
+    session.call_tool("maps_weather", {"city": "海口"})
+    server.sessions.clear()
+    assert session.call_tool("maps_weather", {"city": "海口"})
+    assert session.session_id == "sess-2"
+
+
+def test_session_raises_on_rpc_error():
+    session = MCPSession("https://mcp.example/mcp", FakeMCPServer())
+    with pytest.raises(MCPSessionError):
+        session._request("bogus/method")
+
+
+def test_wrapper_remote_path_succeeds_in_one_round_trip(monkeypatch):
+    import requests
+
+    server = FakeMCPServer()
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: server.post(url, **kw))
+
+    def no_rest(self, url, **kwargs):  # pragma: no cover - must not be reached
+        raise AssertionError("REST fallback should not be used")
+
+    monkeypatch.setattr(requests.Session, "get", no_rest)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False)
+    weather = wrapper.get_weather("海口")
+    assert weather["forecasts"][0]["casts"][0]["dayweather"] == "晴"
+    detail = wrapper.get_poi_detail("B0FFG")
+    assert detail["pois"][0]["id"] == "B0FFG", "maps_detail_search resolves to maps_search_detail with id="
+    before = len(server.messages)
+    wrapper.get_weather("三亚")
+    assert len(server.messages) - before == 1
+    assert wrapper.list_tools()["remote_session"]["initialized"] is True
+
+
+def test_wrapper_normalizes_every_remote_tool_to_rest_shape(monkeypatch):
+    import requests
+
+    server = FakeMCPServer()
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: server.post(url, **kw))
+
+    def no_rest(self, url, **kwargs):  # pragma: no cover - must not be reached
+        raise AssertionError("REST fallback should not be used")
+
+    rest_pois = {"pois": [{"id": "B1", "name": "骑楼老街", "location": "110.35,20.05", "tel": "0898-1"}]}
+
+    def place_search_only(self, url, **kwargs):
+        # Remote search tools drop location/tel/photos, so place search stays on REST.
+        assert "/v3/place/" in url, "REST fallback should not be used"
+        return FakeResponse(dict(status="1", info="OK", infocode="10000", count="1", **rest_pois))
+
+    monkeypatch.setattr(requests.Session, "get", place_search_only)
+    wrapper = MCPClientWrapper(api_key="dummy", enable_cache=False, enable_spatial_index=False)
+
+    def ok(data):
+        assert (data["status"], data["infocode"]) == ("1", "10000")
+        return data
+
+    weather = ok(wrapper.get_weather("海口"))
+    assert weather["forecasts"][0]["city"] == "海口" and weather["forecasts"][0]["casts"]
+    geo = ok(wrapper.get_geo_location("骑楼老街", "海口"))
+    assert geo["geocodes"][0]["location"] == "110.35,20.02" and geo["count"] == "1"
+    regeo = ok(wrapper.get_regeocode("110.35,20.02"))
+    assert regeo["regeocode"]["addressComponent"] == {"province": "海南省", "city": "海口市", "district": "龙华区"}
+    assert regeo["regeocode"]["formatted_address"] == "海南省海口市龙华区"
+    pois = ok(wrapper.search_pois("骑楼老街", "海口"))
+    assert pois["pois"][0]["location"] == "110.35,20.05" and pois["count"] == "1"
+    around = ok(wrapper.search_around("110.35,20.02", "酒店"))
+    assert around["pois"][0]["tel"] == "0898-1"
+    called = {m["params"]["name"] for m, _ in server.messages if m.get("method") == "tools/call"}
+    assert not called & {"maps_text_search", "maps_around_search"}
+    assert "count" not in MCPClientWrapper._normalize_remote_result("maps_around_search", REMOTE_BODIES["maps_around_search"])
+    detail = ok(wrapper.get_poi_detail("B0FFG"))
+    assert detail["pois"] == [{"id": "B0FFG", "name": "骑楼老街", "cityname": "海口市", "biz_ext": {"rating": "4.6"}}]
+    distance = ok(wrapper.get_distance("1,1", "2,2"))
+    assert distance["results"][0]["distance"] == "1200"
+    for route in (
+        wrapper.get_walking_directions("1,1", "2,2"),
+        wrapper.get_driving_directions("1,1", "2,2"),
+    ):
+        assert ok(route)["route"]["paths"][0]["distance"]
+    transit = ok(wrapper.get_transit_directions("1,1", "2,2", "海口"))
+    assert transit["route"]["transits"][0]["duration"] == "1800"
+    bicycling = wrapper.get_bicycling_directions("1,1", "2,2")
+    assert bicycling["errcode"] == 0 and bicycling["data"]["paths"][0]["distance"] == "2000"
+    ip = ok(wrapper.get_ip_location())
+    assert ip["city"] == "海口市" and ip["adcode"] == "460100"
+
+
+def test_remote_detail_result_is_cached_positively(monkeypatch, tmp_path):
+    import requests
+
+    server = FakeMCPServer()
+    monkeypatch.setattr(requests.Session, "post", lambda self, url, **kw: server.post(url, **kw))
+
+    def no_rest(self, url, **kwargs):  # pragma: no cover - must not be reached
+        raise AssertionError("REST fallback should not be used")
+
+    monkeypatch.setattr(requests.Session, "get", no_rest)
+    wrapper = MCPClientWrapper(api_key="dummy", persistent_cache_path=str(tmp_path / "cache.sqlite3"))
+    try:
+        assert wrapper.get_poi_detail("B0FFG")["pois"][0]["id"] == "B0FFG"
+        stats = wrapper.cache_stats()
+        assert stats["entries"] == 1
+        assert stats["negative"]["entries"] == 0
+        assert stats["persistent"]["entries"] == 1
+        calls = len(server.messages)
+        assert wrapper.get_poi_detail("B0FFG")["pois"][0]["name"] == "骑楼老街"
+        assert len(server.messages) == calls
+        assert wrapper.metrics_snapshot()["tools"]["get_poi_detail"]["sources"] == {"upstream": 1, "cache": 1}
+    finally:
+        wrapper.close()
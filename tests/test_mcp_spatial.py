@@ -0,0 +1,107 @@
+"""Tests for the local POI spatial index behind search_around (no network)."""
+
+from __future__ import annotations
+
+import pytest
+
+from App.mcp_client_wrapper import MCPClientWrapper
+from App.mcp_spatial import SpatialIndex, haversine_m
+
+
+CENTER = (110.3300, 20.0200)
+
+
+def _poi(i, dlng, name="酒店"):
+    return {"id": f"B{i}", "name": f"{name}{i}", "type": "住宿服务", "location": f"{CENTER[0] + dlng:.4f},{CENTER[1]:.4f}"}
+
+
+@pytest.fixture
+def around_requests(monkeypatch):
+    import requests
+
+    calls = []
+    # 0.001 deg lng ~ 105 m at this latitude
+    pois = [_poi(i, 0.001 * i) for i in range(1, 6)]
+
+    class R:
+        status_code = 200
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+        def raise_for_status(self):
+            pass
+
+    def fake_get(self, url, params=None, **kwargs):
+        calls.append(dict(params or {}))
+        lng, lat = (float(x) for x in params["location"].split(","))
+        radius = float(params["radius"])
+        hits = [p for p in pois if haversine_m((lng, lat), tuple(float(x) for x in p["location"].split(","))) <= radius]
+        return R({"status": "1", "count": str(len(hits)), "pois": [dict(p, shopinfo="0") for p in hits]})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    return calls
+
+
+def test_index_answers_only_inside_fresh_coverage(monkeypatch):
+    import App.mcp_spatial as mod
+
+    now = [100.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+    index = SpatialIndex(max_age=60)
+    index.add([_poi(1, 0.001), _poi(2, 0.004)], "k")
+    index.add([_poi(3, 0.002, "咖啡")], "other")
+    assert index.query("k", CENTER, 300) is None, "no coverage yet"
+
+    index.record_coverage("k", CENTER, 1000)
+    near = index.query("k", CENTER, 300)
+    assert [p["id"] for p in near] == ["B1"] and near[0]["distance"] == "104"
+    assert [p["id"] for p in index.query("k", CENTER, 500)] == ["B1", "B2"]
+    assert index.query("k", CENTER, 1200) is None, "query circle exceeds coverage"
+
+    now[0] += 61
+    assert index.query("k", CENTER, 300) is None, "coverage expired"
+
+
+def test_wrapper_serves_repeated_around_search_locally(around_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    loc = f"{CENTER[0]},{CENTER[1]}"
+    first = wrapper.search_around(loc, "酒店", radius=1000)
+    assert len(first["pois"]) == 5 and len(around_requests) == 1
+
+    again = wrapper.search_around(loc, "酒店", radius=350)
+    assert len(around_requests) == 1, "answered from the index"
+    assert [p["id"] for p in again["pois"]] == ["B1", "B2", "B3"]
+    assert again["count"] == "3"
+
+    wrapper.search_around(loc, "咖啡", radius=350)
+    wrapper.search_around(loc, "酒店", radius=350, page=2)
+    assert len(around_requests) == 3, "other keywords and later pages go to AMap"
+    assert wrapper.list_tools()["spatial_index"]["hits"] == 1
+
+
+def test_truncated_results_only_cover_up_to_farthest_poi(around_requests):
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False, list_limits={"search_around": 2})
+    loc = f"{CENTER[0]},{CENTER[1]}"
+    wrapper.search_around(loc, "酒店", radius=1000)  # count=5, only 2 kept -> covers ~210 m
+    assert wrapper.search_around(loc, "酒店", radius=150)["pois"][0]["id"] == "B1"
+    assert len(around_requests) == 1
+    wrapper.search_around(loc, "酒店", radius=400)
+    assert len(around_requests) == 2
+
+
+def test_no_coverage_when_pois_cannot_be_indexed():
+    wrapper = MCPClientWrapper(api_key="dummy", enable_remote=False)
+    loc = f"{CENTER[0]},{CENTER[1]}"
+    # Trimmed POIs (as the official MCP tools return them) have no location.
+    trimmed = {"status": "1", "count": "1", "pois": [{"id": "B2", "name": "酒店", "address": "博爱北路"}]}
+    wrapper._observe("search_around", {"location": loc, "keywords": "酒店", "radius": 1000}, trimmed)
+    assert wrapper._answer_locally("search_around", {"location": loc, "keywords": "酒店", "radius": 500}) is None
+
+    # Without a count there is no completeness signal either.
+    uncounted = {"status": "1", "pois": [_poi(1, 0.001)]}
+    wrapper._observe("search_around", {"location": loc, "keywords": "咖啡", "radius": 1000}, uncounted)
+    assert wrapper._answer_locally("search_around", {"location": loc, "keywords": "咖啡", "radius": 500}) is None